@@ -32,6 +32,75 @@ class Settings(BaseSettings):
     FRONTEND_URL: str
     DEBUG: bool = False
     DEFAULT_ADMIN_INVITE_TOKEN: str
+    # ilu workerow liczy resolve kampanii w tle
+    RESOLVE_WORKERS: int = 2
+    # dzierżawa zadania resolve w sekundach: bez odnowienia przez ten czas zadanie uznajemy za porzucone
+    RESOLVE_JOB_LEASE_SECONDS: float = 60.0
+    # symulacja losowania (wspólna pula procesów + limit liczby losowań na jedno zapytanie)
+    SIMULATION_WORKERS: int = 2
+    SIMULATION_MAX_RUNS: int = 2000
+    # ile symulacji naraz na serwer, kolejne dostają 503
+    SIMULATION_MAX_CONCURRENT: int = 2
+    # maksymalny rozmiar strony studentów w wyniku symulacji
+    SIMULATION_MAX_STUDENTS_PAGE: int = 500
+    # pula połączeń do bazy (na każdy silnik osobno: sync i async)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    # ile sekund czekamy na wolne połączenie zanim zwrócimy 503
+    DB_POOL_TIMEOUT: float = 5.0
+    DB_POOL_RECYCLE: int = 1800
+    # zbiorczy zapis wniosków /student/register (jedna transakcja na paczkę)
+    SUBMISSION_BUFFER_ENABLED: bool = False
+    SUBMISSION_FLUSH_SIZE: int = 50
+    # ile ms czekamy na resztę paczki od pierwszego wniosku w kolejce
+    SUBMISSION_FLUSH_LINGER_MS: int = 20
+    # cache zalogowanych userów w get_current_user (liczba wpisów i czas życia w sekundach)
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL: float = 60.0
+    # cache odczytów zaproszeń po tokenie (sekundy)
+    INVITE_CACHE_SIZE: int = 1000
+    INVITE_CACHE_TTL: float = 30.0
+    # cache gotowych plików eksportu wyników (bajty łącznie / maks. jeden plik; większe tylko strumieniujemy)
+    EXPORT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    EXPORT_CACHE_MAX_ENTRY_BYTES: int = 16 * 1024 * 1024
+    # pula eksportu: wątki kodujące pliki, ile strumieni (pobierań) może być otwartych naraz
+    # (każdy trzyma połączenie z bazy) i ile sekund czeka kolejny, zanim dostanie 503
+    EXPORT_WORKERS: int = 2
+    EXPORT_MAX_STREAMS: int = 8
+    EXPORT_QUEUE_TIMEOUT: float = 10.0
+    # outbox maili: co ile sekund dispatcher zagląda do tabeli, ile maili bierze naraz,
+    # ile prób wysyłki i bazowy odstęp między nimi (rośnie wykładniczo);
+    # przy Resend paczka jest zaokrąglana w górę do pełnych RESEND_BATCH_SIZE, przy SMTP ograniczana do tego,
+    # co limit wysyłki przepuści w połowie dzierżawy (SEND_LEASE_SECONDS)
+    EMAIL_OUTBOX_POLL_SECONDS: float = 5.0
+    EMAIL_OUTBOX_BATCH_SIZE: int = 20
+    EMAIL_MAX_ATTEMPTS: int = 5
+    EMAIL_RETRY_BASE_SECONDS: float = 30.0
+    # nadawca SMTP: STARTTLS, liczba trzymanych połączeń, timeout (s) i limit wysyłki
+    # (token bucket: maili na minutę + ile może pójść naraz); SMTP_RATE_PER_MINUTE=0 wyłącza limit
+    SMTP_STARTTLS: bool = True
+    SMTP_POOL_SIZE: int = 2
+    SMTP_TIMEOUT: float = 10.0
+    SMTP_RATE_PER_MINUTE: float = 30
+    SMTP_BURST: int = 5
+    # backend pocztowy: "smtp" albo "resend" (HTTP API, RESEND_API_KEY / RESEND_EMAIL_FROM)
+    MAIL_BACKEND: str = "smtp"
+    RESEND_API_URL: str = "https://api.resend.com"
+    RESEND_TIMEOUT: float = 10.0
+    # ile maili w jednym zapytaniu /emails/batch (limit Resend to 100)
+    RESEND_BATCH_SIZE: int = 100
+    # bezpiecznik usługi pocztowej: po ilu nieudanych wysyłkach (paczkach) z rzędu przestajemy wysyłać i po ilu sekundach próbujemy znowu
+    MAIL_BREAKER_FAILURES: int = 5
+    MAIL_BREAKER_RESET_SECONDS: float = 30.0
+    # budżet zimnego startu workera w ms (import app.main + startup); przekroczenie = ostrzeżenie w logu
+    COLD_START_BUDGET_MS: float = 1500.0
+    # token operatora serwera do /internal/* (nagłówek X-Internal-Token); pusty = endpointy wyłączone
+    INTERNAL_API_TOKEN: str = ""
+    # JWT z rolą, kampaniami i wersją uprawnień (autoryzacja bez bazy, nieaktualne wersje odsiewa
+    # nasłuch NOTIFY claims_revoked wspólny dla workerów); domyślnie sam "sub"
+    JWT_CLAIMS_ENABLED: bool = False
+    # co ile sekund nasłuch claimów sprawdza swoje połączenie (i łączy się od nowa)
+    CLAIMS_LISTENER_PING_SECONDS: float = 10.0
 
 # export settingsow bez tworzenia za kazdym razem obiektu Settings
 @lru_cache
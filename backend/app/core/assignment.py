@@ -1,7 +1,19 @@
 import random
-from typing import Dict, List, Any
+import time
+from typing import Callable, Dict, List, Tuple, Any
+import numpy as np
+from sqlalchemy import update
 from sqlmodel import Session, select, col
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.core.counters import set_assigned_counts
+from app.core.assignment_engine import (
+    CampaignArrays,
+    build_campaign_arrays,
+    fcfs_order,
+    lottery_order,
+    serial_dictatorship
+)
 from app.models.models import (
     RegistrationCampaign, 
     RegistrationGroup, 
@@ -13,52 +25,115 @@ from app.models.models import (
 StudentsData = Dict[int, Dict[str, Any]]
 Capacities = Dict[int, int]
 Occupancy = Dict[int, int]
+ProgressCallback = Callable[[str, float], None]
+
+# ile id rejestracji wrzucamy do jednego UPDATE ... WHERE id IN (...)
+STATUS_UPDATE_CHUNK = 5000
 
-def resolve_campaign_logic(db: Session, campaign: RegistrationCampaign):
+def resolve_campaign_logic(
+    db: Session, 
+    campaign: RegistrationCampaign,
+    progress: ProgressCallback | None = None
+):
     """
     Główna funkcja zarządzająca losowaniami
     1. Pobiera dane
     2. Przygotowuje struktury
     3. Wybiera odpowiednią strategię
-    4. Zapisuje zmiany
+    4. Zapisuje zmiany (kilka zbiorczych UPDATE zamiast UPDATE na każdy wiersz)
+    
+    `progress(phase, fraction)` jest wołane przy przejściu do kolejnego etapu (zadania w tle).
     """
+    report = progress or (lambda phase, fraction: None)
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+    report("loading", 0.0)
     
-    # pobranie grup
-    groups = db.exec(
-        select(RegistrationGroup).where(col(RegistrationGroup.campaign_id) == campaign.id)
-    ).all()
+    students_data, group_ids, group_capacities = load_campaign_data(db, campaign.id)
+    group_occupancy: Occupancy = {gid: 0 for gid in group_ids}
     
-    group_capacities: Capacities = {g.id: g.limit for g in groups if g.id is not None}
-    group_occupancy: Occupancy = {g.id: 0 for g in groups if g.id is not None} 
-    group_ids: List[int] = [g.id for g in groups if g.id is not None]
+    timings["load"] = _elapsed_ms(started)
 
-    # pobranie rejestracji
-    registrations = db.exec(
-        select(Registration)
-        .join(RegistrationGroup)
-        .where(col(RegistrationGroup.campaign_id) == campaign.id)
-    ).all()
-
-    if not registrations:
+    if not students_data:
         return {"processed": 0, "assigned": 0, "method": campaign.assignment_method}
 
-    # przygotowanie danych (grupowanie + reset statusów)
+    # wybór strategii losowania
+    report("assigning", 0.3)
+    method = campaign.assignment_method
+    started = time.perf_counter()
+    assigned_ids: List[int] = []
+    
+    if method == AssignmentMethod.FCFS:
+        assigned_ids = _apply_fcfs_strategy(students_data, group_capacities, group_occupancy, group_ids)
+        
+    elif method == AssignmentMethod.LOTTERY:
+        assigned_ids = _apply_lottery_strategy(students_data, group_capacities, group_occupancy, group_ids)
+        
+    elif method == AssignmentMethod.RANDOM:
+        assigned_ids = _apply_random_strategy(students_data, group_capacities, group_occupancy, group_ids)
+
+    timings["assign"] = _elapsed_ms(started)
+
+    # zapis do bazy
+    report("writing", 0.7)
+    started = time.perf_counter()
+    _write_statuses(db, group_ids, assigned_ids)
+    set_assigned_counts(db, group_occupancy)
+    timings["write"] = _elapsed_ms(started)
+            
+    return {
+        "processed_students": len(students_data),
+        "total_assigned": sum(group_occupancy.values()),
+        "method_used": method,
+        "timings_ms": timings
+    }
+
+def load_campaign_data(db: Session, campaign_id: int | None) -> Tuple[StudentsData, List[int], Capacities]:
+    """
+    Pobiera grupy i zapisy kampanii i grupuje je po studentach.
+    Zapisy każdego studenta są posortowane wg priorytetu (1, 2, 3...).
+    """
+    groups = db.exec(_campaign_groups(campaign_id)).all()
+    registrations = db.exec(_campaign_registrations(campaign_id)).all()
+    return group_campaign_data(groups, registrations)
+
+
+async def fetch_campaign_rows(db: AsyncSession, campaign_id: int | None) -> Tuple[List[Any], List[Any]]:
+    """
+    Same wiersze grup i zapisów kampanii (sesja async). Struktury z nich buduje campaign_arrays_from_rows -
+    w wątku, bo dla dużej kampanii to sekundy CPU, które na pętli zdarzeń zatrzymałyby inne zapytania.
+    """
+    groups = (await db.exec(_campaign_groups(campaign_id))).all()
+    registrations = (await db.exec(_campaign_registrations(campaign_id))).all()
+    return list(groups), list(registrations)
+
+
+def campaign_arrays_from_rows(groups: List[Any], registrations: List[Any]) -> CampaignArrays:
+    """Kampania od razu w postaci tablic silnika (np. do symulacji bez zapisu). Czyste CPU, bez bazy."""
+    return build_campaign_arrays(*group_campaign_data(groups, registrations))
+
+
+def group_campaign_data(groups: List[Any], registrations: List[Any]) -> Tuple[StudentsData, List[int], Capacities]:
+    """Grupuje wiersze z _campaign_groups/_campaign_registrations po studentach (bez bazy)."""
+    group_capacities: Capacities = {g.id: g.limit for g in groups if g.id is not None}
+    group_ids: List[int] = [g.id for g in groups if g.id is not None]
+
+    # przygotowanie danych (grupowanie)
     students_data: StudentsData = {}
     
     for reg in registrations:
-        # reset do czysta
-        reg.status = RegistrationStatus.SUBMITTED
-        
         if reg.user_id is None:
             continue
         
         if reg.user_id not in students_data:
             students_data[reg.user_id] = {
                 "registrations": [], 
+                "registrations_by_group": {},
                 "earliest_created_at": reg.created_at
             }
         
         students_data[reg.user_id]["registrations"].append(reg)
+        students_data[reg.user_id]["registrations_by_group"][reg.group_id] = reg
         
         # szukanie najwcześniejszej daty zapisu
         # poniewaz poszczegolne registrations jednego usera mogą miec roznice kilka milisekund
@@ -69,67 +144,49 @@ def resolve_campaign_logic(db: Session, campaign: RegistrationCampaign):
     for uid in students_data:
         students_data[uid]["registrations"].sort(key=lambda r: r.priority)
 
-    # wybór strategii losowania
-    method = campaign.assignment_method
-    
-    if method == AssignmentMethod.FCFS:
-        _apply_fcfs_strategy(students_data, group_capacities, group_occupancy)
-        
-    elif method == AssignmentMethod.LOTTERY:
-        _apply_lottery_strategy(students_data, group_capacities, group_occupancy)
-        
-    elif method == AssignmentMethod.RANDOM:
-        _apply_random_strategy(students_data, group_capacities, group_occupancy, group_ids)
+    return students_data, group_ids, group_capacities
 
-    # zapis do bazy
-    for uid in students_data:
-        for reg in students_data[uid]["registrations"]:
-            db.add(reg)
-            
-    return {
-        "processed_students": len(students_data),
-        "total_assigned": sum(group_occupancy.values()),
-        "method_used": method
-    }
 
 # METODA FCFS (kto pierwszy ten lepszy)
 def _apply_fcfs_strategy(
     students_data: StudentsData, 
     capacities: Capacities, 
-    occupancy: Occupancy
-):
+    occupancy: Occupancy,
+    group_ids: List[int]
+) -> List[int]:
     """
     Strategia: Sortuje studentów według daty zgłoszenia, a potem przydziela wg priorytetów.
     """
-    student_ids = list(students_data.keys())
+    arrays = build_campaign_arrays(students_data, group_ids, capacities)
     
-    # sortowanie
-    random.shuffle(student_ids) # random zeby rozbic remisy userow, zeby user_id nie decydowal o wygranej
-    
-    # główny sort po czasie najwczesniejszego zapisu
-    student_ids.sort(key=lambda uid: students_data[uid]["earliest_created_at"])
+    # random zeby rozbic remisy userow, zeby user_id nie decydowal o wygranej,
+    # a potem główny sort po czasie najwczesniejszego zapisu
+    order = fcfs_order(arrays)
 
     # przydział wg priorytetów
-    _assign_by_priorities(student_ids, students_data, capacities, occupancy)
+    assignment = serial_dictatorship(arrays.choices, arrays.capacities, order)
+    return _apply_assignment(arrays, assignment, students_data, occupancy)
 
 
 # METODA LOTTERY (priorytety + losowanie)
 def _apply_lottery_strategy(
     students_data: StudentsData, 
     capacities: Capacities, 
-    occupancy: Occupancy
-):
+    occupancy: Occupancy,
+    group_ids: List[int]
+) -> List[int]:
     """
     Strategia: Miesza studentów losowo, a potem przydziela wg priorytetów.
     Ignoruje czas zgłoszenia.
     """
-    student_ids = list(students_data.keys())
+    arrays = build_campaign_arrays(students_data, group_ids, capacities)
     
     # losowosc
-    random.shuffle(student_ids)
+    order = lottery_order(arrays)
 
     # przydział wg priorytetów
-    _assign_by_priorities(student_ids, students_data, capacities, occupancy)
+    assignment = serial_dictatorship(arrays.choices, arrays.capacities, order)
+    return _apply_assignment(arrays, assignment, students_data, occupancy)
 
 
 # METODA RANDOM (ignoruje priorytety)
@@ -138,63 +195,138 @@ def _apply_random_strategy(
     capacities: Capacities, 
     occupancy: Occupancy,
     group_ids: List[int]
-):
+) -> List[int]:
     """
     Strategia: Miesza studentów i wrzuca ich do losowej grupy, która ma wolne miejsce.
+    Każdy przydział to O(1): losowanie z indeksu wolnych grup + słownik grupa -> zapis studenta.
     """
     student_ids = list(students_data.keys())
     random.shuffle(student_ids)
+    assigned_ids: List[int] = []
+    
+    # tylko grupy z wolnym miejscem, pełne wypadają z indeksu same
+    free_slots = FreeSlotIndex(group_ids, capacities)
 
     for uid in student_ids:
-        user_regs = students_data[uid]["registrations"]
+        if not free_slots:
+            break
         
-        # ignorowanie pelnych grup
-        available_groups = [gid for gid in group_ids if occupancy[gid] < capacities[gid]]
+        # losowanie randomowej grupy dla studenta 
+        target_group_id = free_slots.pick()
         
-        if available_groups:
-            # losowanie randomowej grupy dla studenta 
-            target_group_id = random.choice(available_groups)
-            
-            # znajdujemy odpowiedni rekord rejestracji
-            target_reg = next((r for r in user_regs if r.group_id == target_group_id), None)
-            
-            #zatweirdzenie przypisana studetna do grupy
-            if target_reg:
-                target_reg.status = RegistrationStatus.ASSIGNED
-                occupancy[target_group_id] += 1
+        # odpowiedni rekord rejestracji bez przeszukiwania listy
+        target_reg = students_data[uid]["registrations_by_group"].get(target_group_id)
         
-        # oznaczanie nieprzydzielonych jako REJECTED
-        _finalize_student_status(user_regs)
+        #zatweirdzenie przypisana studetna do grupy
+        if target_reg:
+            assigned_ids.append(target_reg.id)
+            free_slots.take(target_group_id)
+            occupancy[target_group_id] += 1
 
+    return assigned_ids
 
-# FUNKCJE POMOCNICZE
 
-def _assign_by_priorities(student_ids: List[int], students_data: StudentsData, capacities: Capacities, occupancy: Occupancy):
+class FreeSlotIndex:
     """
-    Wspólna logika pętli przydziału dla FCFS i LOTTERY.
-    Iteruje po liście (posortowanej wcześniej) i sprawdza priorytety 1, 2, 3...
+    Grupy z wolnymi miejscami trzymane w tablicy + pozycja każdej grupy w tej tablicy.
+    Losowanie grupy i zajęcie miejsca kosztują O(1): zapełniona grupa jest
+    usuwana przez zamianę z ostatnim elementem (swap-remove).
     """
-    for uid in student_ids:
-        user_regs = students_data[uid]["registrations"] 
-        is_assigned = False
+    def __init__(self, group_ids: List[int], capacities: Capacities):
+        self._remaining = {gid: capacities[gid] for gid in group_ids}
+        self._open = [gid for gid in group_ids if self._remaining[gid] > 0]
+        self._position = {gid: i for i, gid in enumerate(self._open)}
 
-        for reg in user_regs:
-            # jeśli student nie ma grupy oraz jest miejsce w tej grupie
-            if not is_assigned and occupancy[reg.group_id] < capacities[reg.group_id]:
-                reg.status = RegistrationStatus.ASSIGNED
-                occupancy[reg.group_id] += 1
-                is_assigned = True
-            else:
-                reg.status = RegistrationStatus.REJECTED
+    def __len__(self) -> int:
+        return len(self._open)
+
+    def pick(self, rng: random.Random | None = None) -> int:
+        """Losowa grupa z wolnym miejscem (indeks nie może być pusty)."""
+        return (rng or random).choice(self._open)
+
+    def take(self, group_id: int):
+        """Zajmuje jedno miejsce; pełna grupa wypada z indeksu."""
+        self._remaining[group_id] -= 1
+        if self._remaining[group_id] > 0:
+            return
+
+        # swap-remove: ostatnia grupa wskakuje na miejsce zapełnionej
+        position = self._position.pop(group_id)
+        last = self._open.pop()
+        if last != group_id:
+            self._open[position] = last
+            self._position[last] = position
+
+
+# FUNKCJE POMOCNICZE
+
+def _campaign_groups(campaign_id: int | None):
+    return (
+        select(RegistrationGroup.id, RegistrationGroup.limit)
+        .where(col(RegistrationGroup.campaign_id) == campaign_id)
+    )
+
+def _campaign_registrations(campaign_id: int | None):
+    # same kolumny, bez obiektów ORM - nic nie trafia do sesji
+    return (
+        select(
+            Registration.id,
+            Registration.user_id,
+            Registration.group_id,
+            Registration.priority,
+            Registration.created_at
+        )
+        .join(RegistrationGroup)
+        .where(col(RegistrationGroup.campaign_id) == campaign_id)
+    )
+
+def _apply_assignment(
+    arrays: CampaignArrays, 
+    assignment: np.ndarray, 
+    students_data: StudentsData, 
+    occupancy: Occupancy
+) -> List[int]:
+    """
+    Przepisuje wektor przydziałów z silnika na id zwycięskich rejestracji.
+    Wspólne dla FCFS i LOTTERY.
+    """
+    assigned_ids: List[int] = []
+    assigned_group_ids = np.where(assignment >= 0, arrays.group_ids[assignment], -1).tolist()
+    
+    for uid, target_group_id in zip(arrays.user_ids.tolist(), assigned_group_ids):
+        if target_group_id < 0:
+            continue
         
-        _finalize_student_status(user_regs)
+        for reg in students_data[uid]["registrations"]:
+            if reg.group_id == target_group_id:
+                assigned_ids.append(reg.id)
+                occupancy[reg.group_id] += 1
+                break
+
+    return assigned_ids
 
 
-# oznacza wszystkie nie ASSIGNED grupy na REJECTED
-def _finalize_student_status(user_regs: List[Registration]):
-    has_assignment = any(r.status == RegistrationStatus.ASSIGNED for r in user_regs)
-    for reg in user_regs:
-        if reg.status != RegistrationStatus.ASSIGNED:
-            reg.status = RegistrationStatus.REJECTED
+def _write_statuses(db: Session, group_ids: List[int], assigned_ids: List[int]):
+    """
+    Zbiorczy zapis wyników: jeden UPDATE ustawia REJECTED całej kampanii,
+    potem ASSIGNED po kluczu głównym w paczkach (kilka UPDATE zamiast jednego na wiersz).
+    Nie wykonuje commita - to robi wywołujący.
+    """
+    db.exec(
+        update(Registration)
+        .where(col(Registration.group_id).in_(group_ids))
+        .values(status=RegistrationStatus.REJECTED)
+        .execution_options(synchronize_session=False)
+    )
+
+    for start in range(0, len(assigned_ids), STATUS_UPDATE_CHUNK):
+        db.exec(
+            update(Registration)
+            .where(col(Registration.id).in_(assigned_ids[start:start + STATUS_UPDATE_CHUNK]))
+            .values(status=RegistrationStatus.ASSIGNED)
+            .execution_options(synchronize_session=False)
+        )
 
 
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
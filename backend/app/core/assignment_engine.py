@@ -0,0 +1,151 @@
+import random
+from datetime import datetime, timezone
+from dataclasses import dataclass
+from typing import Dict, List, Any
+
+import numpy as np
+
+# brak przydziału w wektorze wyników / brak grupy w macierzy preferencji
+UNASSIGNED = -1
+
+
+@dataclass
+class CampaignArrays:
+    """
+    Kampania w postaci gęstych tablic (bez obiektów ORM).
+    Wiersz = student (w kolejności kluczy students_data), kolumna = grupa (w kolejności group_ids).
+    """
+    user_ids: np.ndarray      # (S,) id studentów
+    group_ids: np.ndarray     # (G,) id grup
+    capacities: np.ndarray    # (G,) limity miejsc
+    ranks: np.ndarray         # (S, G) pozycja grupy w rankingu studenta (0 = priorytet 1), -1 gdy brak zapisu
+    choices: np.ndarray       # (S, K) indeksy grup posortowane wg priorytetu, dopełnione -1
+    earliest: np.ndarray      # (S,) najwcześniejszy zapis studenta w mikrosekundach (dla FCFS)
+
+    @property
+    def n_students(self) -> int:
+        return int(self.user_ids.size)
+
+
+def build_campaign_arrays(
+    students_data: Dict[int, Dict[str, Any]],
+    group_ids: List[int],
+    capacities: Dict[int, int]
+) -> CampaignArrays:
+    """
+    Zamienia students_data (zapisy posortowane wg priorytetu) na tablice silnika.
+    """
+    group_index = {gid: i for i, gid in enumerate(group_ids)}
+    user_ids = list(students_data.keys())
+
+    ranks = np.full((len(user_ids), len(group_ids)), UNASSIGNED, dtype=np.int32)
+    earliest = np.empty(len(user_ids), dtype=np.int64)
+
+    for row, uid in enumerate(user_ids):
+        for rank, reg in enumerate(students_data[uid]["registrations"]):
+            gidx = group_index.get(reg.group_id)
+            if gidx is not None:
+                ranks[row, gidx] = rank
+        earliest[row] = _to_micros(students_data[uid]["earliest_created_at"])
+
+    return CampaignArrays(
+        user_ids=np.asarray(user_ids, dtype=np.int64),
+        group_ids=np.asarray(group_ids, dtype=np.int64),
+        capacities=np.asarray([capacities[gid] for gid in group_ids], dtype=np.int64),
+        ranks=ranks,
+        choices=_choices_from_ranks(ranks),
+        earliest=earliest,
+    )
+
+
+def lottery_order(arrays: CampaignArrays, rng: random.Random | None = None) -> np.ndarray:
+    """
+    Kolejność LOTTERY: losowa permutacja studentów.
+    Używa random.shuffle, więc dla tego samego ziarna daje tę samą kolejność co stara implementacja.
+    """
+    order = list(range(arrays.n_students))
+    (rng or random).shuffle(order)
+    return np.asarray(order, dtype=np.int64)
+
+
+def fcfs_order(arrays: CampaignArrays, rng: random.Random | None = None) -> np.ndarray:
+    """
+    Kolejność FCFS: najpierw losowanie (rozbija remisy), potem stabilny sort po czasie zapisu.
+    """
+    shuffled = lottery_order(arrays, rng)
+    return shuffled[np.argsort(arrays.earliest[shuffled], kind="stable")]
+
+
+def serial_dictatorship(
+    choices: np.ndarray,
+    capacities: np.ndarray,
+    order: np.ndarray
+) -> np.ndarray:
+    """
+    Przydział "serial dictatorship": studenci po kolei (wg order) dostają
+    najwyżej ocenioną grupę, w której jest jeszcze miejsce.
+
+    Zamiast pętli po studentach liczymy w rundach: każdy czekający student celuje
+    w swoją najlepszą otwartą grupę, a przydziały są zatwierdzane aż do pierwszego
+    studenta, który przepełniłby grupę. Ta grupa jest wtedy pełna, więc ją zamykamy
+    i liczymy dalej od tego studenta. Rund jest najwyżej G + 1.
+
+    Zwraca wektor (S,) z indeksem przydzielonej grupy albo -1.
+    """
+    assignment = np.full(choices.shape[0], UNASSIGNED, dtype=np.int32)
+    remaining = capacities.astype(np.int64).copy()
+    ordered_choices = choices[order]
+    if ordered_choices.shape[1] == 0:
+        # nikt nie ma żadnej grupy w preferencjach (argmax na pustych wierszach by się wywalił)
+        return assignment
+
+    start = 0
+    while start < order.size:
+        pending = ordered_choices[start:]
+        valid = pending >= 0
+        is_open = valid & (remaining[np.where(valid, pending, 0)] > 0)
+
+        # najlepsza otwarta grupa każdego czekającego studenta
+        has_target = is_open.any(axis=1)
+        first_open = is_open.argmax(axis=1)
+        targets = np.where(has_target, pending[np.arange(pending.shape[0]), first_open], UNASSIGNED)
+
+        candidates = np.flatnonzero(targets >= 0)
+        if candidates.size == 0:
+            break
+
+        # numer studenta w kolejce do jego grupy (stabilnie, więc zgodnie z order)
+        by_group = np.argsort(targets[candidates], kind="stable")
+        sorted_targets = targets[candidates][by_group]
+        place_in_queue = np.arange(sorted_targets.size) - np.searchsorted(sorted_targets, sorted_targets)
+        overflowing = place_in_queue >= remaining[sorted_targets]
+
+        stop = int(candidates[by_group[overflowing]].min()) if overflowing.any() else pending.shape[0]
+
+        accepted = targets[:stop]
+        placed = accepted >= 0
+        assignment[order[start:start + stop][placed]] = accepted[placed]
+        remaining -= np.bincount(accepted[placed], minlength=remaining.size)
+
+        start += stop
+
+    return assignment
+
+
+# FUNKCJE POMOCNICZE
+
+def _choices_from_ranks(ranks: np.ndarray) -> np.ndarray:
+    n_choices = int((ranks >= 0).sum(axis=1).max()) if ranks.size else 0
+    # grupy bez zapisu lądują na końcu, stabilny sort trzyma kolejność priorytetów
+    sortable = np.where(ranks >= 0, ranks, np.iinfo(np.int32).max)
+    choices = np.argsort(sortable, axis=1, kind="stable")[:, :n_choices].astype(np.int32)
+    taken = np.take_along_axis(ranks, choices, axis=1) >= 0
+    return np.where(taken, choices, UNASSIGNED).astype(np.int32)
+
+
+def _to_micros(moment: datetime) -> int:
+    # porównujemy tylko czasy z jednej kampanii, więc wystarczy liczba mikrosekund od datetime.min
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    delta = moment - datetime.min
+    return (delta.days * 86_400 + delta.seconds) * 1_000_000 + delta.microseconds
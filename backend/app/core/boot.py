@@ -0,0 +1,50 @@
+import time
+from typing import Any, Dict
+
+from app.config import get_settings
+
+settings = get_settings()
+
+
+class BootTimer:
+    """
+    Czas zimnego startu workera: import app.main (moduły, routery, singletony)
+    i startup w lifespan (baza, dispatcher) - porównany z budżetem COLD_START_BUDGET_MS.
+    Start interpretera i uvicorna mierzy benchmarks.startup_profile.
+    """
+    def __init__(self, budget_ms: float):
+        self.budget_ms = budget_ms
+        self.import_ms: float | None = None
+        self.startup_ms: float | None = None
+        self._startup_started: float | None = None
+
+    def mark_imported(self, import_started: float):
+        """`import_started` = perf_counter() z pierwszej linii app.main."""
+        self.import_ms = (time.perf_counter() - import_started) * 1000
+
+    def mark_startup(self):
+        self._startup_started = time.perf_counter()
+
+    def mark_ready(self):
+        if self._startup_started is not None:
+            self.startup_ms = (time.perf_counter() - self._startup_started) * 1000
+        total = self.total_ms
+        if total > self.budget_ms:
+            print(f"UWAGA: zimny start {total:.0f} ms > budżet {self.budget_ms:.0f} ms "
+                  f"(import {self.import_ms or 0:.0f} ms, startup {self.startup_ms or 0:.0f} ms)")
+
+    @property
+    def total_ms(self) -> float:
+        return (self.import_ms or 0.0) + (self.startup_ms or 0.0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "import_ms": round(self.import_ms, 1) if self.import_ms is not None else None,
+            "startup_ms": round(self.startup_ms, 1) if self.startup_ms is not None else None,
+            "total_ms": round(self.total_ms, 1),
+            "budget_ms": self.budget_ms,
+            "within_budget": self.total_ms <= self.budget_ms,
+        }
+
+
+boot_timer = BootTimer(settings.COLD_START_BUDGET_MS)
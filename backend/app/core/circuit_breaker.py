@@ -0,0 +1,132 @@
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Tuple, Type, TypeVar
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Wywołanie odrzucone bez próby, bo bezpiecznik jest otwarty."""
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Bezpiecznik {name} otwarty, kolejna próba za {retry_after:.0f} s.")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Bezpiecznik na zewnętrzną usługę (np. serwer SMTP).
+
+    closed: wywołania idą normalnie; `failure_threshold` błędów z rzędu otwiera obwód.
+    open: wywołania od razu dostają CircuitOpenError, bez czekania na timeout usługi.
+    half_open: po `reset_timeout` sekundach przepuszczamy jedno wywołanie próbne -
+    sukces zamyka obwód, błąd otwiera go na kolejne `reset_timeout`.
+
+    Błędy z `ignored` (np. serwer odrzucił konkretnego odbiorcę) nie świadczą o awarii usługi,
+    więc nie liczą się do progu. Działa w jednej pętli zdarzeń, bez locków.
+    """
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        reset_timeout: float,
+        ignored: Tuple[Type[BaseException], ...] = ()
+    ):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.ignored = ignored
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+        self.calls = 0
+        self.failures = 0
+        self.short_circuits = 0
+        self.trips = 0
+        self.probes = 0
+        self.last_error: str | None = None
+        self.last_trip_at: datetime | None = None
+
+    async def call(self, fn: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+        self._before_call()
+        self.calls += 1
+        try:
+            result = await fn(*args, **kwargs)
+        except self.ignored:
+            self._on_success()
+            raise
+        except Exception as e:
+            self._on_failure(e)
+            raise
+        except BaseException:
+            # anulowanie w trakcie próby - nic nie wiemy o usłudze, oddajemy próbę
+            self._probe_in_flight = False
+            raise
+        self._on_success()
+        return result
+
+    def retry_after(self) -> float:
+        if self.state == CLOSED:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout_s": self.reset_timeout,
+            "retry_after_s": round(self.retry_after(), 2),
+            "calls": self.calls,
+            "failures": self.failures,
+            "short_circuits": self.short_circuits,
+            "trips": self.trips,
+            "probes": self.probes,
+            "last_error": self.last_error,
+            "last_trip_at": self.last_trip_at.isoformat() if self.last_trip_at else None,
+        }
+
+    # FUNKCJE POMOCNICZE
+
+    def _before_call(self):
+        if self.state == CLOSED:
+            return
+        if self.state == OPEN and self.retry_after() <= 0:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            self.probes += 1
+            return
+
+        self.short_circuits += 1
+        # w half_open próba już trwa - reszta czeka tyle, ile zwykle trwa przerwa
+        raise CircuitOpenError(self.name, self.retry_after() or self.reset_timeout)
+
+    def _on_success(self):
+        self.consecutive_failures = 0
+        if self.state != CLOSED:
+            self.state = CLOSED
+            self._probe_in_flight = False
+
+    def _on_failure(self, error: Exception):
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self._trip()
+
+    def _trip(self):
+        if self.state != OPEN:
+            self.trips += 1
+            self.last_trip_at = datetime.now()
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
@@ -0,0 +1,240 @@
+import asyncio
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.config import get_settings
+from app.core.memberships import CLAIMS_CHANNEL
+from app.core.security import create_access_token
+from app.core.user_cache import UserSnapshot, user_cache
+from app.database import async_engine
+from app.models.models import UserRole
+
+settings = get_settings()
+
+
+def create_session_token(user: UserSnapshot, expires_delta: timedelta) -> str:
+    """
+    Token sesji do ciasteczka access_token. Z JWT_CLAIMS_ENABLED niesie też rolę,
+    kampanie i wersję uprawnień (ver), więc CurrentUser/CurrentAdmin nie muszą pytać bazy
+    (nieaktualne wersje odsiewa claims_revocations).
+    """
+    data: Dict[str, Any] = {"sub": str(user.id)}
+    if settings.JWT_CLAIMS_ENABLED:
+        data.update({
+            "email": user.email,
+            "role": user.role.value,
+            "cids": sorted(user.campaign_ids),
+            "ver": user.claims_version,
+            "iat": int(time.time()),
+        })
+    return create_access_token(data=data, expires_delta=expires_delta)
+
+def snapshot_from_claims(payload: Dict[str, Any]) -> UserSnapshot | None:
+    """Usera z samego tokenu. None = token bez claimów albo uszkodzony - wywołujący idzie do cache/bazy."""
+    if not settings.JWT_CLAIMS_ENABLED or "ver" not in payload:
+        return None
+    try:
+        return UserSnapshot(
+            id=int(payload["sub"]),
+            email=payload["email"],
+            role=UserRole(payload["role"]),
+            campaign_ids=frozenset(int(cid) for cid in payload["cids"]),
+            claims_version=int(payload["ver"])
+        )
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def remaining_lifetime(payload: Dict[str, Any]) -> timedelta:
+    """Ile zostało do exp tokenu (w tej samej konwencji czasu co create_access_token)."""
+    expires_at = datetime.fromtimestamp(int(payload["exp"]), timezone.utc).replace(tzinfo=None)
+    return expires_at - datetime.now()
+
+def set_session_cookie(response: Response, token: str, max_age: timedelta):
+    response.set_cookie(
+        key="access_token",
+        value=token,
+        max_age=int(max_age.total_seconds()),
+        httponly=True,
+        secure=True, 
+        samesite="lax",
+        path="/"
+    )
+
+def reissue_session_cookie(request: Request, user: UserSnapshot, payload: Dict[str, Any]):
+    """
+    Nowe ciasteczko sesji dla aktualnych uprawnień usera (exp bez zmian). Tylko zapamiętuje je w request.state -
+    ustawia je middleware na odpowiedzi, którą zwrócił endpoint (także StreamingResponse albo RedirectResponse).
+    """
+    lifetime = remaining_lifetime(payload)
+    if lifetime.total_seconds() > 0:
+        request.state.session_cookie = (create_session_token(user, lifetime), lifetime)
+
+def apply_reissued_cookie(request: Request, response: Response):
+    reissued = getattr(request.state, "session_cookie", None)
+    if reissued is not None:
+        set_session_cookie(response, *reissued)
+
+
+class ClaimsRevocations:
+    """
+    user id -> aktualna wersja uprawnień, tylko dla userów zmienionych w ciągu ostatniej sesji
+    (starsze tokeny i tak wygasły). Token ze starszą wersją nie wystarcza do autoryzacji.
+
+    Wspólna dla wszystkich workerów: add_membership wysyła NOTIFY claims_revoked w transakcji
+    podbijającej users.claims_version (dociera po commicie), a każdy proces go słucha na osobnym
+    połączeniu. Po (ponownym) połączeniu doczytuje zmiany z bazy (users.claims_updated_at), więc nic
+    nie ginie w czasie przerwy. Dopóki nasłuch nie działa, is_current zwraca None i get_current_user
+    idzie przez cache/bazę zamiast ufać claimom.
+    """
+    def __init__(self, ttl: float, ping_interval: float):
+        self.ttl = ttl
+        self.ping_interval = ping_interval
+        self._versions: Dict[int, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._conn: AsyncConnection | None = None
+        self._task: asyncio.Task | None = None
+        self._closing = False
+        self._next_prune = 0.0
+        self.ready = False
+
+        self.notifications = 0
+        self.loaded = 0
+        self.reconnects = 0
+        self.rejected = 0
+        self.unavailable = 0
+
+    def start(self):
+        if self._task is not None and not self._task.done():
+            return
+        self._closing = False
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self):
+        self._closing = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._disconnect()
+
+    def is_current(self, user_id: int, version: int) -> bool | None:
+        """True = wersja aktualna, False = unieważniona, None = nie wiadomo (nasłuch nie działa)."""
+        if not self.ready:
+            self.unavailable += 1
+            return None
+        with self._lock:
+            entry = self._versions.get(user_id)
+        if entry is not None and version < entry[0]:
+            self.rejected += 1
+            return False
+        return True
+
+    def record(self, user_id: int, version: int):
+        now = time.monotonic()
+        with self._lock:
+            current = self._versions.get(user_id)
+            if current is None or current[0] < version:
+                self._versions[user_id] = (version, now + self.ttl)
+            self._prune(now)
+        # snapshot w cache tego procesu też jest już nieaktualny (zmiana mogła przyjść z innego workera)
+        user_cache.invalidate(user_id)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._versions)
+        return {
+            "ready": self.ready,
+            "size": size,
+            "notifications": self.notifications,
+            "loaded": self.loaded,
+            "reconnects": self.reconnects,
+            "rejected": self.rejected,
+            "unavailable": self.unavailable,
+        }
+
+    # FUNKCJE POMOCNICZE
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                if self._conn is None:
+                    await self._connect()
+                # zerwanie połączenia łapie też termination listener, ping to zabezpieczenie
+                await self._conn.execute(text("SELECT 1")) # type: ignore
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Nasłuch unieważnionych claimów przerwany: {e}")
+                traceback.print_exc()
+                await self._disconnect()
+            await asyncio.sleep(self.ping_interval)
+
+    async def _connect(self):
+        self.reconnects += 1
+        # AUTOCOMMIT: połączenie tylko słucha, bez otwartej transakcji
+        conn = await (await async_engine.connect()).execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            raw = (await conn.get_raw_connection()).driver_connection
+            raw.add_termination_listener(self._on_terminated) # type: ignore
+            # najpierw LISTEN, potem odczyt - zmiana z commitem pomiędzy trafi do nas przynajmniej raz
+            await raw.add_listener(CLAIMS_CHANNEL, self._on_notify) # type: ignore
+            since = datetime.now() - timedelta(seconds=self.ttl)
+            rows = (await conn.execute(
+                text("SELECT id, claims_version FROM users WHERE claims_updated_at > :since"),
+                {"since": since}
+            )).all()
+        except BaseException:
+            await conn.close()
+            raise
+        for user_id, version in rows:
+            self.record(user_id, version)
+        self.loaded += len(rows)
+        self._conn = conn
+        self.ready = True
+
+    async def _disconnect(self):
+        self.ready = False
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            await conn.close()
+        except Exception:
+            pass # zerwane połączenie - nic już nie słucha
+
+    def _on_notify(self, _conn, _pid, _channel, payload: str):
+        try:
+            user_id, version = (int(part) for part in payload.split(":"))
+        except ValueError:
+            return
+        self.notifications += 1
+        self.record(user_id, version)
+
+    def _on_terminated(self, _conn):
+        # od teraz możemy przegapić NOTIFY - claimy nie wystarczą, dopóki _run nie połączy się od nowa
+        self.ready = False
+
+    def _prune(self, now: float):
+        # sprzątanie co najwyżej raz na minutę, nie przy każdym wpisie
+        if now < self._next_prune:
+            return
+        self._next_prune = now + 60
+        expired = [uid for uid, (_, expires) in self._versions.items() if expires <= now]
+        for uid in expired:
+            del self._versions[uid]
+
+
+claims_revocations = ClaimsRevocations(
+    ttl=settings.SESSION_EXPIRE_HOURS * 3600,
+    ping_interval=settings.CLAIMS_LISTENER_PING_SECONDS
+)
@@ -0,0 +1,107 @@
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import bindparam, update, text, Connection
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.models import RegistrationGroup, RegistrationStatus
+
+# liczniki trzymane w registration_groups (aktualizowane przy zapisie, nie liczone przy odczycie)
+COUNTER_COLUMNS = ("applicants_count", "first_priority_count", "assigned_count")
+
+_groups_table = RegistrationGroup.__table__ # type: ignore
+
+# x = x + delta liczy baza, więc równoległe zapisy do tej samej grupy się nie nadpisują
+_increment_counters = (
+    update(_groups_table)
+    .where(_groups_table.c.id == bindparam("gid"))
+    .values(
+        applicants_count=_groups_table.c.applicants_count + bindparam("d_applicants"),
+        first_priority_count=_groups_table.c.first_priority_count + bindparam("d_first"),
+        assigned_count=_groups_table.c.assigned_count + bindparam("d_assigned"),
+    )
+)
+
+_set_assigned_count = (
+    update(_groups_table)
+    .where(_groups_table.c.id == bindparam("gid"))
+    .values(assigned_count=bindparam("assigned"))
+)
+
+# przeliczenie od zera z tabeli registrations (komenda naprawcza i migracja)
+_RECOMPUTE_SQL = """
+    UPDATE registration_groups AS g SET
+        applicants_count = s.applicants,
+        first_priority_count = s.first_priority,
+        assigned_count = s.assigned
+    FROM (
+        SELECT g2.id,
+               COUNT(r.id) AS applicants,
+               COUNT(r.id) FILTER (WHERE r.priority = 1) AS first_priority,
+               COUNT(r.id) FILTER (WHERE r.status = 'ASSIGNED') AS assigned
+        FROM registration_groups g2
+        LEFT JOIN registrations r ON r.group_id = g2.id
+        GROUP BY g2.id
+    ) s
+    WHERE g.id = s.id
+"""
+
+
+def counter_deltas(removed: Iterable[Any], added: Iterable[Any]) -> List[Dict[str, int]]:
+    """
+    Różnica liczników na grupę po podmianie zapisów (poprzednie -> nowe).
+    Wystarczą wiersze z polami group_id, priority i status (Registration albo Row z RETURNING).
+    Zwraca tylko grupy, w których coś się zmieniło (parametry do _increment_counters), posortowane po id grupy.
+    """
+    deltas: Dict[int, List[int]] = {}
+    for sign, registrations in ((-1, removed), (1, added)):
+        for reg in registrations:
+            delta = deltas.setdefault(reg.group_id, [0, 0, 0])
+            delta[0] += sign
+            if reg.priority == 1:
+                delta[1] += sign
+            if reg.status == RegistrationStatus.ASSIGNED:
+                delta[2] += sign
+    return _as_params(deltas)
+
+def merge_counter_deltas(batches: Iterable[List[Dict[str, int]]]) -> List[Dict[str, int]]:
+    """Sumuje delty kilku wniosków (paczka z SubmissionBuffer) - jeden UPDATE na grupę, posortowane po id grupy."""
+    merged: Dict[int, List[int]] = {}
+    for deltas in batches:
+        for delta in deltas:
+            total = merged.setdefault(delta["gid"], [0, 0, 0])
+            total[0] += delta["d_applicants"]
+            total[1] += delta["d_first"]
+            total[2] += delta["d_assigned"]
+    return _as_params(merged)
+
+async def apply_counter_deltas(db: AsyncSession, deltas: List[Dict[str, int]]):
+    """
+    Jeden executemany UPDATE w transakcji wywołującego.
+    Blokuje wiersze grup do commita, więc wołać jako ostatni zapis przed commitem.
+    """
+    if deltas:
+        await (await db.connection()).execute(_increment_counters, deltas)
+
+def set_assigned_counts(db: Session, occupancy: Dict[int, int]):
+    """Po resolve: assigned_count = liczba przydzielonych (resolve nadpisuje wszystkie statusy)."""
+    if occupancy:
+        db.connection().execute(
+            _set_assigned_count,
+            [{"gid": gid, "assigned": count} for gid, count in sorted(occupancy.items())]
+        )
+
+def recompute_group_counters(conn: Connection) -> int:
+    """Przelicza liczniki wszystkich grup od zera. Zwraca liczbę zaktualizowanych grup."""
+    return conn.execute(text(_RECOMPUTE_SQL)).rowcount
+
+# FUNKCJE POMOCNICZE
+
+def _as_params(deltas: Dict[int, List[int]]) -> List[Dict[str, int]]:
+    # zawsze rosnąco po id grupy: UPDATE-y blokują wiersze grup w tej samej kolejności w każdej transakcji,
+    # inaczej dwa wnioski z różną kolejnością priorytetów potrafią się zakleszczyć
+    return [
+        {"gid": gid, "d_applicants": a, "d_first": f, "d_assigned": s}
+        for gid, (a, f, s) in sorted(deltas.items())
+        if a or f or s
+    ]
@@ -1,13 +1,15 @@
+import secrets
 from typing import Annotated, Optional
-from fastapi import Depends, HTTPException, status, Cookie
+from fastapi import Depends, Header, HTTPException, Request, status, Cookie
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
 from sqlmodel import select
 
 from app.models.models import UserRole
 from app.config import get_settings
-from app.database import SessionDep
-from app.models.models import User
+from app.database import AsyncSessionDep
+from app.core.claims import claims_revocations, reissue_session_cookie, snapshot_from_claims
+from app.core.user_cache import UserSnapshot, get_user_snapshot
 
 settings = get_settings()
 
@@ -19,9 +21,10 @@ security = HTTPBearer()
 
 # zezwoli na dostep tylko zalogowanemu userowi dowolnej roli
 async def get_current_user(
-    db: SessionDep,
+    db: AsyncSessionDep,
+    request: Request,
     access_token: Optional[str] = Cookie(None)
-) -> User:
+) -> UserSnapshot:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Nieprawidłowe dane uwierzytelniające.",
@@ -49,19 +52,28 @@ async def get_current_user(
         credentials_exception.detail += "(Nieprawidłowy token)"
         raise credentials_exception
 
-    # get user z bazy
-    user = db.get(User, int(user_id))
+    # token z aktualnymi claimami wystarcza - bez cache i bez bazy
+    claims_user = snapshot_from_claims(payload)
+    if claims_user is not None and claims_revocations.is_current(claims_user.id, claims_user.claims_version):
+        return claims_user
+
+    # get user z cache, a jak go tam nie ma to z bazy
+    user = await get_user_snapshot(db, int(user_id))
     
     if user is None:
         credentials_exception.detail += "(Nie ma takiego użytkownika)"
         raise credentials_exception
+
+    # stary format albo claimy starsze niż users.claims_version - nowe ciasteczko (ustawia je middleware)
+    if settings.JWT_CLAIMS_ENABLED and (claims_user is None or claims_user.claims_version != user.claims_version):
+        reissue_session_cookie(request, user, payload)
         
     return user
 
-CurrentUser = Annotated[User, Depends(get_current_user)]
+CurrentUser = Annotated[UserSnapshot, Depends(get_current_user)]
 
 # zezwala na dostep tylko adminowi
-async def get_current_admin(user: CurrentUser) -> User:
+async def get_current_admin(user: CurrentUser) -> UserSnapshot:
     if user.role != UserRole.ADMIN:
         raise HTTPException(
             status_code=403,
@@ -70,7 +82,7 @@ async def get_current_admin(user: CurrentUser) -> User:
     return user
 
 # zezwoli na dostep tylko studentowi(useless, bo starosta tez jest studentem wiem :v)
-async def get_current_student(user: CurrentUser) -> User:
+async def get_current_student(user: CurrentUser) -> UserSnapshot:
     if user.role != UserRole.STUDENT:
         raise HTTPException(
             status_code=403,
@@ -78,8 +90,17 @@ async def get_current_student(user: CurrentUser) -> User:
         )
     return user
 
+# zezwala na dostep tylko operatorowi serwera (staly token z INTERNAL_API_TOKEN, bez bazy),
+# bo /internal/* pokazuje dane calego systemu, a nie jednej kampanii
+async def require_operator(x_internal_token: Optional[str] = Header(None)) -> None:
+    if not settings.INTERNAL_API_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_internal_token or not secrets.compare_digest(x_internal_token, settings.INTERNAL_API_TOKEN):
+        raise HTTPException(status_code=403, detail="Brak uprawnień operatora.")
+
 # skróty typów
-CurrentAdmin = Annotated[User, Depends(get_current_admin)]
-CurrentStudent = Annotated[User, Depends(get_current_student)]
+CurrentAdmin = Annotated[UserSnapshot, Depends(get_current_admin)]
+CurrentStudent = Annotated[UserSnapshot, Depends(get_current_student)]
+OperatorAccess = Annotated[None, Depends(require_operator)]
 
 #endregion
\ No newline at end of file
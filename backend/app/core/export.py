@@ -0,0 +1,365 @@
+import csv
+import io
+import json
+import re
+import zipfile
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Sequence, Tuple
+from xml.sax.saxutils import escape
+
+from sqlmodel import select, col
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.export_pool import export_pool
+from app.database import async_engine
+from app.models.models import ExportFormat, Registration, RegistrationGroup, User
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# format -> (media type, rozszerzenie pliku)
+EXPORT_FORMATS: Dict[ExportFormat, Tuple[str, str]] = {
+    ExportFormat.XLSX: (XLSX_MEDIA_TYPE, "xlsx"),
+    ExportFormat.CSV: ("text/csv; charset=utf-8", "csv"),
+    ExportFormat.NDJSON: ("application/x-ndjson", "ndjson"),
+    ExportFormat.PARQUET: ("application/vnd.apache.parquet", "parquet"),
+}
+
+# ile wierszy kursor pobiera z bazy naraz i od ilu bajtów oddajemy kawałek pliku klientowi
+EXPORT_FETCH_ROWS = 1000
+EXPORT_CHUNK_BYTES = 64 * 1024
+# wiersze w jednej grupie wierszy parquet (tyle kolumn trzymamy naraz w pamięci)
+PARQUET_BATCH_ROWS = 10 * EXPORT_FETCH_ROWS
+
+# nagłówki arkusza dla ludzi i nazwy pól dla formatów maszynowych (ta sama kolejność)
+RESULT_COLUMNS = ["Indeks studenta", "Grupa", "Priorytet", "Status", "Data zgłoszenia"]
+RESULT_FIELDS = ["student_index", "group", "priority", "status", "registered_at"]
+
+Row = Sequence[Any]
+
+
+async def stream_campaign_results(campaign_id: int) -> AsyncIterator[List[Row]]:
+    """
+    Wszystkie zgłoszenia kampanii (każdy priorytet, także odrzucone i nierozpatrzone)
+    prosto z kursora po stronie serwera, paczkami po EXPORT_FETCH_ROWS - w pamięci nigdy nie ma całej kampanii.
+    Własna sesja, bo generator czyta dopiero po wyjściu z endpointu (StreamingResponse).
+    Wiersze w kolejności RESULT_FIELDS, data jako datetime - formatuje ją dopiero encoder.
+    """
+    statement = (
+        select(
+            User.index,
+            RegistrationGroup.name.label("group_name"), # type: ignore
+            Registration.priority,
+            Registration.status,
+            Registration.created_at
+        )
+        .join(Registration, col(Registration.user_id) == col(User.id))
+        .join(RegistrationGroup, col(Registration.group_id) == col(RegistrationGroup.id))
+        .where(col(RegistrationGroup.campaign_id) == campaign_id)
+        .order_by(col(User.index), col(Registration.priority))
+        .execution_options(yield_per=EXPORT_FETCH_ROWS)
+    )
+    async with AsyncSession(async_engine, expire_on_commit=False) as db:
+        result = await db.stream(statement)
+        async for partition in result.partitions():
+            yield [(row.index, row.group_name, row.priority, row.status.value, row.created_at) for row in partition]
+
+
+def export_campaign_results(campaign_id: int, export_format: ExportFormat) -> AsyncIterator[bytes]:
+    """Strumień pliku z wynikami kampanii w wybranym formacie."""
+    batches = stream_campaign_results(campaign_id)
+    if export_format == ExportFormat.CSV:
+        return csv_stream(batches, RESULT_FIELDS)
+    if export_format == ExportFormat.NDJSON:
+        return ndjson_stream(batches, RESULT_FIELDS)
+    if export_format == ExportFormat.PARQUET:
+        return parquet_stream(batches)
+    return xlsx_stream(batches, RESULT_COLUMNS)
+
+
+def xlsx_stream(batches: AsyncIterator[Sequence[Row]], columns: List[str], sheet_name: str = "Wyniki") -> AsyncIterator[bytes]:
+    """
+    Arkusz XLSX pisany w locie: wiersze idą prosto do skompresowanego wpisu zipa
+    (xl/worksheets/sheet1.xml, teksty jako inlineStr - bez tabeli sharedStrings),
+    a gotowe kawałki archiwum są oddawane od razu. Pamięć nie zależy od liczby wierszy.
+    """
+    return _encode_stream(batches, _XlsxEncoder(columns, sheet_name))
+
+def csv_stream(batches: AsyncIterator[Sequence[Row]], columns: List[str]) -> AsyncIterator[bytes]:
+    """CSV (UTF-8, nagłówek w pierwszej linii) pisany paczkami wierszy, oddawany kawałkami."""
+    return _encode_stream(batches, _CsvEncoder(columns))
+
+def ndjson_stream(batches: AsyncIterator[Sequence[Row]], columns: List[str]) -> AsyncIterator[bytes]:
+    """NDJSON: jeden obiekt {kolumna: wartość} na linię, oddawany kawałkami."""
+    return _encode_stream(batches, _NdjsonEncoder(columns))
+
+def parquet_stream(batches: AsyncIterator[Sequence[Row]]) -> AsyncIterator[bytes]:
+    """
+    Parquet zapisywany kolumnami: wiersze zbieramy w kolumny po PARQUET_BATCH_ROWS,
+    każda paczka to osobna grupa wierszy, a jej bajty idą do klienta od razu.
+    Stopka z metadanymi dochodzi na końcu, więc plik jest czytelny dopiero po całym pobraniu.
+    """
+    return _encode_stream(batches, _ParquetEncoder())
+
+
+# FUNKCJE POMOCNICZE
+
+async def _encode_stream(batches: AsyncIterator[Sequence[Row]], encoder: "_Encoder") -> AsyncIterator[bytes]:
+    # pętla zdarzeń tylko czeka na paczki z bazy; kodowanie (CPU) idzie w wątkach puli eksportu
+    try:
+        chunk = await export_pool.offload(encoder.start)
+        if chunk:
+            yield chunk
+        async for batch in batches:
+            chunk = await export_pool.offload(encoder.encode, batch)
+            if chunk:
+                yield chunk
+        yield await export_pool.offload(encoder.finish)
+    finally:
+        # przerwany eksport od razu oddaje połączenie z kursorem do puli
+        aclose = getattr(batches, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+class _Encoder:
+    """
+    Koduje plik paczkami wierszy, synchronicznie (wołany w wątku puli).
+    Każda metoda zwraca bajty gotowe do wysłania - b"", dopóki nie uzbiera się EXPORT_CHUNK_BYTES.
+    """
+    def start(self) -> bytes:
+        return b""
+
+    def encode(self, rows: Sequence[Row]) -> bytes:
+        raise NotImplementedError
+
+    def finish(self) -> bytes:
+        raise NotImplementedError
+
+
+class _XlsxEncoder(_Encoder):
+    def __init__(self, columns: List[str], sheet_name: str):
+        self.columns = columns
+        self.sheet_name = sheet_name
+        self._sink = _ChunkSink()
+        # niepozycjonowalny strumień -> zipfile sam dopisuje rozmiary w data descriptorach
+        self._archive = zipfile.ZipFile(self._sink, "w", compression=zipfile.ZIP_DEFLATED)
+        self._sheet: Any = None
+        self._row_number = 1
+
+    def start(self) -> bytes:
+        for name, content in _static_parts(self.sheet_name).items():
+            self._archive.writestr(name, content)
+        self._sheet = self._archive.open("xl/worksheets/sheet1.xml", "w")
+        self._sheet.write(_sheet_header(self.columns))
+        self._sheet.write(_row_xml(1, self.columns))
+        # nagłówki zipa i stałe części od razu - klient dostaje pierwsze bajty zanim ruszy kursor
+        return self._sink.take()
+
+    def encode(self, rows: Sequence[Row]) -> bytes:
+        for row in rows:
+            self._row_number += 1
+            self._sheet.write(_row_xml(self._row_number, row))
+        return self._sink.take() if self._sink.size >= EXPORT_CHUNK_BYTES else b""
+
+    def finish(self) -> bytes:
+        self._sheet.write(b"</sheetData></worksheet>")
+        self._sheet.close()
+        self._archive.close()
+        return self._sink.take()
+
+
+class _CsvEncoder(_Encoder):
+    def __init__(self, columns: List[str]):
+        self.columns = columns
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+
+    def start(self) -> bytes:
+        self._writer.writerow(self.columns)
+        return _take_text(self._buffer)
+
+    def encode(self, rows: Sequence[Row]) -> bytes:
+        self._writer.writerows([_text_value(value) for value in row] for row in rows)
+        return _take_text(self._buffer) if self._buffer.tell() >= EXPORT_CHUNK_BYTES else b""
+
+    def finish(self) -> bytes:
+        return _take_text(self._buffer)
+
+
+class _NdjsonEncoder(_Encoder):
+    def __init__(self, columns: List[str]):
+        self.columns = columns
+        self._buffer = io.StringIO()
+
+    def encode(self, rows: Sequence[Row]) -> bytes:
+        for row in rows:
+            record = {name: _json_value(value) for name, value in zip(self.columns, row)}
+            self._buffer.write(json.dumps(record, ensure_ascii=False))
+            self._buffer.write("\n")
+        return _take_text(self._buffer) if self._buffer.tell() >= EXPORT_CHUNK_BYTES else b""
+
+    def finish(self) -> bytes:
+        return _take_text(self._buffer)
+
+
+class _ParquetEncoder(_Encoder):
+    def __init__(self):
+        self._sink = _ChunkSink()
+        self._pa: Any = None
+        self._schema: Any = None
+        self._writer: Any = None
+        self._columns: List[List[Any]] = []
+
+    def start(self) -> bytes:
+        # pyarrow jest ciężki - ładujemy go dopiero przy pierwszym eksporcie do parquet (już w wątku puli)
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._schema = pa.schema([
+            ("student_index", pa.string()),
+            ("group", pa.string()),
+            ("priority", pa.int32()),
+            ("status", pa.string()),
+            ("registered_at", pa.timestamp("us")),
+        ])
+        self._writer = pq.ParquetWriter(self._sink, self._schema, compression="snappy")
+        self._columns = [[] for _ in self._schema.names]
+        return b""
+
+    def encode(self, rows: Sequence[Row]) -> bytes:
+        for row in rows:
+            for column, value in zip(self._columns, row):
+                column.append(value)
+        if len(self._columns[0]) < PARQUET_BATCH_ROWS:
+            return b""
+        self._write_group()
+        return self._sink.take()
+
+    def finish(self) -> bytes:
+        if self._columns[0]:
+            self._write_group()
+        self._writer.close()
+        return self._sink.take()
+
+    def _write_group(self):
+        self._writer.write_batch(self._pa.record_batch(self._columns, schema=self._schema))
+        self._columns = [[] for _ in self._schema.names]
+
+
+class _ChunkSink:
+    """
+    Plik tylko do zapisu (tell bez seek), z którego odbieramy kolejne kawałki zipa / parquet.
+    Brak seek wystarczy, żeby zipfile pisał w trybie strumieniowym.
+    """
+    closed = False
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self.size = 0
+        self._position = 0
+
+    def write(self, data: bytes) -> int:
+        self._parts.append(bytes(data))
+        self.size += len(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def take(self) -> bytes:
+        chunk = b"".join(self._parts)
+        self._parts = []
+        self.size = 0
+        return chunk
+
+
+def _take_text(buffer: io.StringIO) -> bytes:
+    chunk = buffer.getvalue().encode("utf-8")
+    buffer.seek(0)
+    buffer.truncate()
+    return chunk
+
+def _text_value(value: Any) -> Any:
+    return value.isoformat(sep=" ", timespec="seconds") if isinstance(value, datetime) else value
+
+def _json_value(value: Any) -> Any:
+    return value.isoformat(timespec="seconds") if isinstance(value, datetime) else value
+
+
+# znaki sterujące, których nie wolno wstawić do XML
+_ILLEGAL_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+def _cell_xml(ref: str, value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    if isinstance(value, datetime):
+        value = value.strftime("%Y-%m-%d %H:%M")
+    text = escape(_ILLEGAL_XML.sub("", str(value)))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+def _row_xml(number: int, values: Sequence[Any]) -> bytes:
+    cells = "".join(_cell_xml(f"{_column_letter(i)}{number}", value) for i, value in enumerate(values))
+    return f'<row r="{number}">{cells}</row>'.encode("utf-8")
+
+def _column_letter(index: int) -> str:
+    letters = ""
+    index += 1
+    while index:
+        index, rest = divmod(index - 1, 26)
+        letters = chr(65 + rest) + letters
+    return letters
+
+def _sheet_header(columns: List[str]) -> bytes:
+    widths = "".join(
+        f'<col min="{i}" max="{i}" width="{max(12, len(name) + 4)}" customWidth="1"/>'
+        for i, name in enumerate(columns, start=1)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        f'<cols>{widths}</cols><sheetData>'
+    ).encode("utf-8")
+
+def _static_parts(sheet_name: str) -> dict:
+    return {
+        "[Content_Types].xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            '</Types>'
+        ),
+        "_rels/.rels": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>'
+        ),
+        "xl/workbook.xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(sheet_name[:31], {chr(34): "&quot;"})}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ),
+        "xl/_rels/workbook.xml.rels": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+            '</Relationships>'
+        ),
+    }
@@ -0,0 +1,145 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+from sqlalchemy import update
+from sqlmodel import Session, col
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import get_settings
+from app.models.models import ExportFormat, RegistrationCampaign
+
+settings = get_settings()
+
+ExportKey = Tuple[int, ExportFormat] # (id kampanii, format)
+
+# zapas po końcu okna zapisów: wniosek zwalidowany tuż przed ends_at może się commitować chwilę później
+RESULTS_SETTLE_SECONDS = 60
+
+
+def _bump_results_version(campaign_id: int):
+    # x = x + 1 liczy baza, więc równoległe zapisy się nie gubią
+    return (
+        update(RegistrationCampaign)
+        .where(col(RegistrationCampaign.id) == campaign_id)
+        .values(results_version=col(RegistrationCampaign.results_version) + 1)
+    )
+
+def results_settled(campaign: RegistrationCampaign, now: datetime | None = None) -> bool:
+    """
+    Czy wyniki kampanii mogą być cache'owane (i dostać ETag). Zapisy studentów nie podbijają
+    results_version, więc dopóki okno zapisów jest otwarte (plus RESULTS_SETTLE_SECONDS), eksport
+    zawsze powstaje od nowa. Po zamknięciu okna wersję zmieniają już tylko akcje starosty i resolve.
+    """
+    now = now or datetime.now()
+    return now > campaign.ends_at + timedelta(seconds=RESULTS_SETTLE_SECONDS)
+
+async def bump_results_version(db: AsyncSession, campaign_id: int):
+    """
+    Nowa wersja wyników kampanii - wcześniejsze eksporty (cache, ETag) przestają być aktualne.
+    Wołać w tej samej transakcji co zmiana grup, dat kampanii albo wyników; commit robi wywołujący.
+    """
+    await db.exec(_bump_results_version(campaign_id)) # type: ignore
+
+def bump_results_version_sync(db: Session, campaign_id: int):
+    """Wersja dla synchronicznej sesji (resolve w wątku workera)."""
+    db.exec(_bump_results_version(campaign_id)) # type: ignore
+
+
+def export_etag(campaign_id: int, results_version: int, export_format: ExportFormat) -> str:
+    # słaby ETag: xlsx/parquet wygenerowane drugi raz mają inne bajty (znaczniki czasu), ale tę samą treść
+    return f'W/"{campaign_id}-{results_version}-{export_format.value}"'
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match (lista ETagów albo *), porównanie słabe - bez prefiksu W/."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    wanted = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == wanted for tag in if_none_match.split(","))
+
+
+class ExportCache:
+    """
+    Gotowe pliki eksportu w pamięci procesu: LRU ograniczone sumą bajtów.
+    Klucz to (kampania, format), wpis pamięta results_version, z której powstał -
+    po podbiciu wersji stary plik jest pudłem i zostaje nadpisany nowym.
+    Używany tylko z pętli zdarzeń, więc bez blokady.
+    """
+    def __init__(self, max_bytes: int, max_entry_bytes: int):
+        self.max_bytes = max(0, max_bytes)
+        self.max_entry_bytes = min(max(0, max_entry_bytes), self.max_bytes)
+        self._data: "OrderedDict[ExportKey, Tuple[int, bytes]]" = OrderedDict()
+        self.size_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evictions = 0
+        self.too_large = 0
+
+    def get(self, key: ExportKey, version: int) -> bytes | None:
+        entry = self._data.get(key)
+        if entry is None or entry[0] != version:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: ExportKey, version: int, content: bytes):
+        if len(content) > self.max_entry_bytes:
+            self.too_large += 1
+            return
+        old = self._data.pop(key, None)
+        if old is not None:
+            self.size_bytes -= len(old[1])
+        self._data[key] = (version, content)
+        self.size_bytes += len(content)
+        self.stored += 1
+        while self.size_bytes > self.max_bytes:
+            _, (_, evicted) = self._data.popitem(last=False)
+            self.size_bytes -= len(evicted)
+            self.evictions += 1
+
+    async def stream_through(self, key: ExportKey, version: int, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """
+        Oddaje kawałki dalej bez czekania na cały plik i po drodze je zbiera.
+        Zapis do cache dopiero po ostatnim kawałku (przerwane pobranie niczego nie zapisuje);
+        plik większy niż max_entry_bytes przestajemy zbierać.
+        Wersja jest czytana przed wierszami, więc w najgorszym razie pod starą wersją
+        leży nowszy plik - nigdy odwrotnie.
+        """
+        parts: List[bytes] | None = []
+        collected = 0
+        async for chunk in chunks:
+            if parts is not None:
+                collected += len(chunk)
+                if collected > self.max_entry_bytes:
+                    parts = None
+                    self.too_large += 1
+                else:
+                    parts.append(chunk)
+            yield chunk
+
+        if parts is not None:
+            self.set(key, version, b"".join(parts))
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "size_bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+            "max_entry_bytes": self.max_entry_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stored": self.stored,
+            "evictions": self.evictions,
+            "too_large": self.too_large,
+        }
+
+
+export_cache = ExportCache(settings.EXPORT_CACHE_MAX_BYTES, settings.EXPORT_CACHE_MAX_ENTRY_BYTES)
@@ -0,0 +1,149 @@
+import asyncio
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, TypeVar
+
+from app.config import get_settings
+
+settings = get_settings()
+
+T = TypeVar("T")
+
+
+class ExportPoolBusy(Exception):
+    """Wszystkie miejsca na otwarte strumienie eksportu zajęte dłużej niż queue_timeout."""
+    def __init__(self, retry_after: float):
+        super().__init__(f"Pula eksportu zajęta, spróbuj za {retry_after:.0f} s")
+        self.retry_after = retry_after
+
+
+class ExportPool:
+    """
+    Ograniczona pula do generowania plików eksportu.
+
+    Dwa osobne limity:
+    - praca CPU (XML arkusza, deflate, CSV/JSON, parquet) idzie przez offload do `workers` wątków -
+      kodowanie kilku eksportów naraz czeka w kolejce wykonawcy, a pętla zdarzeń zostaje wolna;
+    - otwartych strumieni (każdy trzyma kursor, czyli połączenie z bazy, aż klient pobierze plik)
+      jest najwyżej `max_streams`; kolejne czekają do `queue_timeout` sekund, potem ExportPoolBusy (503).
+    Wolny klient trzyma więc tylko miejsce strumienia, a wątki kodujące obsługują w tym czasie innych.
+    """
+    def __init__(self, workers: int, max_streams: int, queue_timeout: float):
+        self.workers = max(1, workers)
+        self.max_streams = max(self.workers, max_streams)
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="export")
+        # semafor należy do jednej pętli zdarzeń (tak jak klient HTTP w ResendBackend)
+        self._slots: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+        self.active = 0
+        self.waiting = 0
+        self.encoding = 0
+        self.completed = 0
+        self.aborted = 0
+        self.rejected = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.build_ms_total = 0.0
+        self.build_ms_max = 0.0
+        self.encode_ms_total = 0.0
+
+    async def open(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """
+        Czeka na wolne miejsce (albo rzuca ExportPoolBusy) i zwraca strumień `chunks`,
+        który zwalnia miejsce po ostatnim kawałku, błędzie albo zerwaniu połączenia.
+        Strumień jest już uruchomiony, więc nawet nieczytany zwolni miejsce przy sprzątaniu
+        generatora przez pętlę zdarzeń.
+        """
+        stream = self._run(chunks)
+        await stream.__anext__()
+        return stream
+
+    async def offload(self, fn: Callable[..., T], *args: Any) -> T:
+        """Wywołuje fn(*args) w wątku puli (praca CPU przy kodowaniu pliku, czeka w kolejce gdy wszystkie zajęte)."""
+        started = time.perf_counter()
+        self.encoding += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.encoding -= 1
+            self.encode_ms_total += (time.perf_counter() - started) * 1000
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        finished = self.completed + self.aborted
+        admitted = finished + self.active
+        return {
+            "workers": self.workers,
+            "max_streams": self.max_streams,
+            "queue_timeout_s": self.queue_timeout,
+            "active": self.active,
+            "waiting": self.waiting,
+            "encoding": self.encoding,
+            "completed": self.completed,
+            "aborted": self.aborted,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.wait_ms_total / admitted, 2) if admitted else 0.0,
+            "max_wait_ms": round(self.wait_ms_max, 2),
+            "avg_build_ms": round(self.build_ms_total / finished, 2) if finished else 0.0,
+            "max_build_ms": round(self.build_ms_max, 2),
+            "encode_ms_total": round(self.encode_ms_total, 2),
+        }
+
+    # FUNKCJE POMOCNICZE
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._loop is not loop:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.max_streams)
+        return self._slots
+
+    async def _acquire(self):
+        slots = self._get_slots()
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise ExportPoolBusy(max(1.0, math.ceil(self.build_ms_max / 1000))) from None
+        finally:
+            self.waiting -= 1
+
+        waited_ms = (time.perf_counter() - started) * 1000
+        self.wait_ms_total += waited_ms
+        self.wait_ms_max = max(self.wait_ms_max, waited_ms)
+
+    async def _run(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        await self._acquire()
+        slots = self._slots
+        self.active += 1
+        started = time.perf_counter()
+        finished = False
+        try:
+            # pusty kawałek kończy open(): miejsce zajęte, dalej już właściwy plik
+            yield b""
+            async for chunk in chunks:
+                yield chunk
+            finished = True
+        finally:
+            self.active -= 1
+            if finished:
+                self.completed += 1
+            else:
+                self.aborted += 1
+            build_ms = (time.perf_counter() - started) * 1000
+            self.build_ms_total += build_ms
+            self.build_ms_max = max(self.build_ms_max, build_ms)
+            slots.release() # type: ignore
+            aclose = getattr(chunks, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+
+export_pool = ExportPool(settings.EXPORT_WORKERS, settings.EXPORT_MAX_STREAMS, settings.EXPORT_QUEUE_TIMEOUT)
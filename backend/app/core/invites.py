@@ -0,0 +1,78 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import update
+from sqlmodel import select, col
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import get_settings
+from app.core.cache import TTLCache
+from app.models.models import Invitation, UserRole
+
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class InviteSnapshot:
+    """Niezmienne pola zaproszenia (current_uses celowo pomijamy - to liczy baza)."""
+    token: str
+    target_role: UserRole
+    target_campaign_id: int | None
+    expires_at: datetime
+
+    @property
+    def is_expired(self) -> bool:
+        return self.expires_at <= datetime.now()
+
+@dataclass(frozen=True)
+class RedeemedInvite:
+    target_role: UserRole
+    target_campaign_id: int | None
+
+
+# krótki cache odczytów zaproszeń po tokenie; trzyma też "nie ma takiego kodu" (None),
+# bo nowe kody są losowe, więc nikt ich nie sprawdzał przed utworzeniem
+invite_cache: TTLCache[str, InviteSnapshot | None] = TTLCache(
+    "invites",
+    maxsize=settings.INVITE_CACHE_SIZE,
+    ttl=settings.INVITE_CACHE_TTL
+)
+_NOT_CACHED = object()
+
+async def get_invite(db: AsyncSession, token: str) -> InviteSnapshot | None:
+    cached = invite_cache.get(token, _NOT_CACHED)
+    if cached is not _NOT_CACHED:
+        return cached
+
+    invite = (await db.exec(select(Invitation).where(col(Invitation.token) == token))).first()
+    snapshot = InviteSnapshot(
+        token=invite.token,
+        target_role=invite.target_role,
+        target_campaign_id=invite.target_campaign_id,
+        expires_at=invite.expires_at
+    ) if invite else None
+
+    invite_cache.set(token, snapshot)
+    return snapshot
+
+async def redeem_invite(db: AsyncSession, token: str) -> RedeemedInvite | None:
+    """
+    Zużywa jedno użycie zaproszenia jednym warunkowym UPDATE ... RETURNING.
+    Limit użyć i termin sprawdza baza, więc równoległe rejestracje nie przekroczą max_uses.
+    Rola i kampania wracają z tego samego wiersza - z nich wywołujący tworzy usera i członkostwo
+    (get_invite z cache służy tylko do taniego odsiania złych kodów).
+    None = kod wygasł albo się wyczerpał. Commit robi wywołujący.
+    """
+    row = (await db.exec(
+        update(Invitation)
+        .where(col(Invitation.token) == token)
+        .where(col(Invitation.current_uses) < col(Invitation.max_uses))
+        .where(col(Invitation.expires_at) > datetime.now())
+        .values(current_uses=col(Invitation.current_uses) + 1)
+        .returning(col(Invitation.target_role), col(Invitation.target_campaign_id))
+        .execution_options(synchronize_session=False)
+    )).first()
+
+    if row is None:
+        return None
+    return RedeemedInvite(target_role=row.target_role, target_campaign_id=row.target_campaign_id)
@@ -0,0 +1,232 @@
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, List, Set
+
+from sqlalchemy import func, update
+from sqlmodel import Session, select, col
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import get_settings
+from app.core.export_cache import bump_results_version_sync
+from app.database import engine
+from app.models.models import JobStatus, RegistrationCampaign, ResolveJob
+
+settings = get_settings()
+
+# pula workerow liczacych resolve poza petla zdarzen serwera
+# (synchroniczne Session + numpy, wiec watki a nie asyncio)
+_executor = ThreadPoolExecutor(
+    max_workers=settings.RESOLVE_WORKERS,
+    thread_name_prefix="resolve-job"
+)
+
+ACTIVE_STATUSES = [JobStatus.QUEUED, JobStatus.RUNNING]
+
+# zadania tego procesu (w kolejce puli albo w trakcie) - tylko im odnawiamy dzierżawę (heartbeat_at)
+_live_jobs: Set[str] = set()
+_live_lock = threading.Lock()
+_heartbeat_stop = threading.Event()
+_heartbeat_thread: threading.Thread | None = None
+
+def create_resolve_job(db: Session | AsyncSession, campaign_id: int, requested_by: int, force: bool) -> ResolveJob:
+    """
+    Zapisuje nowe zadanie w bazie (status QUEUED). Commit i submit robi wywołujący.
+    """
+    job = ResolveJob(
+        id=uuid.uuid4().hex,
+        campaign_id=campaign_id,
+        requested_by=requested_by,
+        force=force,
+        status=JobStatus.QUEUED,
+        heartbeat_at=datetime.now()
+    )
+    db.add(job)
+    return job
+
+async def find_active_job(db: AsyncSession, campaign_id: int) -> ResolveJob | None:
+    """
+    Zwraca zadanie resolve tej kampanii, które jeszcze czeka albo się liczy.
+    Zadanie z wygasłą dzierżawą (proces padł albo został zabity) najpierw oznacza jako FAILED,
+    więc martwe zadanie nie blokuje kampanii; tę zmianę zapisuje commit wywołującego.
+    """
+    await db.exec(_expire_stale_jobs().where(col(ResolveJob.campaign_id) == campaign_id)) # type: ignore
+    return (await db.exec(
+        select(ResolveJob)
+        .where(col(ResolveJob.campaign_id) == campaign_id)
+        .where(col(ResolveJob.status).in_(ACTIVE_STATUSES))
+    )).first()
+
+def submit_resolve_job(job_id: str):
+    """Wrzuca zadanie (już zapisane w bazie) do puli workerow."""
+    with _live_lock:
+        _live_jobs.add(job_id)
+    _executor.submit(_run_resolve_job, job_id)
+
+def start_job_workers():
+    """
+    Start procesu: zadania, których nikt już nie odnawia (np. sprzed restartu), oznacza jako FAILED
+    i uruchamia wątek odnawiający dzierżawę zadań tego procesu.
+    """
+    global _heartbeat_thread
+    with Session(engine) as db:
+        expired = db.exec(_expire_stale_jobs()).rowcount # type: ignore
+        db.commit()
+    if expired:
+        print(f"Oznaczono {expired} porzuconych zadań resolve jako FAILED.")
+
+    if _heartbeat_thread is None:
+        _heartbeat_thread = threading.Thread(target=_heartbeat_loop, name="resolve-heartbeat", daemon=True)
+        _heartbeat_thread.start()
+
+def shutdown_job_workers():
+    """
+    Zamknięcie procesu: zadania z kolejki są anulowane, a wszystkie zadania tego procesu
+    oznaczone jako FAILED - inaczej blokowałyby kampanię do wygaśnięcia dzierżawy.
+    Zadanie, które mimo to zdąży się skończyć, nadpisze to swoim wynikiem (DONE).
+    """
+    _heartbeat_stop.set()
+    _executor.shutdown(wait=False, cancel_futures=True)
+    with _live_lock:
+        job_ids = list(_live_jobs)
+    if job_ids:
+        _fail_jobs(job_ids, "Serwer został zatrzymany przed końcem zadania.")
+
+
+# FUNKCJE POMOCNICZE
+
+def _run_resolve_job(job_id: str):
+    """
+    Właściwe liczenie w wątku workera, z własną sesją.
+    Postęp zapisujemy osobnymi, krótkimi transakcjami, żeby był widoczny dla GET
+    zanim główna transakcja z wynikami się zacommituje.
+    """
+    try:
+        # zadanie mogło już zostać oznaczone jako porzucone (wygasła dzierżawa, zamknięcie serwera)
+        if not _claim_job(job_id):
+            return
+
+        # numpy i cały algorytm ładujemy dopiero przy pierwszym resolve, nie przy starcie serwera
+        from app.core.assignment import resolve_campaign_logic
+
+        with Session(engine) as db:
+            job = db.get(ResolveJob, job_id)
+            campaign = db.get(RegistrationCampaign, job.campaign_id) if job else None
+            if campaign is None:
+                raise ValueError("Kampania nie istnieje.")
+
+            stats = resolve_campaign_logic(
+                db, campaign,
+                progress=lambda phase, fraction: _update_job(job_id, phase=phase, progress=fraction)
+            )
+
+            # zapis stanu kampanii razem z wynikami (jedna transakcja)
+            _update_job(job_id, phase="committing", progress=0.9)
+            campaign.last_resolved_method = campaign.assignment_method
+            campaign.is_active = False
+            campaign.ends_at = datetime.now()
+            db.add(campaign)
+            bump_results_version_sync(db, campaign.id)
+
+            commit_started = time.perf_counter()
+            db.commit()
+            if "timings_ms" in stats:
+                stats["timings_ms"]["commit"] = round((time.perf_counter() - commit_started) * 1000, 2)
+
+        _update_job(
+            job_id,
+            status=JobStatus.DONE,
+            phase="done",
+            progress=1.0,
+            stats=stats,
+            finished_at=datetime.now()
+        )
+
+    except Exception as e:
+        print(f"Błąd algorytmu (job {job_id}): {e}")
+        traceback.print_exc()
+        _update_job(
+            job_id,
+            status=JobStatus.FAILED,
+            phase="failed",
+            error=str(e),
+            finished_at=datetime.now()
+        )
+    finally:
+        with _live_lock:
+            _live_jobs.discard(job_id)
+
+def _claim_job(job_id: str) -> bool:
+    # QUEUED -> RUNNING jednym UPDATE; 0 wierszy = zadanie już zamknięte przez kogoś innego
+    now = datetime.now()
+    with Session(engine) as db:
+        result = db.exec(
+            update(ResolveJob) # type: ignore
+            .where(col(ResolveJob.id) == job_id)
+            .where(col(ResolveJob.status) == JobStatus.QUEUED)
+            .values(status=JobStatus.RUNNING, phase="loading", progress=0.0, started_at=now, heartbeat_at=now)
+        )
+        db.commit()
+        return result.rowcount == 1
+
+def _update_job(job_id: str, **fields: Any):
+    # każdy zapis postępu odnawia też dzierżawę
+    fields.setdefault("heartbeat_at", datetime.now())
+    with Session(engine) as db:
+        job = db.get(ResolveJob, job_id)
+        if job is None:
+            return
+        for key, value in fields.items():
+            setattr(job, key, value)
+        db.add(job)
+        db.commit()
+
+def _expire_stale_jobs():
+    # aktywne zadania bez odnowienia dzierżawy dłużej niż RESOLVE_JOB_LEASE_SECONDS
+    # (stare wiersze bez heartbeat_at liczymy od created_at)
+    now = datetime.now()
+    deadline = now - timedelta(seconds=settings.RESOLVE_JOB_LEASE_SECONDS)
+    return (
+        update(ResolveJob)
+        .where(col(ResolveJob.status).in_(ACTIVE_STATUSES))
+        .where(func.coalesce(col(ResolveJob.heartbeat_at), col(ResolveJob.created_at)) < deadline)
+        .values(
+            status=JobStatus.FAILED,
+            phase="failed",
+            error="Zadanie porzucone (brak odnowienia dzierżawy - proces został zatrzymany).",
+            finished_at=now
+        )
+    )
+
+def _fail_jobs(job_ids: List[str], error: str):
+    with Session(engine) as db:
+        db.exec(
+            update(ResolveJob) # type: ignore
+            .where(col(ResolveJob.id).in_(job_ids))
+            .where(col(ResolveJob.status).in_(ACTIVE_STATUSES))
+            .values(status=JobStatus.FAILED, phase="failed", error=error, finished_at=datetime.now())
+        )
+        db.commit()
+
+def _heartbeat_loop():
+    # odnawiamy dzierżawę 3x w jej czasie, żeby jedno nieudane odnowienie nie zabijało zadania
+    interval = max(1.0, settings.RESOLVE_JOB_LEASE_SECONDS / 3)
+    while not _heartbeat_stop.wait(interval):
+        with _live_lock:
+            job_ids = list(_live_jobs)
+        if not job_ids:
+            continue
+        try:
+            with Session(engine) as db:
+                db.exec(
+                    update(ResolveJob) # type: ignore
+                    .where(col(ResolveJob.id).in_(job_ids))
+                    .where(col(ResolveJob.status).in_(ACTIVE_STATUSES))
+                    .values(heartbeat_at=datetime.now())
+                )
+                db.commit()
+        except Exception as e:
+            print(f"Nie udało się odnowić dzierżawy zadań resolve: {e}")
@@ -0,0 +1,266 @@
+import asyncio
+import hashlib
+import math
+import time
+from dataclasses import dataclass
+from email.message import EmailMessage
+from typing import Any, Dict, List, Tuple, Type
+
+import aiosmtplib
+import httpx
+
+from app.config import get_settings
+from app.core.mailer import SmtpSender, smtp_sender
+
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class OutgoingEmail:
+    recipient: str
+    subject: str
+    html: str
+    # stały klucz wiadomości (np. id z outboxa) - ponowiona wysyłka nie wyśle jej drugi raz
+    idempotency_key: str | None = None
+
+
+class MailRejectedError(Exception):
+    """Dostawca odrzucił konkretną wiadomość (zły adres, treść...) - to nie jest awaria usługi."""
+
+
+class MailBackend:
+    """
+    Sposób wysyłki maili. Backend sam dba o swoje połączenia (pula SMTP, klient HTTP keep-alive).
+
+    send_batch zwraca listę błędów (None = wysłany) w kolejności wiadomości. Jeśli żadna wiadomość
+    z paczki nie poszła z powodu awarii usługi (a nie odrzucenia konkretnego maila), rzuca
+    pierwszym błędem - dzięki temu bezpiecznik widzi awarię tak samo jak przy pojedynczym send.
+    """
+    name = "base"
+    # błędy "ta wiadomość jest zła", które nie świadczą o awarii usługi
+    rejected_errors: Tuple[Type[BaseException], ...] = (MailRejectedError,)
+
+    async def send(self, email: OutgoingEmail):
+        raise NotImplementedError
+
+    async def send_batch(self, emails: List[OutgoingEmail]) -> List[Exception | None]:
+        results = await asyncio.gather(*(self.send(email) for email in emails), return_exceptions=True)
+        return self._check_batch([r if isinstance(r, Exception) else None for r in results])
+
+    async def close(self):
+        pass
+
+    def claim_size(self, default: int, lease_seconds: float) -> int:
+        """
+        Ile wiadomości dispatcher outboxa powinien brać naraz dla tego backendu. Cała paczka
+        musi zdążyć wyjść przed końcem dzierżawy (lease_seconds), inaczej wróci do kolejki i pójdzie drugi raz.
+        """
+        return max(1, default)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+    def _check_batch(self, errors: List[Exception | None]) -> List[Exception | None]:
+        outages = [e for e in errors if e is not None and not isinstance(e, self.rejected_errors)]
+        if errors and len(outages) == len(errors):
+            raise outages[0]
+        return errors
+
+
+class SmtpBackend(MailBackend):
+    """Wysyłka przez SMTP, na wspólnej puli połączeń SmtpSender (z limitem maili na minutę)."""
+    name = "smtp"
+    rejected_errors = (
+        MailRejectedError,
+        aiosmtplib.SMTPRecipientsRefused, aiosmtplib.SMTPRecipientRefused,
+        aiosmtplib.SMTPSenderRefused, aiosmtplib.SMTPDataError
+    )
+
+    def __init__(self, sender: SmtpSender, from_address: str):
+        self.sender = sender
+        self.from_address = from_address
+
+    async def send(self, email: OutgoingEmail):
+        message = EmailMessage()
+        message["From"] = self.from_address
+        message["To"] = email.recipient
+        message["Subject"] = email.subject
+
+        message.add_header('Content-Type','text/html')
+        message.set_payload(email.html.encode("UTF-8"))
+
+        await self.sender.send(message)
+
+    async def close(self):
+        await self.sender.close()
+
+    def claim_size(self, default: int, lease_seconds: float) -> int:
+        # przy pustym kubełku paczka n maili wychodzi w n / rate sekund - mieścimy ją w połowie dzierżawy
+        rate = self.sender.bucket.rate
+        if rate <= 0:
+            return max(1, default)
+        return max(1, min(default, int(lease_seconds / 2 * rate)))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"backend": self.name, **self.sender.snapshot()}
+
+
+class ResendBackend(MailBackend):
+    """
+    Wysyłka przez HTTP API Resend. Jeden współdzielony klient httpx (keep-alive, HTTP/1.1),
+    więc kolejne zapytania nie robią nowego TCP + TLS. Paczki idą przez /emails/batch
+    (do `batch_size` maili w jednym zapytaniu), więc 500 zaproszeń to kilka zapytań.
+
+    Każde zapytanie ma nagłówek Idempotency-Key wyliczony z kluczy wiadomości, więc ponowienie
+    po timeoucie (Resend przyjął, odpowiedź nie doszła) nie wysyła maili drugi raz.
+    Paczkę odrzuconą przez walidację (400/422 - wystarczy jeden zły adres) wysyłamy jeszcze raz
+    pojedynczo przez /emails, żeby odrzucona została tylko zła wiadomość.
+    """
+    name = "resend"
+
+    def __init__(self, api_key: str, from_address: str, base_url: str, timeout: float, batch_size: int, max_connections: int = 4):
+        self.api_key = api_key
+        self.from_address = from_address
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.batch_size = max(1, batch_size)
+        self.max_connections = max(1, max_connections)
+        self._client: httpx.AsyncClient | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+        self.requests = 0
+        self.batch_requests = 0
+        self.batch_fallbacks = 0
+        self.sent = 0
+        self.errors = 0
+        self.request_ms_total = 0.0
+
+    async def send(self, email: OutgoingEmail):
+        await self._post("/emails", self._payload(email), email.idempotency_key)
+        self.sent += 1
+
+    async def send_batch(self, emails: List[OutgoingEmail]) -> List[Exception | None]:
+        chunks = [emails[i:i + self.batch_size] for i in range(0, len(emails), self.batch_size)]
+        results = await asyncio.gather(*(self._send_chunk(chunk) for chunk in chunks), return_exceptions=True)
+
+        errors: List[Exception | None] = []
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, list):
+                errors.extend(result)
+            elif isinstance(result, Exception):
+                errors.extend([result] * len(chunk))
+            else:
+                raise result # anulowanie
+        return self._check_batch(errors)
+
+    def claim_size(self, default: int, lease_seconds: float) -> int:
+        # pełne paczki /emails/batch: przy domyślnych 20 i RESEND_BATCH_SIZE=100 dispatcher bierze 100
+        return math.ceil(max(1, default) / self.batch_size) * self.batch_size
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "base_url": self.base_url,
+            "batch_size": self.batch_size,
+            "requests": self.requests,
+            "batch_requests": self.batch_requests,
+            "batch_fallbacks": self.batch_fallbacks,
+            "sent": self.sent,
+            "errors": self.errors,
+            "avg_request_ms": round(self.request_ms_total / self.requests, 2) if self.requests else 0.0,
+        }
+
+    # FUNKCJE POMOCNICZE
+
+    async def _send_chunk(self, chunk: List[OutgoingEmail]) -> List[Exception | None]:
+        self.batch_requests += 1
+        try:
+            await self._post("/emails/batch", [self._payload(email) for email in chunk], _batch_key(chunk))
+        except MailRejectedError:
+            # batch jest "wszystko albo nic" - nic nie poszło, więc szukamy złej wiadomości pojedynczo
+            self.batch_fallbacks += 1
+            results = await asyncio.gather(*(self.send(email) for email in chunk), return_exceptions=True)
+            for result in results:
+                if isinstance(result, BaseException) and not isinstance(result, Exception):
+                    raise result # anulowanie
+            return [result if isinstance(result, Exception) else None for result in results]
+        self.sent += len(chunk)
+        return [None] * len(chunk)
+
+    def _payload(self, email: OutgoingEmail) -> Dict[str, Any]:
+        return {
+            "from": self.from_address,
+            "to": [email.recipient],
+            "subject": email.subject,
+            "html": email.html,
+        }
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # klient (i jego pula połączeń) należy do jednej pętli zdarzeń
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._loop = loop
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=60
+                )
+            )
+        return self._client
+
+    async def _post(self, path: str, payload: Any, idempotency_key: str | None = None) -> Any:
+        started = time.perf_counter()
+        self.requests += 1
+        headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
+        try:
+            response = await self._get_client().post(path, json=payload, headers=headers)
+        except httpx.HTTPError:
+            self.errors += 1
+            raise
+        finally:
+            self.request_ms_total += (time.perf_counter() - started) * 1000
+
+        if response.status_code >= 400:
+            self.errors += 1
+            detail = f"Resend {response.status_code}: {response.text[:200]}"
+            # 400/422 - zła wiadomość; reszta (401/403 zły klucz, 429 limit, 5xx) to problem z usługą
+            if response.status_code in (400, 422):
+                raise MailRejectedError(detail)
+            raise httpx.HTTPStatusError(detail, request=response.request, response=response)
+        return response.json()
+
+
+def _batch_key(chunk: List[OutgoingEmail]) -> str | None:
+    # ta sama paczka wiadomości = ten sam klucz; bez kluczy wiadomości nie ma czego powtarzać
+    keys = [email.idempotency_key for email in chunk]
+    if not all(keys):
+        return None
+    return "batch-" + hashlib.sha256(",".join(keys).encode()).hexdigest()[:32] # type: ignore
+
+
+def create_mail_backend() -> MailBackend:
+    """Backend z MAIL_BACKEND (smtp / resend)."""
+    backend = settings.MAIL_BACKEND.lower()
+    if backend == "smtp":
+        return SmtpBackend(smtp_sender, settings.SMTP_FROM)
+    if backend == "resend":
+        return ResendBackend(
+            api_key=settings.RESEND_API_KEY,
+            from_address=settings.RESEND_EMAIL_FROM,
+            base_url=settings.RESEND_API_URL,
+            timeout=settings.RESEND_TIMEOUT,
+            batch_size=settings.RESEND_BATCH_SIZE
+        )
+    raise ValueError(f"Nieznany MAIL_BACKEND: {settings.MAIL_BACKEND} (dostępne: smtp, resend)")
+
+
+mail_backend = create_mail_backend()
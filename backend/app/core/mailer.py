@@ -0,0 +1,225 @@
+import asyncio
+import time
+from email.message import EmailMessage
+from typing import Any, Dict, List
+
+import aiosmtplib
+
+from app.config import get_settings
+
+settings = get_settings()
+
+
+class TokenBucket:
+    """
+    Limit wysyłki: `rate` tokenów na minutę, najwyżej `burst` naraz.
+    acquire() czeka na token zamiast rzucać błędem, więc nadmiar maili po prostu się kolejkuje
+    (kolejność FIFO trzyma lock - kto pierwszy czeka, ten pierwszy wysyła).
+    """
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate = rate_per_minute / 60.0 # tokeny na sekundę
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    async def acquire(self):
+        # rate <= 0 = bez limitu
+        if self.rate <= 0:
+            return
+        started = time.monotonic()
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            self.waits += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class SmtpSender:
+    """
+    Długo żyjący nadawca SMTP: trzyma do `pool_size` zalogowanych połączeń i używa ich
+    ponownie dla kolejnych maili (bez nowego TCP + STARTTLS + AUTH na każdą wiadomość).
+    Tempo wysyłki ogranicza TokenBucket. Połączenie zerwane przez serwer (np. po bezczynności)
+    jest otwierane od nowa i wiadomość idzie jeszcze raz (tylko raz).
+    """
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: str | None,
+        password: str | None,
+        start_tls: bool,
+        pool_size: int,
+        timeout: float,
+        rate_per_minute: float,
+        burst: int
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.start_tls = start_tls
+        self.pool_size = max(1, pool_size)
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate_per_minute, burst)
+
+        self._idle: List[aiosmtplib.SMTP] = []
+        self._slots: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+        self.sent = 0
+        self.errors = 0
+        self.connects = 0
+        self.reuses = 0
+        self.reconnects = 0
+        self.in_use = 0
+        self.send_ms_total = 0.0
+
+    async def send(self, message: EmailMessage):
+        """Wysyła wiadomość (czeka na token i wolne połączenie). Błędy SMTP lecą do wywołującego."""
+        self._bind_loop()
+        await self.bucket.acquire()
+
+        assert self._slots is not None
+        async with self._slots:
+            self.in_use += 1
+            started = time.perf_counter()
+            try:
+                await self._send_pooled(message)
+            except Exception:
+                self.errors += 1
+                raise
+            else:
+                self.sent += 1
+                self.send_ms_total += (time.perf_counter() - started) * 1000
+            finally:
+                self.in_use -= 1
+
+    async def close(self):
+        """Zamyka bezczynne połączenia (shutdown serwera)."""
+        idle, self._idle = self._idle, []
+        for smtp in idle:
+            await _quit(smtp)
+
+    def snapshot(self) -> Dict[str, Any]:
+        bucket = self.bucket
+        return {
+            "host": f"{self.hostname}:{self.port}",
+            "pool_size": self.pool_size,
+            "idle_connections": len(self._idle),
+            "in_use": self.in_use,
+            "sent": self.sent,
+            "errors": self.errors,
+            "connects": self.connects,
+            "reuses": self.reuses,
+            "reconnects": self.reconnects,
+            "avg_send_ms": round(self.send_ms_total / self.sent, 2) if self.sent else 0.0,
+            "rate_per_minute": round(bucket.rate * 60, 2),
+            "burst": bucket.burst,
+            "throttled": bucket.waits,
+            "throttle_wait_avg_ms": round(bucket.wait_total / bucket.waits * 1000, 2) if bucket.waits else 0.0,
+            "throttle_wait_max_ms": round(bucket.wait_max * 1000, 2),
+        }
+
+    # FUNKCJE POMOCNICZE
+
+    def _bind_loop(self):
+        # połączenia i semafor należą do jednej pętli zdarzeń (np. restart serwera w tym samym procesie)
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._idle = []
+        self._slots = asyncio.Semaphore(self.pool_size)
+        self.bucket._lock = asyncio.Lock()
+
+    async def _send_pooled(self, message: EmailMessage):
+        smtp = await self._checkout()
+        try:
+            await smtp.send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:
+            # serwer zamknął bezczynne połączenie - jedna próba na świeżym
+            await _quit(smtp)
+            self.reconnects += 1
+            smtp = await self._connect()
+            try:
+                await smtp.send_message(message)
+            except BaseException:
+                smtp.close()
+                raise
+        except aiosmtplib.SMTPResponseException:
+            # serwer odrzucił wiadomość, ale połączenie jest zdrowe - RSET i z powrotem do puli
+            await _reset_or_quit(smtp, self._idle)
+            raise
+        except BaseException:
+            # timeout, zerwane TLS, anulowanie... - takiego połączenia nie oddajemy do puli
+            smtp.close()
+            raise
+        self._idle.append(smtp)
+
+    async def _checkout(self) -> aiosmtplib.SMTP:
+        while self._idle:
+            smtp = self._idle.pop()
+            if smtp.is_connected:
+                self.reuses += 1
+                return smtp
+        return await self._connect()
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username or None,
+            password=self.password or None,
+            start_tls=self.start_tls,
+            timeout=self.timeout
+        )
+        # connect() robi EHLO, STARTTLS i AUTH
+        await smtp.connect()
+        self.connects += 1
+        return smtp
+
+
+async def _quit(smtp: aiosmtplib.SMTP):
+    try:
+        if smtp.is_connected:
+            await smtp.quit()
+    except Exception:
+        smtp.close()
+
+async def _reset_or_quit(smtp: aiosmtplib.SMTP, idle: List[aiosmtplib.SMTP]):
+    try:
+        await smtp.rset()
+    except Exception:
+        await _quit(smtp)
+    else:
+        idle.append(smtp)
+
+
+smtp_sender = SmtpSender(
+    hostname=settings.SMTP_HOST,
+    port=settings.SMTP_PORT,
+    username=settings.SMTP_USER,
+    password=settings.SMTP_PASSWORD,
+    start_tls=settings.SMTP_STARTTLS,
+    pool_size=settings.SMTP_POOL_SIZE,
+    timeout=settings.SMTP_TIMEOUT,
+    rate_per_minute=settings.SMTP_RATE_PER_MINUTE,
+    burst=settings.SMTP_BURST
+)
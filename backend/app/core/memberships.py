@@ -0,0 +1,69 @@
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import func, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, select, col
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.models import CampaignMembership, User
+
+
+def _insert_membership(user_id: int, campaign_id: int):
+    # ON CONFLICT DO NOTHING: dwa równoległe zaproszenia tego samego usera nie wywalą unique
+    return (
+        insert(CampaignMembership)
+        .values(user_id=user_id, campaign_id=campaign_id)
+        .on_conflict_do_nothing(index_elements=["user_id", "campaign_id"])
+    )
+
+# kanał NOTIFY z unieważnionymi wersjami claimów ("user_id:wersja"), słucha go claims.claims_revocations
+CLAIMS_CHANNEL = "claims_revoked"
+
+
+def _bump_claims_version(user_id: int):
+    # nowa wersja uprawnień usera - tokeny z claimami wydane wcześniej stają się nieaktualne
+    return (
+        update(User)
+        .where(col(User.id) == user_id)
+        .values(claims_version=col(User.claims_version) + 1, claims_updated_at=datetime.now())
+        .returning(col(User.claims_version))
+    )
+
+def _notify_claims(user_id: int, version: int):
+    # NOTIFY w transakcji idzie do słuchaczy dopiero po commicie (a po rollbacku wcale)
+    return select(func.pg_notify(CLAIMS_CHANNEL, f"{user_id}:{version}"))
+
+async def add_membership(db: AsyncSession, user_id: int, campaign_id: int) -> int | None:
+    """
+    Daje userowi dostęp do kampanii i podbija users.claims_version.
+    Zwraca nową wersję uprawnień albo None, jeśli user już miał dostęp.
+    Commit robi wywołujący (a po nim invalidate_user).
+    """
+    result = await db.exec(_insert_membership(user_id, campaign_id))
+    if result.rowcount == 0:
+        return None
+    version = (await db.exec(_bump_claims_version(user_id))).scalar_one()
+    await db.exec(_notify_claims(user_id, version))
+    return version
+
+def add_membership_sync(db: Session, user_id: int, campaign_id: int) -> int | None:
+    """Wersja dla synchronicznej sesji (/debug, skrypty)."""
+    result = db.exec(_insert_membership(user_id, campaign_id))
+    if result.rowcount == 0:
+        return None
+    version = db.exec(_bump_claims_version(user_id)).scalar_one()
+    db.exec(_notify_claims(user_id, version))
+    return version
+
+async def user_campaign_ids(db: AsyncSession, user_id: int) -> List[int]:
+    return list((await db.exec(
+        select(CampaignMembership.campaign_id)
+        .where(col(CampaignMembership.user_id) == user_id)
+    )).all())
+
+def user_campaign_ids_sync(db: Session, user_id: int) -> List[int]:
+    return list(db.exec(
+        select(CampaignMembership.campaign_id)
+        .where(col(CampaignMembership.user_id) == user_id)
+    ).all())
@@ -0,0 +1,308 @@
+import asyncio
+import time
+import traceback
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from sqlalchemy import text, update
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlmodel import select, col
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import get_settings
+from app.core.circuit_breaker import CircuitOpenError
+from app.core.mail_backends import OutgoingEmail, mail_backend
+from app.core.security import send_emails
+from app.database import async_engine
+from app.models.models import EmailOutbox, EmailStatus
+
+settings = get_settings()
+
+# ile sekund wiadomość jest "zajęta" przez dispatcher; po tym czasie (np. crash w trakcie wysyłki)
+# wraca do puli i zostanie wysłana jeszcze raz
+SEND_LEASE_SECONDS = 120
+# ile czekamy przy shutdownie na wysyłane właśnie maile
+CLOSE_TIMEOUT_SECONDS = 10
+# górny limit odstępu między kolejnymi próbami
+MAX_RETRY_DELAY_SECONDS = 3600
+# klucz blokady doradczej dispatchera: wysyła tylko proces, który ją trzyma
+DISPATCHER_LOCK_KEY = 73160002
+
+
+@dataclass
+class OutboxMessage:
+    id: int
+    recipient: str
+    subject: str
+    body: str
+    attempts: int # razem z bieżącą próbą
+
+
+def enqueue_email(db: AsyncSession, recipient: str, subject: str, body: str) -> EmailOutbox:
+    """
+    Dodaje maila do outboxa w bieżącej transakcji. Commit robi wywołujący,
+    a po nim warto zawołać email_dispatcher.notify(), żeby nie czekać na kolejny obrót pętli.
+    """
+    message = EmailOutbox(recipient=recipient, subject=subject, body=body)
+    db.add(message)
+    return message
+
+def mask_email(address: str) -> str:
+    """Adres do podglądu outboxa: st***@student.uken.krakow.pl (domena zostaje - po niej widać problemy z dostawą)."""
+    local, _, domain = address.partition("@")
+    return f"{local[:2]}***@{domain}" if domain else "***"
+
+def retry_delay(attempts: int) -> timedelta:
+    """Backoff wykładniczy: base, 2*base, 4*base... (attempts = liczba nieudanych prób)."""
+    seconds = settings.EMAIL_RETRY_BASE_SECONDS * 2 ** max(0, attempts - 1)
+    return timedelta(seconds=min(seconds, MAX_RETRY_DELAY_SECONDS))
+
+
+class EmailDispatcher:
+    """
+    Zadanie w tle wysyłające maile z tabeli email_outbox.
+
+    Wiadomości są "wypożyczane" paczkami jednym UPDATE ... RETURNING (z FOR UPDATE SKIP LOCKED,
+    więc kilka procesów nie weźmie tej samej wiadomości), wysyłane poza transakcją jedną paczką
+    przez backend pocztowy, a wyniki są zapisywane krótkimi transakcjami. Nieudane wracają do kolejki
+    z backoffem, po EMAIL_MAX_ATTEMPTS próbach dostają status failed.
+
+    Wysyła jeden dispatcher na całą bazę: proces, który trzyma blokadę doradczą DISPATCHER_LOCK_KEY
+    (na własnym połączeniu). Dzięki temu limit wysyłki SMTP (token bucket w procesie) jest limitem
+    globalnym, a nie N x limit przy N workerach. Pozostałe procesy co poll_interval próbują przejąć
+    blokadę - zwalnia się, gdy lider się zamknie albo padnie (koniec jego sesji w bazie).
+    """
+    def __init__(self, batch_size: int, poll_interval: float):
+        self.batch_size = max(1, batch_size)
+        self.poll_interval = poll_interval
+
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._closing = False
+        self._leader_conn: AsyncConnection | None = None
+
+        self.batches = 0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.short_circuited = 0
+        self.last_error: str | None = None
+        self.last_batch_size = 0
+        self.send_ms_total = 0.0
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        self._loop = loop
+        self._wake = asyncio.Event()
+        self._closing = False
+        self._task = loop.create_task(self._run())
+
+    def notify(self):
+        """Budzi dispatcher (np. po commicie nowego maila), zamiast czekać poll_interval."""
+        if self._task is not None and not self._task.done():
+            self._wake.set()
+
+    async def close(self):
+        """Kończy bieżącą paczkę (najwyżej CLOSE_TIMEOUT_SECONDS) i zatrzymuje pętlę; reszta zostaje w bazie."""
+        if self._task is None or self._task.done():
+            return
+        self._closing = True
+        self._wake.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=CLOSE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            # maile czekające na limit wysyłki - przerwane zostają z dzierżawą i wrócą po SEND_LEASE_SECONDS
+            print("Dispatcher maili przerwany przy zamykaniu serwera.")
+        self._task = None
+        await self._resign()
+
+    async def dispatch_once(self) -> int:
+        """Jeden obrót pętli: wypożycza paczkę i ją wysyła. Zwraca liczbę wziętych wiadomości."""
+        messages = await self._claim_batch()
+        if not messages:
+            return 0
+
+        if self._closing:
+            await self._release([m.id for m in messages])
+            return len(messages)
+
+        # cała paczka naraz - Resend wysyła ją kilkoma zapytaniami /emails/batch, SMTP równolegle na puli
+        started = time.perf_counter()
+        try:
+            errors = await send_emails([
+                OutgoingEmail(m.recipient, m.subject, m.body, idempotency_key=f"outbox-{m.id}") for m in messages
+            ])
+        except CircuitOpenError as e:
+            # usługa leży - nie było próby, więc jej nie liczymy; wracamy, gdy bezpiecznik da próbę
+            self.short_circuited += len(messages)
+            await self._release([m.id for m in messages], delay=e.retry_after)
+            return len(messages)
+        except Exception as e:
+            errors = [e] * len(messages)
+        self.send_ms_total += (time.perf_counter() - started) * 1000
+
+        sent_ids = [m.id for m, error in zip(messages, errors) if error is None]
+        if sent_ids:
+            self.sent += len(sent_ids)
+            await self._update(sent_ids, status=EmailStatus.SENT, sent_at=datetime.now(), last_error=None)
+        for message, error in zip(messages, errors):
+            if error is not None:
+                self.last_error = f"{type(error).__name__}: {error}"
+                await self._record_failure(message, self.last_error)
+
+        self.batches += 1
+        self.last_batch_size = len(messages)
+        return len(messages)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "leader": self._leader_conn is not None,
+            "batch_size": self.batch_size,
+            "poll_interval_s": self.poll_interval,
+            "batches": self.batches,
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "short_circuited": self.short_circuited,
+            "last_batch_size": self.last_batch_size,
+            "avg_batch_send_ms": round(self.send_ms_total / self.batches, 2) if self.batches else 0.0,
+            "last_error": self.last_error,
+        }
+
+    # FUNKCJE POMOCNICZE
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                # nie-lider nic nie wysyła, tylko czeka na swoją kolej
+                taken = await self.dispatch_once() if await self._ensure_leader() else 0
+            except Exception as e:
+                print(f"Błąd dispatchera maili: {e}")
+                traceback.print_exc()
+                taken = 0
+
+            # pełna paczka = pewnie jest więcej, bierzemy od razu następną
+            if taken >= self.batch_size or self._closing:
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def _ensure_leader(self) -> bool:
+        """Czy ten proces jest dispatcherem; jeśli nikt nie jest - próbuje nim zostać."""
+        if self._leader_conn is not None:
+            try:
+                # blokada żyje tyle co sesja - zerwane połączenie = już nie jesteśmy liderem
+                await self._leader_conn.execute(text("SELECT 1"))
+                return True
+            except Exception as e:
+                print(f"Dispatcher maili stracił połączenie z blokadą: {e}")
+                await self._resign()
+
+        # AUTOCOMMIT: połączenie trzyma tylko blokadę sesyjną, bez otwartej transakcji
+        conn = await (await async_engine.connect()).execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            acquired = (await conn.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": DISPATCHER_LOCK_KEY}
+            )).scalar_one()
+        except BaseException:
+            await conn.close()
+            raise
+        if not acquired:
+            await conn.close()
+            return False
+        self._leader_conn = conn
+        return True
+
+    async def _resign(self):
+        conn, self._leader_conn = self._leader_conn, None
+        if conn is None:
+            return
+        try:
+            await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": DISPATCHER_LOCK_KEY})
+        except Exception:
+            pass # zerwane połączenie - blokada i tak zniknęła z sesją
+        finally:
+            await conn.close()
+
+    async def _claim_batch(self) -> List[OutboxMessage]:
+        now = datetime.now()
+        claimable = (
+            select(EmailOutbox.id)
+            .where(col(EmailOutbox.status).in_([EmailStatus.PENDING, EmailStatus.SENDING]))
+            .where(col(EmailOutbox.next_attempt_at) <= now)
+            .order_by(col(EmailOutbox.next_attempt_at), col(EmailOutbox.id))
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        async with AsyncSession(async_engine, expire_on_commit=False) as db:
+            rows = (await db.exec(
+                update(EmailOutbox)
+                .where(col(EmailOutbox.id).in_(claimable))
+                .values(
+                    status=EmailStatus.SENDING,
+                    attempts=col(EmailOutbox.attempts) + 1,
+                    next_attempt_at=now + timedelta(seconds=SEND_LEASE_SECONDS)
+                )
+                .returning(
+                    col(EmailOutbox.id), col(EmailOutbox.recipient), col(EmailOutbox.subject),
+                    col(EmailOutbox.body), col(EmailOutbox.attempts)
+                )
+                .execution_options(synchronize_session=False)
+            )).all()
+            await db.commit()
+
+        messages = [OutboxMessage(row.id, row.recipient, row.subject, row.body, row.attempts) for row in rows]
+        messages.sort(key=lambda m: m.id)
+        return messages
+
+    async def _record_failure(self, message: OutboxMessage, error: str):
+        if message.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+            self.failed += 1
+            await self._update([message.id], status=EmailStatus.FAILED, last_error=error)
+        else:
+            self.retried += 1
+            await self._update(
+                [message.id],
+                status=EmailStatus.PENDING,
+                next_attempt_at=datetime.now() + retry_delay(message.attempts),
+                last_error=error
+            )
+
+    async def _release(self, ids: List[int], delay: float = 0.0):
+        # niewysłane (shutdown w trakcie paczki, otwarty bezpiecznik) oddajemy bez liczenia próby
+        async with AsyncSession(async_engine, expire_on_commit=False) as db:
+            await db.exec(
+                update(EmailOutbox)
+                .where(col(EmailOutbox.id).in_(ids))
+                .values(
+                    status=EmailStatus.PENDING,
+                    attempts=col(EmailOutbox.attempts) - 1,
+                    next_attempt_at=datetime.now() + timedelta(seconds=delay)
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+
+    async def _update(self, ids: List[int], **fields: Any):
+        async with AsyncSession(async_engine, expire_on_commit=False) as db:
+            await db.exec(
+                update(EmailOutbox)
+                .where(col(EmailOutbox.id).in_(ids))
+                .values(**fields)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+
+
+email_dispatcher = EmailDispatcher(
+    batch_size=mail_backend.claim_size(settings.EMAIL_OUTBOX_BATCH_SIZE, SEND_LEASE_SECONDS),
+    poll_interval=settings.EMAIL_OUTBOX_POLL_SECONDS
+)
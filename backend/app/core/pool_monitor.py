@@ -0,0 +1,93 @@
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import Pool
+
+
+class PoolMonitor:
+    """
+    Statystyki puli połączeń jednego silnika: czas oczekiwania na połączenie,
+    liczba zajętych połączeń, połączenia ponad pool_size (overflow) i timeouty.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._pool: Pool | None = None
+
+        self.checkouts = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+        self.timeouts = 0
+        self.connects = 0
+        self.overflow_connects = 0
+        self.in_use_peak = 0
+
+    def attach(self, pool: Pool):
+        """Podpina hooki pod pulę silnika (przeżywają engine.dispose(), bo recreate kopiuje dispatch)."""
+        self._pool = pool
+        event.listen(pool, "connect", self._on_connect)
+
+    def record_checkout(self, pool: Pool, seconds: float):
+        with self._lock:
+            # po engine.dispose() pula jest nową instancją, więc trzymamy ostatnią widzianą
+            self._pool = pool
+            self.checkouts += 1
+            self.checkout_wait_total += seconds
+            self.checkout_wait_max = max(self.checkout_wait_max, seconds)
+            self.in_use_peak = max(self.in_use_peak, _checked_out(pool))
+
+    def record_timeout(self, seconds: float):
+        with self._lock:
+            self.timeouts += 1
+            self.checkout_wait_max = max(self.checkout_wait_max, seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        pool = self._pool
+        with self._lock:
+            return {
+                "pool": pool.status() if pool is not None else None,
+                "size": pool.size() if pool is not None and hasattr(pool, "size") else None,
+                "in_use": _checked_out(pool) if pool is not None else 0,
+                "in_use_peak": self.in_use_peak,
+                "overflow": pool.overflow() if pool is not None and hasattr(pool, "overflow") else 0,
+                "checkouts": self.checkouts,
+                "checkout_wait_avg_ms": round(self.checkout_wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "checkout_wait_max_ms": round(self.checkout_wait_max * 1000, 3),
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "overflow_connects": self.overflow_connects,
+            }
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        # nowe fizyczne połączenie; overflow() > 0 oznacza, że wyszliśmy ponad pool_size
+        pool = self._pool
+        with self._lock:
+            self.connects += 1
+            if pool is not None and hasattr(pool, "overflow") and pool.overflow() > 0:
+                self.overflow_connects += 1
+
+
+def instrumented_pool_class(base: type[Pool], monitor: PoolMonitor) -> type[Pool]:
+    """
+    Podklasa puli mierząca czas pobrania połączenia (łącznie z czekaniem w kolejce).
+    SQLAlchemy nie ma eventu "przed checkoutem", więc mierzymy w samym Pool.connect().
+    """
+    class InstrumentedPool(base):  # type: ignore[valid-type, misc]
+        def connect(self):
+            started = time.perf_counter()
+            try:
+                connection = super().connect()
+            except exc.TimeoutError:
+                monitor.record_timeout(time.perf_counter() - started)
+                raise
+            monitor.record_checkout(self, time.perf_counter() - started)
+            return connection
+
+    InstrumentedPool.__name__ = f"Instrumented{base.__name__}"
+    return InstrumentedPool
+
+
+def _checked_out(pool: Pool | None) -> int:
+    return pool.checkedout() if pool is not None and hasattr(pool, "checkedout") else 0
@@ -0,0 +1,333 @@
+import asyncio
+import time
+import traceback
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import and_
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import select, col
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import get_settings
+from app.core.counters import apply_counter_deltas, counter_deltas, merge_counter_deltas
+from app.database import async_engine
+from app.models.models import (
+    CampaignMembership,
+    Invitation,
+    Registration,
+    RegistrationCampaign,
+    RegistrationGroup,
+    RegistrationStatus,
+    User
+)
+
+settings = get_settings()
+
+
+@dataclass
+class PreferenceSubmission:
+    """Zwalidowany wniosek studenta gotowy do zapisu."""
+    user_id: int
+    campaign_id: int
+    preferences: List[Tuple[int, int]] # (id grupy w bazie, priorytet)
+    # czas przyjęcia zapytania, nie zapisu - FCFS nie może zależeć od tego, kiedy zrobił się flush
+    submitted_at: datetime
+
+@dataclass
+class SubmissionContext:
+    """Wszystko, czego /student/register potrzebuje o kampanii z zaproszenia (jedno zapytanie)."""
+    campaign_id: int
+    title: str
+    starts_at: datetime
+    ends_at: datetime
+    group_ids: List[int] # posortowane id grup kampanii
+    is_member: bool # czy user ma wpis w campaign_memberships
+
+    @property
+    def group_id_offset(self) -> int:
+        # frontend numeruje grupy od 1, w bazie są to kolejne id od najmniejszego
+        return self.group_ids[0] - 1
+
+@dataclass
+class SubmissionResult:
+    replaced: bool # czy nadpisano wcześniejszy wniosek
+    submitted_count: int
+
+
+async def load_submission_context(db: AsyncSession, invite: str, user_id: int) -> SubmissionContext | None:
+    """
+    Zaproszenie -> kampania -> grupy + członkostwo usera w jednym zapytaniu
+    (wiersz na grupę). Zwraca None, jeśli kod nie prowadzi do kampanii z grupami.
+    """
+    rows = (await db.exec(
+        select(
+            RegistrationCampaign.id,
+            RegistrationCampaign.title,
+            RegistrationCampaign.starts_at,
+            RegistrationCampaign.ends_at,
+            RegistrationGroup.id.label("group_id"), # type: ignore
+            CampaignMembership.user_id.label("member_id") # type: ignore
+        )
+        .select_from(Invitation)
+        .join(RegistrationCampaign, col(RegistrationCampaign.id) == col(Invitation.target_campaign_id))
+        .join(RegistrationGroup, col(RegistrationGroup.campaign_id) == col(RegistrationCampaign.id))
+        .outerjoin(CampaignMembership, and_(
+            col(CampaignMembership.campaign_id) == col(RegistrationCampaign.id),
+            col(CampaignMembership.user_id) == user_id
+        ))
+        .where(col(Invitation.token) == invite)
+        .order_by(col(RegistrationGroup.id))
+    )).all()
+
+    if not rows:
+        return None
+
+    first = rows[0]
+    return SubmissionContext(
+        campaign_id=first.id,
+        title=first.title,
+        starts_at=first.starts_at,
+        ends_at=first.ends_at,
+        group_ids=[row.group_id for row in rows],
+        is_member=first.member_id is not None
+    )
+
+async def save_preferences(db: AsyncSession, submission: PreferenceSubmission) -> SubmissionResult:
+    """
+    Zapisuje wniosek studenta (upsert_preferences) i od razu aktualizuje liczniki grup.
+    Nie wykonuje commita - to robi wywołujący.
+    """
+    result, deltas = await upsert_preferences(db, submission)
+    # liczniki grup w tej samej transakcji co zapisy, jako ostatni zapis przed commitem
+    await apply_counter_deltas(db, deltas)
+    return result
+
+async def upsert_preferences(
+    db: AsyncSession,
+    submission: PreferenceSubmission
+) -> Tuple[SubmissionResult, List[Dict[str, int]]]:
+    """
+    Zapisuje wniosek studenta jednym INSERT ... ON CONFLICT (user_id, group_id) DO UPDATE
+    (uq_user_group_pref), zamiast kasować i wstawiać od nowa wszystkie wiersze.
+    Nadpisany wniosek dostaje nowe created_at, tak jak wcześniej przy delete + insert,
+    więc przy FCFS liczy się czas ostatniego złożenia wniosku.
+    Liczników grup nie rusza - zwraca ich delty (apply_counter_deltas robi wywołujący przed commitem).
+    """
+    group_ids = [group_id for group_id, _ in submission.preferences]
+
+    # stare zapisy do liczników; FOR UPDATE na wierszu usera szereguje równoległe wnioski
+    # tego samego studenta (też pierwsze, kiedy nie ma jeszcze czego blokować w registrations)
+    previous = [
+        row for row in (await db.exec(
+            select(Registration.group_id, Registration.priority, Registration.status)
+            .select_from(User)
+            .outerjoin(Registration, and_(
+                col(Registration.user_id) == col(User.id),
+                col(Registration.group_id).in_(group_ids)
+            ))
+            .where(col(User.id) == submission.user_id)
+            .with_for_update(of=User)
+        )).all()
+        if row.group_id is not None
+    ]
+
+    statement = insert(Registration).values([
+        {
+            "user_id": submission.user_id,
+            "group_id": group_id,
+            "priority": priority,
+            "status": RegistrationStatus.SUBMITTED, # status oczekujący
+            "created_at": submission.submitted_at,
+        }
+        for group_id, priority in submission.preferences
+    ])
+    statement = statement.on_conflict_do_update(
+        index_elements=["user_id", "group_id"],
+        set_={
+            "priority": statement.excluded.priority,
+            "status": statement.excluded.status,
+            "created_at": statement.excluded.created_at,
+        }
+    ).returning(col(Registration.group_id), col(Registration.priority), col(Registration.status))
+
+    saved = (await db.exec(statement)).all()
+
+    # bez podbijania results_version: jeden wiersz kampanii serializowałby wszystkie zapisy;
+    # dopóki okno zapisów jest otwarte, eksport i tak omija cache (patrz export_cache.results_settled)
+
+    result = SubmissionResult(replaced=bool(previous), submitted_count=len(saved))
+    return result, counter_deltas(previous, saved)
+
+
+class SubmissionBuffer:
+    """
+    Write-behind dla /student/register w godzinie otwarcia zapisów.
+
+    Zapytania wrzucają zwalidowane wnioski do kolejki i czekają na future.
+    Jedno zadanie w tle zbiera paczkę (do `flush_size` wniosków albo `linger` sekund
+    od pierwszego) i zapisuje ją w jednej transakcji, z licznikami grup zsumowanymi
+    w jeden UPDATE na grupę na końcu paczki. Future dostaje wynik dopiero
+    po commicie paczki, więc odpowiedź 200 nadal oznacza trwały zapis.
+    Jeśli paczka się wywali, każdy wniosek jest zapisywany osobno, żeby jeden zły
+    wniosek nie zabrał ze sobą reszty.
+    """
+    def __init__(self, flush_size: int, linger: float):
+        self.flush_size = max(1, flush_size)
+        self.linger = linger
+
+        self._pending: List[Tuple[PreferenceSubmission, asyncio.Future]] = []
+        self._has_items = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._closing = False
+
+        self.max_depth = 0
+        self.batches = 0
+        self.flushed = 0
+        self.failed = 0
+        self.fallbacks = 0
+        self.last_batch_size = 0
+        self.last_flush_ms = 0.0
+        self.flush_ms_total = 0.0
+
+    async def submit(self, submission: PreferenceSubmission) -> SubmissionResult:
+        self._ensure_running()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((submission, future))
+        self.max_depth = max(self.max_depth, len(self._pending))
+
+        self._has_items.set()
+        if len(self._pending) >= self.flush_size:
+            self._batch_full.set()
+
+        return await future
+
+    async def close(self):
+        """Zapisuje to, co zostało w kolejce i zatrzymuje zadanie w tle (shutdown serwera)."""
+        if self._task is None or self._task.done():
+            return
+        self._closing = True
+        self._has_items.set()
+        self._batch_full.set()
+        await self._task
+        self._task = None
+        self._closing = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.SUBMISSION_BUFFER_ENABLED,
+            "flush_size": self.flush_size,
+            "linger_ms": round(self.linger * 1000, 2),
+            "queue_depth": len(self._pending),
+            "queue_depth_max": self.max_depth,
+            "batches": self.batches,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "fallbacks": self.fallbacks,
+            "avg_batch_size": round(self.flushed / self.batches, 2) if self.batches else 0.0,
+            "last_batch_size": self.last_batch_size,
+            "last_flush_ms": self.last_flush_ms,
+            "avg_flush_ms": round(self.flush_ms_total / self.batches, 2) if self.batches else 0.0,
+        }
+
+    # FUNKCJE POMOCNICZE
+
+    def _ensure_running(self):
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        # nowa pętla zdarzeń (np. restart serwera w tym samym procesie) - eventy od nowa
+        self._loop = loop
+        self._has_items = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        if self._pending:
+            self._has_items.set()
+        self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await self._has_items.wait()
+
+            # czekamy na pełną paczkę, ale nie dłużej niż linger od pierwszego wniosku
+            if not self._closing and len(self._pending) < self.flush_size:
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), timeout=self.linger)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = self._take_batch()
+            if batch:
+                await self._flush(batch)
+            if self._closing and not self._pending:
+                return
+
+    def _take_batch(self) -> List[Tuple[PreferenceSubmission, asyncio.Future]]:
+        batch = self._pending[:self.flush_size]
+        self._pending = self._pending[self.flush_size:]
+
+        if len(self._pending) < self.flush_size:
+            self._batch_full.clear()
+        if not self._pending:
+            self._has_items.clear()
+        return batch
+
+    async def _flush(self, batch: List[Tuple[PreferenceSubmission, asyncio.Future]]):
+        started = time.perf_counter()
+        try:
+            results = await self._save_batch(batch)
+        except Exception as e:
+            print(f"Błąd zapisu paczki wniosków ({len(batch)}), zapis pojedynczo: {e}")
+            self.fallbacks += 1
+            await self._save_one_by_one(batch)
+        else:
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+            self.flushed += len(batch)
+
+        elapsed = round((time.perf_counter() - started) * 1000, 2)
+        self.batches += 1
+        self.last_batch_size = len(batch)
+        self.last_flush_ms = elapsed
+        self.flush_ms_total += elapsed
+
+    async def _save_batch(self, batch) -> List[SubmissionResult]:
+        results: List[SubmissionResult | None] = [None] * len(batch)
+        deltas = []
+        # wiersze userów (FOR UPDATE w upsert_preferences) blokujemy rosnąco po id, tak jak paczki w innych workerach;
+        # sortowanie jest stabilne, więc kolejne wnioski tego samego studenta zostają w kolejności
+        order = sorted(range(len(batch)), key=lambda i: batch[i][0].user_id)
+
+        async with AsyncSession(async_engine, expire_on_commit=False) as db:
+            for i in order:
+                results[i], submission_deltas = await upsert_preferences(db, batch[i][0])
+                deltas.append(submission_deltas)
+            # liczniki całej paczki jednym UPDATE na grupę, rosnąco po id grupy, na końcu transakcji
+            await apply_counter_deltas(db, merge_counter_deltas(deltas))
+            await db.commit()
+        return results # type: ignore
+
+    async def _save_one_by_one(self, batch):
+        for submission, future in batch:
+            try:
+                async with AsyncSession(async_engine, expire_on_commit=False) as db:
+                    result = await save_preferences(db, submission)
+                    await db.commit()
+            except Exception as e:
+                traceback.print_exc()
+                self.failed += 1
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                self.flushed += 1
+                if not future.done():
+                    future.set_result(result)
+
+
+submission_buffer = SubmissionBuffer(
+    flush_size=settings.SUBMISSION_FLUSH_SIZE,
+    linger=settings.SUBMISSION_FLUSH_LINGER_MS / 1000
+)
@@ -1,15 +1,23 @@
 import secrets
-import aiosmtplib
 from datetime import datetime, timedelta
-from email.message import EmailMessage
-from typing import Optional
+from typing import List, Optional
 from jose import jwt
-from fastapi import HTTPException
 
 from app.config import get_settings
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.mail_backends import OutgoingEmail, mail_backend
 
 settings = get_settings()
 
+# bezpiecznik na usługę pocztową: przy awarii maile od razu wracają do outboxa zamiast czekać na timeout.
+# Odrzucenie konkretnego adresu/treści to nie awaria usługi, więc się nie liczy.
+mail_breaker = CircuitBreaker(
+    mail_backend.name,
+    failure_threshold=settings.MAIL_BREAKER_FAILURES,
+    reset_timeout=settings.MAIL_BREAKER_RESET_SECONDS,
+    ignored=mail_backend.rejected_errors
+)
+
 def validate_uni_email(email: str) -> bool:
     email_lower = email.lower()
     return any(email_lower.endswith(domain) for domain in settings.ALLOWED_DOMAINS)
@@ -17,18 +25,14 @@ def validate_uni_email(email: str) -> bool:
 def generate_magic_token() -> str:
     return secrets.token_urlsafe(32)
 
-async def send_magic_link_email(email: str, token: str, invite: str = None):
+def render_magic_link_email(email: str, token: str, invite: str | None = None) -> tuple[str, str]:
+    """Temat i treść (html) maila z magic linkiem."""
     magic_link = f"{settings.BACKEND_URL}/auth/verify?token={token}"
     if invite:
         magic_link += f"&invite={invite}"
 
-    message = EmailMessage()
-    message["From"] = settings.SMTP_FROM
-    message["To"] = email
-    message["Subject"] = f"{settings.APP_NAME} - Magic Link"
-
-    message.add_header('Content-Type','text/html')
-    message.set_payload(f'''
+    subject = f"{settings.APP_NAME} - Magic Link"
+    body = f'''
         <h2>Logowanie do {settings.APP_NAME}</h2>
         <p>Kliknij w link poniżej, aby się zalogować:</p>
         <p>Jeżeli nie jesteś {email} to... Coś poszło nie tak...</p>
@@ -39,24 +43,17 @@ async def send_magic_link_email(email: str, token: str, invite: str = None):
         <p>Link wygaśnie za {settings.TOKEN_EXPIRE_MINUTES} minut.</p>
         <br/>
         <p>Pozdro,<br>{settings.APP_NAME}</p>
-    '''.encode("UTF-8"))
+    '''
+    return subject, body
 
-    try:
-        await aiosmtplib.send(
-            message,
-            hostname=settings.SMTP_HOST,
-            port=settings.SMTP_PORT,
-            username=settings.SMTP_USER,
-            password=settings.SMTP_PASSWORD,
-            start_tls=True,
-            # start_tls=True
-            timeout=10
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Błąd wysyłania emaila: {str(e)}"
-        )
+async def send_emails(emails: List[OutgoingEmail]) -> List[Exception | None]:
+    """
+    Wysyła paczkę maili przez backend z MAIL_BACKEND (Resend: kilka zapytań /emails/batch,
+    SMTP: równolegle na puli połączeń). Zwraca błąd albo None dla każdej wiadomości;
+    gdy cała paczka padła przez awarię usługi - rzuca, a przy otwartym bezpieczniku
+    od razu rzuca CircuitOpenError. Ponowienia robi dispatcher outboxa.
+    """
+    return await mail_breaker.call(mail_backend.send_batch, emails)
         
         
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
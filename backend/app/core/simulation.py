@@ -0,0 +1,144 @@
+import random
+import time
+from concurrent.futures import Executor
+from typing import Dict, List, Any, Tuple
+
+import numpy as np
+
+# celowo tylko silnik tablicowy - procesy robocze nie importują konfiguracji, bazy ani routerów
+from app.core.assignment_engine import (
+    CampaignArrays,
+    lottery_order,
+    serial_dictatorship
+)
+
+# zliczenia jednej paczki losowań: (rangi wszystkich, przydziały grup, pełne grupy, trafienia 1. wyboru, rangi strony studentów)
+BatchCounts = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+def simulate_lottery(
+    pool: Executor,
+    arrays: CampaignArrays,
+    runs: int,
+    seed: int,
+    workers: int,
+    students_offset: int = 0,
+    students_limit: int = 0
+) -> Dict[str, Any]:
+    """
+    Symulacja Monte-Carlo metody LOTTERY (dry-run, bez zapisu do bazy) na wspólnej puli procesów.
+
+    Losowanie nr i używa random.Random(seed + i), więc wynik jest powtarzalny
+    niezależnie od liczby procesów. Każdy proces dostaje tablice kampanii raz na symulację
+    (jedno zadanie = paczka ziaren).
+
+    Zwraca tabele: udział priorytetów (ranga x udział) i grupy (obsadzenie, szansa zapełnienia,
+    szansa trafienia dla chętnych z 1. wyboru), plus szanse studentów z jednej strony
+    [students_offset, students_offset + students_limit) - pełna macierz student x grupa byłaby za duża.
+    """
+    started = time.perf_counter()
+    n_students = arrays.n_students
+    n_groups = int(arrays.group_ids.size)
+    n_ranks = int(arrays.choices.shape[1])
+    page_rows = np.arange(min(students_offset, n_students), min(students_offset + students_limit, n_students))
+
+    rank_totals = np.zeros(n_ranks + 1, dtype=np.int64)
+    group_assigned = np.zeros(n_groups, dtype=np.int64)
+    group_full = np.zeros(n_groups, dtype=np.int64)
+    first_choice_hits = np.zeros(n_groups, dtype=np.int64)
+    page_ranks = np.zeros((page_rows.size, n_ranks + 1), dtype=np.int64)
+
+    seeds = [seed + i for i in range(runs)]
+    batches = [seeds[i::workers] for i in range(workers) if seeds[i::workers]]
+
+    if n_students and batches:
+        for counts in pool.map(_run_batch, [arrays] * len(batches), batches, [page_rows] * len(batches)):
+            rank_totals += counts[0]
+            group_assigned += counts[1]
+            group_full += counts[2]
+            first_choice_hits += counts[3]
+            page_ranks += counts[4]
+
+    runs_done = max(runs, 1)
+    # ilu studentów dało grupę na 1. miejsce (mianownik szansy trafienia z 1. wyboru)
+    first_choices = arrays.choices[:, 0] if n_ranks else np.zeros(0, dtype=np.int64)
+    first_choice_demand = np.bincount(first_choices[first_choices >= 0], minlength=n_groups)
+
+    return {
+        "runs": runs,
+        "seed": seed,
+        "workers": len(batches),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        "group_ids": arrays.group_ids.tolist(),
+        "ranks": list(range(1, n_ranks + 1)),
+        # średni udział studentów, którzy dostali priorytet 1, 2, 3... (ostatnia pozycja = bez grupy)
+        "rank_share": _round(rank_totals / (n_students * runs_done) if n_students else rank_totals.astype(float)),
+        "groups": [
+            {
+                "group_id": int(group_id),
+                "capacity": int(arrays.capacities[g]),
+                "expected_assigned": round(float(group_assigned[g]) / runs_done, 2),
+                "full_probability": round(float(group_full[g]) / runs_done, 4),
+                "first_choice_demand": int(first_choice_demand[g]),
+                "first_choice_probability": (
+                    round(float(first_choice_hits[g]) / float(first_choice_demand[g] * runs_done), 4)
+                    if first_choice_demand[g] else None
+                ),
+            }
+            for g, group_id in enumerate(arrays.group_ids.tolist())
+        ],
+        "students_total": n_students,
+        "students_offset": students_offset,
+        "students": [
+            {
+                "user_id": int(arrays.user_ids[row]),
+                "rank_probabilities": _round(page_ranks[i, :n_ranks] / runs_done),
+                "unassigned_probability": round(float(page_ranks[i, n_ranks]) / runs_done, 4),
+            }
+            for i, row in enumerate(page_rows.tolist())
+        ],
+    }
+
+
+# FUNKCJE PROCESÓW ROBOCZYCH
+
+def _run_batch(arrays: CampaignArrays, seeds: List[int], page_rows: np.ndarray) -> BatchCounts:
+    """
+    Liczy losowania dla podanych ziaren i zwraca zliczenia (K = liczba priorytetów, ostatnia pozycja = bez grupy):
+    (K + 1) - ile razy student dostał dany priorytet, (G) - ilu studentów trafiło do grupy,
+    (G) - w ilu losowaniach grupa się zapełniła, (G) - ilu trafiło do grupy z 1. wyboru,
+    (P, K + 1) - priorytety studentów ze strony page_rows.
+    """
+    n_students = arrays.n_students
+    n_groups = int(arrays.group_ids.size)
+    no_group = arrays.choices.shape[1]
+    rows = np.arange(n_students)
+    page_index = np.arange(page_rows.size)
+
+    rank_totals = np.zeros(no_group + 1, dtype=np.int64)
+    group_assigned = np.zeros(n_groups, dtype=np.int64)
+    group_full = np.zeros(n_groups, dtype=np.int64)
+    first_choice_hits = np.zeros(n_groups, dtype=np.int64)
+    page_ranks = np.zeros((page_rows.size, no_group + 1), dtype=np.int64)
+
+    for seed in seeds:
+        order = lottery_order(arrays, random.Random(seed))
+        assignment = serial_dictatorship(arrays.choices, arrays.capacities, order)
+
+        placed = assignment >= 0
+        got_rank = np.full(n_students, no_group, dtype=np.int64)
+        got_rank[placed] = arrays.ranks[rows[placed], assignment[placed]]
+
+        per_group = np.bincount(assignment[placed], minlength=n_groups)
+        rank_totals += np.bincount(got_rank, minlength=no_group + 1)
+        group_assigned += per_group
+        group_full += per_group >= arrays.capacities
+        first_choice_hits += np.bincount(assignment[placed & (got_rank == 0)], minlength=n_groups)
+        # każdy student występuje raz, więc zwykłe += na indeksach jest bezpieczne
+        page_ranks[page_index, got_rank[page_rows]] += 1
+
+    return rank_totals, group_assigned, group_full, first_choice_hits, page_ranks
+
+
+def _round(values: np.ndarray) -> List[float]:
+    return np.round(values, 4).tolist()
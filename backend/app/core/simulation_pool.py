@@ -0,0 +1,110 @@
+import math
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict
+
+from app.config import get_settings
+
+settings = get_settings()
+
+
+class SimulationBusy(Exception):
+    """Trwa już max_concurrent symulacji."""
+    def __init__(self, retry_after: float):
+        super().__init__(f"Za dużo symulacji naraz, spróbuj za {retry_after:.0f} s")
+        self.retry_after = retry_after
+
+
+class SimulationPool:
+    """
+    Jedna pula procesów na serwer do symulacji losowania (app.core.simulation).
+
+    `workers` procesów (spawn - serwer ma własne wątki, fork w takim procesie potrafi się zakleszczyć)
+    startuje przy pierwszej symulacji i zostaje, więc kolejne nie płacą za start interpretera
+    i import numpy. Naraz trwa najwyżej `max_concurrent` symulacji, kolejna dostaje od razu
+    SimulationBusy (503) - niezależnie od liczby zapytań procesów nigdy nie jest więcej niż `workers`.
+    Moduł nie importuje numpy (idzie do app.main); silnik symulacji ładuje dopiero run().
+    """
+    def __init__(self, workers: int, max_concurrent: int):
+        self.workers = max(1, workers)
+        self.max_concurrent = max(1, max_concurrent)
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.run_ms_total = 0.0
+        self.run_ms_max = 0.0
+
+    def run(self, arrays: Any, runs: int, seed: int, students_offset: int, students_limit: int) -> Dict[str, Any]:
+        """Symulacja na puli (blokuje - wołać przez run_in_threadpool). Wynik jak simulate_lottery."""
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise SimulationBusy(max(1.0, math.ceil(self.run_ms_max / 1000)))
+
+        from app.core.simulation import simulate_lottery
+
+        self.active += 1
+        started = time.perf_counter()
+        try:
+            result = simulate_lottery(
+                self._get_executor(), arrays, runs, seed, self.workers, students_offset, students_limit
+            )
+        except BrokenProcessPool:
+            # proces roboczy padł (np. OOM) - takiej puli nie da się już użyć, następna symulacja stawia nową
+            self.failed += 1
+            with self._lock:
+                self._executor = None
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        else:
+            self.completed += 1
+        finally:
+            self.active -= 1
+            run_ms = (time.perf_counter() - started) * 1000
+            self.run_ms_total += run_ms
+            self.run_ms_max = max(self.run_ms_max, run_ms)
+            self._slots.release()
+        return result
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        finished = self.completed + self.failed
+        return {
+            "workers": self.workers,
+            "max_concurrent": self.max_concurrent,
+            "started": self._executor is not None,
+            "active": self.active,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_run_ms": round(self.run_ms_total / finished, 2) if finished else 0.0,
+            "max_run_ms": round(self.run_ms_max, 2),
+        }
+
+    # FUNKCJE POMOCNICZE
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+
+simulation_pool = SimulationPool(settings.SIMULATION_WORKERS, settings.SIMULATION_MAX_CONCURRENT)
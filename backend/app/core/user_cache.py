@@ -0,0 +1,63 @@
+from dataclasses import dataclass
+from typing import FrozenSet
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import get_settings
+from app.core.cache import TTLCache
+from app.core.memberships import user_campaign_ids
+from app.models.models import User, UserRole
+
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """
+    Niemutowalna kopia danych zalogowanego usera, dzielona między zapytaniami.
+    To nie jest obiekt sesji - zmiany usera robimy przez db.get(User, id).
+    """
+    id: int
+    email: str
+    role: UserRole
+    campaign_ids: FrozenSet[int]
+    claims_version: int = 0
+
+
+# userzy po id; unieważniane przy zmianie roli albo członkostwa (auth, admin, debug).
+# cache jest per proces, przy kilku workerach inne procesy widzą zmianę najpóźniej po TTL
+user_cache: TTLCache[int, UserSnapshot] = TTLCache(
+    "users",
+    maxsize=settings.USER_CACHE_SIZE,
+    ttl=settings.USER_CACHE_TTL
+)
+
+async def get_user_snapshot(db: AsyncSession, user_id: int) -> UserSnapshot | None:
+    """Snapshot z cache, a przy pudle z bazy (user + jego kampanie)."""
+    snapshot = user_cache.get(user_id)
+    if snapshot is not None:
+        return snapshot
+
+    version = user_cache.version
+    user = await db.get(User, user_id)
+    if user is None or user.id is None:
+        return None
+
+    snapshot = UserSnapshot(
+        id=user.id,
+        email=user.email,
+        role=user.role,
+        campaign_ids=frozenset(await user_campaign_ids(db, user.id)),
+        claims_version=user.claims_version
+    )
+    user_cache.set(user.id, snapshot, version=version)
+    return snapshot
+
+def invalidate_user(user_id: int | None):
+    """
+    Wołać po commicie, który zmienił rolę albo kampanie usera.
+    Nowy snapshot ma też nowe claims_version, więc tokeny ze starszą wersją dostaną nowe ciasteczko.
+    """
+    if user_id is None:
+        return
+    user_cache.invalidate(user_id)
@@ -1,16 +1,25 @@
+import hashlib
 from datetime import datetime, timedelta
 from sqlmodel import create_engine, Session, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import Annotated
 from fastapi import Depends
-from sqlalchemy_utils import database_exists, create_database
-from sqlalchemy import URL, select
+from sqlalchemy import URL, select, inspect, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 
 from app.config import get_settings
+from app.core.counters import recompute_group_counters
+from app.core.pool_monitor import PoolMonitor, instrumented_pool_class
 # TODO: zweryfikuj czy musi byc import by db wiedzialo co tworzyc
 from app.models.models import (
     User, AuthToken, RegistrationCampaign, 
     RegistrationGroup, Registration, Invitation,
-    UserRole
+    ResolveJob, CampaignMembership, UserRole, SchemaVersion
 )
 
 settings = get_settings()
@@ -24,18 +33,189 @@ database_url = URL.create(
     database=settings.POSTGRES_DB,
 )
 
+# wspólne ustawienia puli; pool_timeout krótki, żeby przy wyczerpanej puli szybko oddać 503
+pool_options = dict(
+    pool_pre_ping=True,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+)
+
+sync_pool_monitor = PoolMonitor("sync")
+async_pool_monitor = PoolMonitor("async")
+
+# synchroniczny silnik: start aplikacji, skrypty, zadania w wątkach (resolve) i /debug
 engine = create_engine(
     database_url,
     echo=settings.DEBUG,
-    pool_pre_ping=True,
+    poolclass=instrumented_pool_class(QueuePool, sync_pool_monitor),
+    **pool_options,
+)
+
+# asynchroniczny silnik (asyncpg) dla routerów - zapytania nie blokują pętli zdarzeń
+async_engine = create_async_engine(
+    database_url.set(drivername="postgresql+asyncpg"),
+    echo=settings.DEBUG,
+    poolclass=instrumented_pool_class(AsyncAdaptedQueuePool, async_pool_monitor),
+    **pool_options,
 )
 
+sync_pool_monitor.attach(engine.pool)
+async_pool_monitor.attach(async_engine.sync_engine.pool)
+
 def create_db_and_tables():
-    if not database_exists(engine.url):
-        print("Baza student_db nie istnieje. Tworzenie...")
+    """
+    Start workera. Szybka ścieżka: jedno zapytanie o wersję ze schema_version - jeśli to
+    SCHEMA_VERSION, baza jest gotowa i nic więcej nie robimy.
+    Inaczej (nowa baza, nowa tabela/kolumna, inny seed) migracja pod pg_advisory_lock:
+    DDL i seedy robi jeden worker, reszta czeka na blokadę i potem widzi już nową wersję.
+    """
+    if _current_schema_version() == SCHEMA_VERSION:
+        return
+
+    _ensure_database()
+    # AUTOCOMMIT: blokada sesyjna, połączenie nie trzyma otwartej transakcji w trakcie migracji
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock_conn:
+        lock_conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+        try:
+            # czekaliśmy na blokadę - może inny worker już wszystko zrobił
+            if _current_schema_version() == SCHEMA_VERSION:
+                return
+            SQLModel.metadata.create_all(engine)
+            _migrate_allowed_campaign_ids()
+            _apply_schema_patches()
+            _create_admin_invitation()
+            _save_schema_version()
+            print(f"Schemat bazy zaktualizowany do wersji {SCHEMA_VERSION}")
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": SCHEMA_LOCK_KEY})
+
+# kolumny dodane do istniejących tabel (create_all tworzy tylko brakujące tabele)
+SCHEMA_PATCHES = [
+    ("registration_groups", "applicants_count", "INTEGER NOT NULL DEFAULT 0"),
+    ("registration_groups", "first_priority_count", "INTEGER NOT NULL DEFAULT 0"),
+    ("registration_groups", "assigned_count", "INTEGER NOT NULL DEFAULT 0"),
+    ("users", "claims_version", "INTEGER NOT NULL DEFAULT 0"),
+    ("users", "claims_updated_at", "TIMESTAMP WITHOUT TIME ZONE"),
+    ("registration_campaigns", "results_version", "INTEGER NOT NULL DEFAULT 0"),
+    ("resolve_jobs", "heartbeat_at", "TIMESTAMP WITHOUT TIME ZONE"),
+]
+
+# klucz blokady doradczej na migrację przy starcie (dowolna stała, ta sama we wszystkich workerach)
+SCHEMA_LOCK_KEY = 73160001
+
+def _schema_fingerprint() -> str:
+    # DDL wszystkich tabel i indeksów + łatki + seed: nowa kolumna czy tabela zmienia wersję sama,
+    # bez pamiętania o ręcznym podbijaniu numeru
+    dialect = postgresql.dialect()
+    parts = []
+    for table in SQLModel.metadata.sorted_tables:
+        parts.append(str(CreateTable(table).compile(dialect=dialect)))
+        parts.extend(sorted(str(CreateIndex(index).compile(dialect=dialect)) for index in table.indexes))
+    parts.append(repr(SCHEMA_PATCHES))
+    parts.append(settings.DEFAULT_ADMIN_INVITE_TOKEN)
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+SCHEMA_VERSION = _schema_fingerprint()
+
+def _current_schema_version() -> str | None:
+    # None: bazy albo tabeli schema_version jeszcze nie ma (pierwszy start)
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT version FROM schema_version WHERE id = 1")).scalar()
+    except (OperationalError, ProgrammingError):
+        return None
+
+def _ensure_database():
+    # sqlalchemy_utils potrzebne tylko tutaj - bez importu przy każdym imporcie app.database
+    from sqlalchemy_utils import database_exists, create_database
+
+    if database_exists(engine.url):
+        return
+    print("Baza student_db nie istnieje. Tworzenie...")
+    try:
         create_database(engine.url)
-    SQLModel.metadata.create_all(engine)
-    _create_admin_invitation()
+    except (ProgrammingError, IntegrityError):
+        # równoległy worker założył ją pierwszy (DuplicateDatabase albo wyścig na pg_database);
+        # blokady doradczej nie ma jeszcze gdzie wziąć
+        if not database_exists(engine.url):
+            raise
+
+def _save_schema_version():
+    statement = insert(SchemaVersion).values(id=1, version=SCHEMA_VERSION, applied_at=datetime.now())
+    statement = statement.on_conflict_do_update(
+        index_elements=["id"],
+        set_={"version": statement.excluded.version, "applied_at": statement.excluded.applied_at}
+    )
+    with engine.begin() as conn:
+        conn.execute(statement)
+
+def _apply_schema_patches():
+    inspector = inspect(engine)
+    existing = {
+        table: {c["name"] for c in inspector.get_columns(table)}
+        for table in {table for table, _, _ in SCHEMA_PATCHES}
+    }
+    missing = [
+        (table, column, ddl) for table, column, ddl in SCHEMA_PATCHES
+        if column not in existing[table]
+    ]
+    if not missing:
+        return
+
+    with engine.begin() as conn:
+        for table, column, ddl in missing:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {ddl}"))
+            print(f"Dodano kolumnę {table}.{column}")
+
+        # nowe liczniki grup startują od 0, więc przeliczamy je z istniejących zapisów
+        if any(table == "registration_groups" for table, _, _ in missing):
+            recompute_group_counters(conn)
+
+# pary (user, kampania) ze starej kolumny users.allowed_campaign_ids (lista JSON), tylko istniejące kampanie
+LEGACY_MEMBERSHIPS_SQL = """
+    SELECT u.id AS user_id, c.id AS campaign_id
+    FROM users u
+    CROSS JOIN LATERAL json_array_elements_text(
+        CASE WHEN json_typeof(u.allowed_campaign_ids::json) = 'array'
+             THEN u.allowed_campaign_ids::json ELSE '[]'::json END
+    ) AS j(value)
+    JOIN registration_campaigns c ON c.id = j.value::int
+"""
+
+def has_legacy_campaign_ids() -> bool:
+    return "allowed_campaign_ids" in {c["name"] for c in inspect(engine).get_columns("users")}
+
+def count_missing_legacy_memberships(conn) -> int:
+    """Ile dostępów ze starej kolumny nie ma jeszcze w campaign_memberships (0 = backfill kompletny)."""
+    return conn.execute(text(f"""
+        SELECT count(*) FROM ({LEGACY_MEMBERSHIPS_SQL}) legacy
+        WHERE NOT EXISTS (
+            SELECT 1 FROM campaign_memberships m
+            WHERE m.user_id = legacy.user_id AND m.campaign_id = legacy.campaign_id
+        )
+    """)).scalar_one()
+
+def backfill_legacy_memberships(conn) -> int:
+    """Przepisuje dostępy ze starej kolumny do campaign_memberships (idempotentnie), zwraca liczbę nowych."""
+    return conn.execute(text(f"""
+        INSERT INTO campaign_memberships (user_id, campaign_id, created_at)
+        SELECT user_id, campaign_id, now() FROM ({LEGACY_MEMBERSHIPS_SQL}) legacy
+        ON CONFLICT DO NOTHING
+    """)).rowcount
+
+def _migrate_allowed_campaign_ids():
+    # stara kolumna users.allowed_campaign_ids -> campaign_memberships; tylko backfill (idempotentny),
+    # kolumna zostaje - usuwa ją ręcznie python -m app.drop_allowed_campaign_ids po sprawdzeniu backfillu.
+    # dostępów nikt nie odbiera, więc powtórka przy kolejnej migracji niczego nie przywraca
+    if not has_legacy_campaign_ids():
+        return
+
+    with engine.begin() as conn:
+        inserted = backfill_legacy_memberships(conn)
+    if inserted:
+        print(f"Przeniesiono {inserted} dostępów do kampanii z users.allowed_campaign_ids do campaign_memberships.")
 
 def _create_admin_invitation():
     # TODO: Dla nowych starostów potrzeba domyślnego zaproszenia,
@@ -65,4 +245,10 @@ def get_session():
     with Session(engine) as session:
         yield session
 
-SessionDep = Annotated[Session, Depends(get_session)]
\ No newline at end of file
+async def get_async_session():
+    # expire_on_commit=False: po commicie nie odświeżamy leniwie atrybutów (w async to by był błąd)
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+SessionDep = Annotated[Session, Depends(get_session)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_session)]
\ No newline at end of file
@@ -0,0 +1,49 @@
+"""
+Usuwa starą kolumnę users.allowed_campaign_ids (lista JSON), którą zastąpiła tabela campaign_memberships.
+Start serwera tylko przepisuje z niej dostępy, a kolumny nie rusza - usunięcie jest nieodwracalne,
+więc robi się je osobno. Skrypt najpierw sprawdza, czy każdy dostęp z kolumny jest już
+w campaign_memberships; jeśli czegoś brakuje, nic nie usuwa i kończy się kodem 1.
+
+Uruchomienie (z katalogu backend):
+    python -m app.drop_allowed_campaign_ids              # tylko sprawdzenie
+    python -m app.drop_allowed_campaign_ids --backfill   # dopisanie brakujących dostępów (jak przy migracji)
+    python -m app.drop_allowed_campaign_ids --drop       # sprawdzenie i usunięcie kolumny
+"""
+import argparse
+import sys
+
+from sqlalchemy import text
+
+from app.database import (
+    SCHEMA_LOCK_KEY, backfill_legacy_memberships, count_missing_legacy_memberships, engine, has_legacy_campaign_ids
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backfill", action="store_true", help="dopisz brakujące dostępy do campaign_memberships")
+    parser.add_argument("--drop", action="store_true", help="usuń kolumnę, jeśli backfill jest kompletny")
+    args = parser.parse_args()
+
+    if not has_legacy_campaign_ids():
+        print("Kolumny users.allowed_campaign_ids już nie ma.")
+        return
+
+    with engine.begin() as conn:
+        # ta sama blokada co migracja przy starcie - nie ścigamy się z workerem, który właśnie robi backfill
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+        if args.backfill:
+            print(f"Dopisano {backfill_legacy_memberships(conn)} dostępów do campaign_memberships.")
+        missing = count_missing_legacy_memberships(conn)
+        if missing:
+            sys.exit(f"{missing} dostępów z users.allowed_campaign_ids nie ma w campaign_memberships - "
+                     "uruchom z --backfill i sprawdź ponownie. Kolumna zostaje.")
+        if not args.drop:
+            print("Backfill kompletny, kolumnę można usunąć (--drop).")
+            return
+        conn.execute(text("ALTER TABLE users DROP COLUMN allowed_campaign_ids"))
+    print("Usunięto kolumnę users.allowed_campaign_ids.")
+
+
+if __name__ == "__main__":
+    main()
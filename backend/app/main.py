@@ -1,9 +1,23 @@
+# start pomiaru zimnego startu - przed wszystkimi importami (patrz boot_timer)
+import time
+_import_started = time.perf_counter()
+
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 
+from app.core.boot import boot_timer
+from app.core.claims import apply_reissued_cookie, claims_revocations
 from app.database import create_db_and_tables
-from app.routers import auth, users, admin, student, debug
+from app.core.export_pool import export_pool
+from app.core.simulation_pool import simulation_pool
+from app.core.jobs import shutdown_job_workers, start_job_workers
+from app.core.mail_backends import mail_backend
+from app.core.outbox import email_dispatcher
+from app.core.preferences import submission_buffer
+from app.routers import auth, users, admin, student, debug, internal
 from app.config import get_settings
 
 settings = get_settings()
@@ -12,8 +26,21 @@ settings = get_settings()
 # nie musisz tworzyc w psql samemu bazy
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    boot_timer.mark_startup()
     create_db_and_tables()
+    start_job_workers()
+    email_dispatcher.start()
+    if settings.JWT_CLAIMS_ENABLED:
+        claims_revocations.start()
+    boot_timer.mark_ready()
     yield
+    await submission_buffer.close()
+    await email_dispatcher.close()
+    await claims_revocations.close()
+    await mail_backend.close()
+    shutdown_job_workers()
+    export_pool.close()
+    simulation_pool.close()
 
 app = FastAPI(
     title=settings.APP_NAME,
@@ -36,11 +63,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# nowe ciasteczko sesji z get_current_user (nieaktualne claimy) - na odpowiedzi, którą naprawdę zwrócił endpoint,
+# bo Response wstrzyknięty do zależności przepada przy StreamingResponse/RedirectResponse
+@app.middleware("http")
+async def reissued_session_cookie(request: Request, call_next):
+    response = await call_next(request)
+    apply_reissued_cookie(request, response)
+    return response
+
 # ROUTERS
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(admin.router)
 app.include_router(student.router)
+app.include_router(internal.router)
 
 if settings.DEBUG:
     app.include_router(debug.router)
@@ -49,6 +85,15 @@ if settings.DEBUG:
     print("Endpointy /debug są dostępne.")
     print(f"{'!'*40}\n") 
 
+# pula połączeń wyczerpana dłużej niż DB_POOL_TIMEOUT - lepiej szybko odmówić niż wisieć w kolejce
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Serwer jest teraz przeciążony, spróbuj ponownie za chwilę."},
+        headers={"Retry-After": "2"}
+    )
+
 @app.get("/")
 async def root():
     return {
@@ -56,6 +101,9 @@ async def root():
         "status": "ok",
         "docs": "/docs",
     }
+
+# koniec importu app.main (moduły, routery, singletony)
+boot_timer.mark_imported(_import_started)
     
 # do live reload serwera podczas edytowania
 if __name__ == "__main__":
@@ -21,6 +21,27 @@ class AssignmentMethod(str, enum.Enum):
     LOTTERY = "lottery"       # Losowanie kolejności (Random + Priorities)
     RANDOM = "random"         # Totalna losowość (Ignoruje priorytety, przydziela gdzie popadnie)
 
+# Enum stanów zadania w tle (resolve kampanii)
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"         # czeka na wolnego workera
+    RUNNING = "running"       # algorytm liczy / zapisuje wyniki
+    DONE = "done"             # zakończone, statystyki zapisane w stats
+    FAILED = "failed"         # błąd, szczegóły w error
+
+# Enum stanów maila w outboxie
+class EmailStatus(str, enum.Enum):
+    PENDING = "pending"       # czeka na wysyłkę (albo na kolejną próbę po błędzie)
+    SENDING = "sending"       # dispatcher właśnie go wysyła
+    SENT = "sent"             # serwer pocztowy przyjął wiadomość
+    FAILED = "failed"         # wyczerpany limit prób, szczegóły w last_error
+
+# Enum formatów eksportu wyników kampanii
+class ExportFormat(str, enum.Enum):
+    XLSX = "xlsx"             # arkusz dla ludzi
+    CSV = "csv"               # tekst, wiersz po wierszu
+    NDJSON = "ndjson"         # jeden obiekt JSON na linię
+    PARQUET = "parquet"       # kolumnowy, dla narzędzi analitycznych
+
 # USERS (tabela studentow i starostow)
 class User(SQLModel, table=True):
     __tablename__ = "users" # type: ignore
@@ -30,13 +51,24 @@ class User(SQLModel, table=True):
     index: str
     # rola usera (domyślnie student)
     role: UserRole = Field(sa_column=Column(Enum(UserRole), default=UserRole.STUDENT))
-    # lista ID kampanii przechowywana jako JSON
-    allowed_campaign_ids: List[int] = Field(default=[], sa_column=Column(JSON))
+    # dostęp do kampanii trzyma tabela campaign_memberships
+    # wersja uprawnień (rola + kampanie), podbijana przy każdej zmianie; trafia do JWT jako "ver"
+    claims_version: int = Field(default=0)
+    claims_updated_at: Optional[datetime] = Field(default=None) # kiedy ostatnio podbito claims_version
 
     # Relacje
     registrations: List["Registration"] = Relationship(back_populates="student")
     created_campaigns: List["RegistrationCampaign"] = Relationship(back_populates="creator")
 
+# CAMPAIGN MEMBERSHIPS (kto ma dostęp do której kampanii)
+class CampaignMembership(SQLModel, table=True):
+    __tablename__ = "campaign_memberships" # type: ignore
+
+    # PK (user_id, campaign_id) obsługuje "kampanie usera", osobny indeks "userzy kampanii"
+    user_id: int = Field(foreign_key="users.id", primary_key=True)
+    campaign_id: int = Field(foreign_key="registration_campaigns.id", primary_key=True, index=True)
+    created_at: datetime = Field(default_factory=datetime.now)
+
 # INVITATION tabela przechowuje magic linki dla starosotow i studentow
 class Invitation(SQLModel, table=True):
     __tablename__ = "invitations" # type: ignore
@@ -89,6 +121,9 @@ class RegistrationCampaign(SQLModel, table=True):
     is_active: bool = Field(default=True) # czy rekru jeszcze aktywna
     assignment_method: AssignmentMethod = Field(default=AssignmentMethod.FCFS) # metoda losowania
     last_resolved_method: AssignmentMethod | None = Field(default=None)
+    # rośnie przy zmianie grup, dat kampanii i po resolve (klucz cache eksportu i ETag);
+    # zapisy studentów jej nie ruszają - w trakcie zapisów eksport omija cache
+    results_version: int = Field(default=0)
 
     # Relacje
     creator: Optional[User] = Relationship(back_populates="created_campaigns")
@@ -110,6 +145,12 @@ class RegistrationGroup(SQLModel, table=True):
     
     name: str # np. L1 - chmury / L2 - devops
     limit: int # max liczba miejsc
+
+    # liczniki aktualizowane przy zapisie (student/register) i przy resolve,
+    # żeby statystyki nie liczyły zapisów przy każdym odświeżeniu panelu
+    applicants_count: int = Field(default=0) # ile osób oceniło grupę
+    first_priority_count: int = Field(default=0) # ile osób dało ją na 1. miejsce
+    assigned_count: int = Field(default=0) # ilu przydzielił algorytm (ASSIGNED)
     
     # Relacje
     campaign: Optional[RegistrationCampaign] = Relationship(back_populates="groups")
@@ -118,8 +159,8 @@ class RegistrationGroup(SQLModel, table=True):
     # Helpery
     @property
     def current_count(self) -> int:
-        # liczy potwierdzone zapisy
-        return len([r for r in self.registrations if r.status == RegistrationStatus.ASSIGNED])
+        # potwierdzone zapisy (licznik, bez ładowania registrations)
+        return self.assigned_count
 
     @property
     def is_full(self) -> bool:
@@ -151,3 +192,60 @@ class Registration(SQLModel, table=True):
     student: Optional[User] = Relationship(back_populates="registrations")
     group: Optional[RegistrationGroup] = Relationship(back_populates="registrations")
     
+
+
+
+# 7. RESOLVE JOBS (zadania przydziału uruchamiane w tle)
+class ResolveJob(SQLModel, table=True):
+    __tablename__ = "resolve_jobs" # type: ignore
+
+    id: str = Field(primary_key=True) # uuid zwracany staroście do odpytywania
+    campaign_id: int = Field(foreign_key="registration_campaigns.id", index=True)
+    requested_by: int = Field(foreign_key="users.id") # starosta, ktory zlecil resolve
+    force: bool = Field(default=False)
+
+    status: JobStatus = Field(
+        sa_column=Column(Enum(JobStatus), default=JobStatus.QUEUED)
+    )
+    phase: str = Field(default="queued") # np. loading / assigning / writing / committing
+    progress: float = Field(default=0.0) # 0.0 - 1.0
+    
+    # wynik resolve_campaign_logic zapisany po zakonczeniu (kolejne odpytania nie licza nic od nowa)
+    stats: Optional[dict] = Field(default=None, sa_column=Column(JSON))
+    error: Optional[str] = Field(default=None, sa_column=Column(Text))
+
+    created_at: datetime = Field(default_factory=datetime.now)
+    started_at: Optional[datetime] = Field(default=None)
+    finished_at: Optional[datetime] = Field(default=None)
+    # dzierżawa: proces, który ma zadanie, odnawia ją co RESOLVE_JOB_LEASE_SECONDS / 3;
+    # starsza niż RESOLVE_JOB_LEASE_SECONDS = proces padł, zadanie jest oznaczane jako FAILED
+    heartbeat_at: Optional[datetime] = Field(default=None)
+
+
+# 8. EMAIL OUTBOX (maile zapisane razem z transakcją, wysyłane w tle przez dispatcher)
+class EmailOutbox(SQLModel, table=True):
+    __tablename__ = "email_outbox" # type: ignore
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    recipient: str = Field(index=True)
+    subject: str
+    body: str = Field(sa_column=Column(Text)) # gotowy html
+
+    status: EmailStatus = Field(
+        sa_column=Column(Enum(EmailStatus), default=EmailStatus.PENDING, index=True)
+    )
+    attempts: int = Field(default=0)
+    # kiedy dispatcher może wziąć wiadomość (kolejna próba albo koniec "dzierżawy" w trakcie wysyłki)
+    next_attempt_at: datetime = Field(default_factory=datetime.now, index=True)
+    last_error: Optional[str] = Field(default=None, sa_column=Column(Text))
+
+    created_at: datetime = Field(default_factory=datetime.now)
+    sent_at: Optional[datetime] = Field(default=None)
+
+# 9. SCHEMA VERSION (jeden wiersz: wersja schematu, do której baza jest zmigrowana)
+class SchemaVersion(SQLModel, table=True):
+    __tablename__ = "schema_version" # type: ignore
+
+    id: int = Field(default=1, primary_key=True)
+    version: str # skrót DDL tabel, łatek i seedów (patrz database.SCHEMA_VERSION)
+    applied_at: datetime = Field(default_factory=datetime.now)
@@ -0,0 +1,19 @@
+"""
+Przelicza od zera liczniki grup (applicants_count, first_priority_count, assigned_count)
+na podstawie tabeli registrations. Na wypadek ręcznych zmian w bazie albo rozjazdu liczników.
+
+Uruchomienie (z katalogu backend):
+    python -m app.reconcile_counters
+"""
+from app.core.counters import recompute_group_counters
+from app.database import engine
+
+
+def main():
+    with engine.begin() as conn:
+        updated = recompute_group_counters(conn)
+    print(f"Przeliczono liczniki {updated} grup.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,31 @@
 import secrets
 from datetime import datetime, timedelta
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
-from sqlalchemy import case, func, and_ 
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, and_ 
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlmodel import select, col
-import pandas as pd
-from io import BytesIO
 
 from app.config import get_settings
-from app.core.assignment import resolve_campaign_logic
-from app.database import SessionDep
+from app.core.export import EXPORT_FORMATS, export_campaign_results
+from app.core.export_cache import bump_results_version, etag_matches, export_cache, export_etag, results_settled
+from app.core.export_pool import ExportPoolBusy, export_pool
+from app.core.memberships import add_membership
+from app.core.simulation_pool import SimulationBusy, simulation_pool
+from app.core.user_cache import invalidate_user
+from app.core.jobs import create_resolve_job, find_active_job, submit_resolve_job
+from app.database import AsyncSessionDep
 from app.core.dependencies import CurrentAdmin
 from app.models.models import (
-    Invitation, Registration, RegistrationCampaign, RegistrationGroup, 
-    RegistrationStatus, User, UserRole
+    ExportFormat, Invitation, RegistrationCampaign, RegistrationGroup, 
+    ResolveJob, UserRole
     )
 from app.serializers.schemas import (
     BulkGroupCreateRequest, BulkGroupResponse, CampaignCreateRequest, CampaignDetailResponse, 
     CampaignResponse, CampaignUpdateRequest, CreateStudentInviteRequest, GroupStatsResponse, 
     GroupUpdateRequest, InvitationLinkResponse, CampaignSetupResponse, CampaignSetupRequest,
-    GroupCreateRequest
+    GroupCreateRequest, ResolveJobResponse, LotterySimulationResponse
     )
 
 settings = get_settings()
@@ -30,7 +36,7 @@ router = APIRouter(prefix="/admin", tags=["Admin(Starosta)"])
 async def create_student_invite(
     payload: CreateStudentInviteRequest,
     current_user: CurrentAdmin,
-    db: SessionDep
+    db: AsyncSessionDep
 ):
     """
     Generuje link zaproszeniowy dla studentów z parametrem group_id.
@@ -38,7 +44,7 @@ async def create_student_invite(
     """
     
     # 1. Sprawdź czy kampania istnieje
-    campaign = db.get(RegistrationCampaign, payload.campaign_id)
+    campaign = await db.get(RegistrationCampaign, payload.campaign_id)
     if not campaign:
         raise HTTPException(status_code=404, detail="Kampania nie istnieje.")
         
@@ -49,7 +55,7 @@ async def create_student_invite(
     three_letters = campaign.title[:3].upper()
     
     # Liczymy grupy w tej kampanii
-    group_count = db.scalar(
+    group_count = await db.scalar(
         select(func.count(RegistrationGroup.id))
         .where(RegistrationGroup.campaign_id == payload.campaign_id)
     )
@@ -75,7 +81,7 @@ async def create_student_invite(
     )
     
     db.add(invite)
-    db.commit()
+    await db.commit()
     
     # 5. Zbuduj pełny link z parametrami
     # Format: .../Logowanie.html?group_id=INF-5G&invite=abc123token
@@ -92,7 +98,7 @@ async def create_student_invite(
 async def create_campaign(
     payload: CampaignCreateRequest,
     current_user: CurrentAdmin,  # walidacja autoryzacji: tylko starosta przejdzie
-    db: SessionDep
+    db: AsyncSessionDep
 ):
     """
     Tworzy nową kampanię zapisów (np. 'Lato 2026').
@@ -132,8 +138,8 @@ async def create_campaign(
     )
 
     db.add(new_campaign)
-    db.commit()
-    db.refresh(new_campaign)
+    await db.commit()
+    await db.refresh(new_campaign)
 
     # obliczanie czy jest aktywna
     now = datetime.now()
@@ -142,14 +148,11 @@ async def create_campaign(
     if new_campaign.id is None:
         raise HTTPException(status_code=500, detail="Błąd zapisu kampanii do bazy danych")
 
-    # dodawanie nowej kampanii do listy usera zeby mogl accessowac
-    current_ids = list(current_user.allowed_campaign_ids)
-    if new_campaign.id not in current_ids:
-        current_ids.append(new_campaign.id)
-        current_user.allowed_campaign_ids = current_ids
-        
-        db.add(current_user)
-        db.commit()
+    # dostęp do nowej kampanii dla starosty, zeby mogl accessowac
+    if current_user.id is not None:
+        await add_membership(db, current_user.id, new_campaign.id)
+        await db.commit()
+        invalidate_user(current_user.id)
 
     return CampaignResponse(
         id=new_campaign.id, 
@@ -165,7 +168,7 @@ async def add_groups_to_campaign(
     campaign_id: int,
     payload: BulkGroupCreateRequest,
     current_user: CurrentAdmin,
-    db: SessionDep
+    db: AsyncSessionDep
 ):
     """
     Umożliwia dodanie wielu grup zajęciowych do istniejącej kampanii w jednym zapytaniu.
@@ -174,7 +177,7 @@ async def add_groups_to_campaign(
     """
     
     # pobiera kampanię z bazy i spr czy istnieje
-    campaign = db.get(RegistrationCampaign, campaign_id)
+    campaign = await db.get(RegistrationCampaign, campaign_id)
     
     if not campaign:
         raise HTTPException(status_code=404, detail="Taka kampania nie istnieje.")
@@ -199,7 +202,8 @@ async def add_groups_to_campaign(
 
     # zapis do bazy wszystkich grup na raz
     db.add_all(new_groups)
-    db.commit()
+    await bump_results_version(db, campaign_id)
+    await db.commit()
 
     return BulkGroupResponse(
         message="Grupy zostały pomyślnie dodane.",
@@ -209,7 +213,7 @@ async def add_groups_to_campaign(
 @router.post("/campaigns/setup", response_model=CampaignSetupResponse)
 async def setup_complete_campaign(
     data: CampaignSetupRequest,
-    db: SessionDep,
+    db: AsyncSessionDep,
     current_user: CurrentAdmin
 ):
     """Utworzenie i ustawienie kampanii wraz z grupami i zaproszeniem w jednej transakcji."""
@@ -245,7 +249,7 @@ async def setup_complete_campaign(
             invitation_payload, current_user, db
         )
         
-        db.commit()
+        await db.commit()
         
         return CampaignSetupResponse(
             campaign=campaign_response,
@@ -253,8 +257,12 @@ async def setup_complete_campaign(
             invitation=invitation_response
         )
         
+    except PoolTimeoutError:
+        # brak wolnego połączenia - 503 z Retry-After robi handler w main.py
+        await db.rollback()
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         if isinstance(e, HTTPException):
             raise e
         else:
@@ -264,18 +272,19 @@ async def setup_complete_campaign(
 async def get_campaign_details(
     campaign_id: int,
     current_user: CurrentAdmin,
-    db: SessionDep
+    db: AsyncSessionDep
 ):
     """
     Pobiera szczegóły kampanii wraz ze statystykami zapisów.
     Zwraca pełne dane o kampanii, w tym listę grup, ich limity oraz liczbę osób, które wybrały daną grupę jako priorytet nr 1.
     
     `first_priority_count`: Liczba studentów, którzy ustawili grupę na 1. miejscu (popyt).
+    `applicants_count`: Liczba studentów, którzy ocenili grupę.
     `current_count`: Liczba studentów ostatecznie przydzielonych (`ASSIGNED`) do grupy.
     """
     
     # pobierz kampanie
-    campaign = db.get(RegistrationCampaign, campaign_id)
+    campaign = await db.get(RegistrationCampaign, campaign_id)
     
     # walidacje
     if not campaign:
@@ -287,35 +296,16 @@ async def get_campaign_details(
     if campaign.id is None:
         raise HTTPException(status_code=500, detail="Błąd integralności danych (brak ID kampanii)")
     
-    statement = (
-        select(
-            RegistrationGroup,
-            # licznik 1: Ilość zapisóœ do grupy
-            func.count(col(Registration.id)),
-            # licznik 2: popularność
-            # ile osob dala ta grupe na pierwszy priorytet
-            func.count(
-                case(
-                    (col(Registration.priority) == 1, 1)
-                )
-            )
-        )
-        .outerjoin(
-            Registration,
-            col(Registration.group_id) == col(RegistrationGroup.id)
-        )
+    # liczniki są utrzymywane przy zapisie i resolve, więc wystarczy odczyt grup (O(grupy))
+    groups = (await db.exec(
+        select(RegistrationGroup)
         .where(col(RegistrationGroup.campaign_id) == campaign_id)
-        .group_by(col(RegistrationGroup.id))
-    )
-    
-    results = db.exec(statement).all()
+        .order_by(col(RegistrationGroup.id))
+    )).all()
     
     groups_response = []
-    total_students = 0
-
-    for group, reg_count, priority_count in results:
 
-        total_students += reg_count
+    for group in groups:
         if group.id is None: continue 
 
         groups_response.append(
@@ -323,16 +313,18 @@ async def get_campaign_details(
                 id=group.id,
                 name=group.name,
                 limit=group.limit,
-                first_priority_count=priority_count,    # ile chętnych na 1. wybór
-                current_count=reg_count,                # ile zapisów
-                is_full=reg_count >= group.limit
+                first_priority_count=group.first_priority_count,    # ile chętnych na 1. wybór
+                applicants_count=group.applicants_count,            # ile zapisów
+                current_count=group.assigned_count,                 # ilu przydzielonych
+                is_full=group.assigned_count >= group.limit
             )
         )
 
     now = datetime.now()
     is_active_now = campaign.starts_at <= now <= campaign.ends_at
 
-    total_students /= len(campaign.groups) # Absolutely unsafe hack and i should get killed
+    # każdy student ocenia wszystkie grupy, więc liczba zapisanych = zapisy w dowolnej grupie
+    total_students = max((g.applicants_count for g in groups), default=0)
 
     return CampaignDetailResponse(
         id=campaign.id,
@@ -350,7 +342,7 @@ async def update_campaign(
     campaign_id: int,
     payload: CampaignUpdateRequest,
     current_user: CurrentAdmin,
-    db: SessionDep
+    db: AsyncSessionDep
 ):
     """
     Edycja danych kampanii (tytuł, daty).
@@ -359,7 +351,7 @@ async def update_campaign(
     system automatycznie wykryje zmianę i przeliczy wyniki na nowo.
     """
     # pobierz kampanię z bazy
-    campaign = db.get(RegistrationCampaign, campaign_id)
+    campaign = await db.get(RegistrationCampaign, campaign_id)
     if not campaign:
         raise HTTPException(status_code=404, detail="Kampania nie istnieje.")
 
@@ -384,8 +376,11 @@ async def update_campaign(
         setattr(campaign, key, value)
 
     db.add(campaign)
-    db.commit()
-    db.refresh(campaign)
+    # nowe daty mogą otworzyć zapisy ponownie, a te nie podbijają wersji - stary eksport z cache nie może wrócić
+    if "starts_at" in update_data or "ends_at" in update_data:
+        await bump_results_version(db, campaign_id)
+    await db.commit()
+    await db.refresh(campaign)
 
     # oblicza is_active do odpowiedzi
     now = datetime.now()
@@ -410,18 +405,18 @@ async def update_group(
     group_id: int,
     payload: GroupUpdateRequest,
     current_user: CurrentAdmin,
-    db: SessionDep
+    db: AsyncSessionDep
 ):
     """
     Pozwala na zmianę nazwy grupy lub modyfikację limitu miejsc.
     """
     # pobierz grupę z db
-    group = db.get(RegistrationGroup, group_id)
+    group = await db.get(RegistrationGroup, group_id)
     if not group:
         raise HTTPException(status_code=404, detail="Grupa nie istnieje.")
 
     # pobierz kampanię tej grupy, żeby sprawdzić właściciela
-    campaign = group.campaign
+    campaign = await db.get(RegistrationCampaign, group.campaign_id)
     if not campaign or campaign.creator_id is None:
         raise HTTPException(status_code=404, detail="Błąd spójności danych (brak kampanii).")
 
@@ -436,8 +431,9 @@ async def update_group(
         setattr(group, key, value)
 
     db.add(group)
-    db.commit()
-    db.refresh(group)
+    await bump_results_version(db, campaign.id)
+    await db.commit()
+    await db.refresh(group)
 
     return {
         "message": "Zaktualizowano grupę",
@@ -453,22 +449,24 @@ async def update_group(
 async def resolve_campaign(
     campaign_id: int,
     current_user: CurrentAdmin,
-    db: SessionDep,
+    db: AsyncSessionDep,
     force: bool = False # mozliwosc wymuszenia ponownego przelosowania
 ):
     """
-    Uruchomienie algorytmu przydziału,
+    Zlecenie algorytmu przydziału w tle,
     Zamyka zapisy i rozdziela studentów do grup na podstawie ich priorytetów oraz czasu wysłania wniosku.
     
     Jeżeli assignment_method zostanie zedytowane po pomyślnym resolve'owaniu to zadziała od nowa algorytm przydzielania.
     A jeżeli last_resolved_method != None lub force == false to nie przydziela studentow od nowa tylko przechodzi dalej
+    
+    Zwraca od razu `job_id`; stan, etap i postęp zadania sprawdzasz przez GET /admin/resolve-jobs/{job_id}.
     """
-     # pobierz kampanie z db
-    campaign = db.get(RegistrationCampaign, campaign_id)
+     # pobierz kampanie z db (blokada wiersza, zeby dwa kliknięcia nie zleciły dwóch zadań)
+    campaign = await db.get(RegistrationCampaign, campaign_id, with_for_update=True)
     if not campaign:
         raise HTTPException(status_code=404, detail="Kampania nie istnieje.")
 
-    if campaign.creator_id != current_user.id:
+    if campaign.creator_id != current_user.id or current_user.id is None:
         raise HTTPException(status_code=403, detail="Brak uprawnień.")
 
     # check czy metoda losowania w bazie jest taka sama jak ta, którą ostatnio liczyliśmy
@@ -479,107 +477,175 @@ async def resolve_campaign(
             "status": "skipped" # informacja dla frontendu że nic się nie zmieniło
         }
 
-    # uruchomienie algorytmu losowania 
-    # (tylko jeśli last_resolved_method i assignment_method są różne lub force=True)
-    try:
-        stats = resolve_campaign_logic(db, campaign)
-        
-        # zapis stanu do db
-        campaign.last_resolved_method = campaign.assignment_method
-        
-        campaign.is_active = False
-        campaign.ends_at = datetime.now()
-        
-        db.add(campaign)
-        db.commit()
-        
-    except Exception as e:
-        db.rollback()
-        print(f"Błąd algorytmu: {e}")
-        raise HTTPException(status_code=500, detail="Wystąpił błąd algorytmu.")
+    # jedno zadanie na kampanię naraz - drugi klik dostaje id tego samego zadania
+    # (commit także wtedy: find_active_job mógł zamknąć porzucone zadanie)
+    job = await find_active_job(db, campaign_id)
+    if job is None:
+        job = create_resolve_job(db, campaign_id, current_user.id, force)
+        await db.commit()
+        submit_resolve_job(job.id)
+    else:
+        await db.commit()
 
     return {
-        "message": "Algorytm zakończony pomyślnie.",
-        "stats": stats,
+        "message": "Algorytm przydziału został zlecony.",
+        "job_id": job.id,
+        "status": job.status,
         "new_method_applied": campaign.assignment_method
-    }   
+    }
+
+
+@router.get("/resolve-jobs/{job_id}", response_model=ResolveJobResponse)
+async def get_resolve_job(
+    job_id: str,
+    current_user: CurrentAdmin,
+    db: AsyncSessionDep
+):
+    """
+    Stan zadania resolve: status (queued/running/done/failed), etap i postęp 0-1.
+    Po zakończeniu zawiera zapisane statystyki algorytmu (jedno zapytanie po kluczu głównym).
+    """
+    job = await db.get(ResolveJob, job_id)
+    if not job or job.requested_by != current_user.id:
+        raise HTTPException(status_code=404, detail="Zadanie nie istnieje.")
+
+    return ResolveJobResponse(
+        job_id=job.id,
+        campaign_id=job.campaign_id,
+        status=job.status,
+        phase=job.phase,
+        progress=job.progress,
+        stats=job.stats,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at
+    )
+    
+
+@router.post("/campaigns/{campaign_id}/simulate", response_model=LotterySimulationResponse)
+async def simulate_campaign_lottery(
+    campaign_id: int,
+    current_user: CurrentAdmin,
+    db: AsyncSessionDep,
+    runs: int = 200,
+    seed: int | None = None,
+    students_offset: int = 0,
+    students_limit: int = 50
+):
+    """
+    Symulacja metody LOTTERY na aktualnych zgłoszeniach (dry-run, nic nie zapisuje).
+    
+    Przeprowadza `runs` losowań na wspólnej puli procesów i zwraca udział 1., 2., 3.... priorytetu,
+    obłożenie każdej grupy oraz szanse studentów ze strony `students_offset`/`students_limit`.
+    Podanie `seed` daje powtarzalny wynik.
+    """
+    campaign = await db.get(RegistrationCampaign, campaign_id)
+    if not campaign or campaign.id is None:
+        raise HTTPException(status_code=404, detail="Kampania nie istnieje.")
+
+    if campaign.creator_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Brak uprawnień.")
+
+    if not 1 <= runs <= settings.SIMULATION_MAX_RUNS:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Liczba losowań musi być z zakresu 1-{settings.SIMULATION_MAX_RUNS}."
+        )
+
+    if students_offset < 0 or not 0 <= students_limit <= settings.SIMULATION_MAX_STUDENTS_PAGE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Strona studentów: offset >= 0, limit z zakresu 0-{settings.SIMULATION_MAX_STUDENTS_PAGE}."
+        )
+
+    if seed is None:
+        seed = secrets.randbelow(2**31)
+
+    # numpy + silnik przydziału dopiero przy pierwszej symulacji (szybszy start workera)
+    from app.core.assignment import campaign_arrays_from_rows, fetch_campaign_rows
+
+    # odczyt async, a budowa tablic (grupowanie + numpy) w wątku - nie na pętli zdarzeń
+    groups, registrations = await fetch_campaign_rows(db, campaign.id)
+    arrays = await run_in_threadpool(campaign_arrays_from_rows, groups, registrations)
     
+    # pula procesów blokuje, wiec czekamy na nią poza pętlą zdarzeń
+    try:
+        result = await run_in_threadpool(
+            simulation_pool.run, arrays, runs, seed, students_offset, students_limit
+        )
+    except SimulationBusy as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Za dużo symulacji naraz, spróbuj ponownie za chwilę.",
+            headers={"Retry-After": str(int(e.retry_after))}
+        )
+
+    return LotterySimulationResponse(campaign_id=campaign.id, **result)
 
 
+@router.get("/campaigns/{campaign_id}/download")
 @router.post("/campaigns/{campaign_id}/download")
 async def download_campaign_results(
     campaign_id: int,
     current_user: CurrentAdmin,
-    db: SessionDep
+    db: AsyncSessionDep,
+    format: ExportFormat = ExportFormat.XLSX,
+    if_none_match: str | None = Header(default=None)
 ):
     """
-    Generuje plik Excel z wynikami przydziału i wysyła go jako strumień (bez zapisu na dysku).
+    Generuje plik z wynikami kampanii (wszystkie zgłoszenia ze statusem) i wysyła go jako strumień
+    (bez zapisu na dysku). `format`: xlsx (domyślnie), csv, ndjson albo parquet.
+    Wiersze idą z kursora bazy prosto do pliku, a jego kawałki od razu do klienta,
+    więc zużycie pamięci nie rośnie z wielkością kampanii.
+
+    Po zamknięciu zapisów gotowy plik trafia do cache pod (kampania, format, results_version),
+    a odpowiedź ma ETag - kolejne pobranie bez zmian w wynikach to plik z pamięci albo 304 (If-None-Match).
+    W trakcie zapisów plik powstaje za każdym razem od nowa (bez cache i ETagu).
+    Nowy plik powstaje w puli eksportu (kodowanie w EXPORT_WORKERS wątkach poza pętlą zdarzeń,
+    najwyżej EXPORT_MAX_STREAMS otwartych pobierań); jeśli miejsce nie zwolni się w EXPORT_QUEUE_TIMEOUT, zwracamy 503.
     """
     
     # pobranie i walidacja kampanii
-    campaign = db.get(RegistrationCampaign, campaign_id)
+    campaign = await db.get(RegistrationCampaign, campaign_id)
     if not campaign:
         raise HTTPException(status_code=404, detail="Kampania nie istnieje.")
     
     if campaign.creator_id != current_user.id:
         raise HTTPException(status_code=403, detail="Brak uprawnień do pobrania wyników tej kampanii.")
 
-    # pobieramy dane studentów i ich przydziałów
-    statement = (
-        select(
-            User.index,
-            RegistrationGroup.name.label("group_name"),
-            Registration.priority,
-            Registration.status,
-            Registration.created_at
-        )
-        .join(Registration, Registration.user_id == User.id)
-        .join(RegistrationGroup, Registration.group_id == RegistrationGroup.id)
-        .where(RegistrationGroup.campaign_id == campaign_id)
-        # Jeśli chcesz pełną listę zgłoszeń, usuń poniższą linię:
-        .where(Registration.status == RegistrationStatus.ASSIGNED) 
-        .order_by(RegistrationGroup.name, User.index)
-    )
-    
-    results = db.exec(statement).all()
-    
-    # wyniki sql --> lista słowników
-    data = []
-    for row in results:
-        data.append({
-            "Indeks studenta": row.index,
-            "Grupa": row.group_name,
-            "Priorytet": row.priority,
-            "Data zgłoszenia": row.created_at.strftime("%Y-%m-%d %H:%M")
-        })
-
-    # Obsługa przypadku, gdy brak wyników
-    if not data:
-        # Tworzymy pusty DataFrame z kolumnami, żeby Excel nie był uszkodzony
-        df = pd.DataFrame(columns=["Indeks studenta", "Grupa", "Priorytet", "Data zgłoszenia"])
-    else:
-        df = pd.DataFrame(data)
-
-    # generowanie pliku Excel w pamięci (RAM)
-    output = BytesIO()
-    
-    # Używamy silnika openpyxl, index=False usuwa kolumnę z numerami wierszy (0,1,2...)
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name="Wyniki")
-    
-    # sum magic mambo jambo
-    output.seek(0)
-    
     # przygotowanie tytulu i wysyłka
     safe_title = campaign.title.replace(" ", "_")
-    filename = f"wyniki_{safe_title}.xlsx"
-    
-    headers = {
-        'Content-Disposition': f'attachment; filename="{filename}"'
-    }
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"wyniki_{safe_title}.{extension}"
     
-    return StreamingResponse(
-        output, 
-        headers=headers, 
-        media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
\ No newline at end of file
+    headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
+
+    # zapisy trwają - wersja nie nadąża za wnioskami, więc bez ETagu i cache
+    settled = results_settled(campaign)
+    if settled:
+        # no-cache: przeglądarka może trzymać plik, ale zawsze pyta o ETag
+        etag = export_etag(campaign_id, campaign.results_version, format)
+        headers.update({'ETag': etag, 'Cache-Control': 'private, no-cache'})
+
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': 'private, no-cache'})
+
+        cached = export_cache.get((campaign_id, format), campaign.results_version)
+        if cached is not None:
+            return Response(content=cached, headers=headers, media_type=media_type)
+    else:
+        headers['Cache-Control'] = 'no-store'
+
+    try:
+        content = await export_pool.open(export_campaign_results(campaign_id, format))
+    except ExportPoolBusy as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Za dużo eksportów naraz, spróbuj ponownie za chwilę.",
+            headers={"Retry-After": str(int(e.retry_after))}
+        )
+
+    if settled:
+        content = export_cache.stream_through((campaign_id, format), campaign.results_version, content)
+    return StreamingResponse(content, headers=headers, media_type=media_type)
\ No newline at end of file
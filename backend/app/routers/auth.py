@@ -3,17 +3,22 @@ from fastapi import APIRouter, HTTPException, Response
 from fastapi.responses import RedirectResponse
 from sqlmodel import select, col, func
 
-from app.database import SessionDep
+from app.database import AsyncSessionDep
 from app.serializers.schemas import (
     EmailRequest, MagicLinkResponse, 
     RegisterWithInviteRequest, TokenResponse
 )
+from app.core.invites import get_invite, redeem_invite
+from app.core.outbox import email_dispatcher, enqueue_email
+from app.core.memberships import add_membership
+from app.core.claims import create_session_token, set_session_cookie
+from app.core.user_cache import get_user_snapshot, invalidate_user
 from app.core.security import (
-    create_access_token, generate_magic_token, 
-    send_magic_link_email, validate_uni_email
+    generate_magic_token, 
+    render_magic_link_email, validate_uni_email
 )
 from app.models.models import (
-    AuthToken, Invitation,
+    AuthToken,
     RegistrationCampaign, RegistrationGroup,
     User, UserRole
 )
@@ -27,7 +32,7 @@ router = APIRouter(prefix="/auth", tags=["Auth"])
 @router.post("/register-with-invite", response_model=MagicLinkResponse)
 async def register_with_invite(
     payload: RegisterWithInviteRequest,
-    db: SessionDep
+    db: AsyncSessionDep
 ):
     """
     Tworzy konto lub dopisuje istniejącego użytkownika do nowej kampanii na podstawie kodu zaproszenia wygenerowanego przez Starostę.
@@ -45,37 +50,43 @@ async def register_with_invite(
             detail=f"Wymagany mail w domenie {settings.ALLOWED_DOMAINS}"
         )
 
-    # pobranie i walidacja zaproszenia
-    invite = db.exec(select(Invitation).where(Invitation.token == code)).first()
-    if not invite:
+    # tani odczyt z cache - odsiewa nieistniejące i przeterminowane kody bez blokady wiersza
+    cached_invite = await get_invite(db, code)
+    if not cached_invite:
         raise HTTPException(status_code=404, detail="Nieprawidłowy kod zaproszenia.")
     
-    if not invite.is_valid:
+    if cached_invite.is_expired:
         raise HTTPException(status_code=400, detail="Ten kod zaproszenia wygasł lub został w pełni wykorzystany.")
 
-    # walidacja kampanii (jeśli kod dotyczy kampanii)
+    # zużycie zaproszenia jednym warunkowym UPDATE ... RETURNING - rola i kampania pochodzą z tego wiersza,
+    # a nie z cache (zaproszenie mogło się zmienić w ciągu INVITE_CACHE_TTL)
+    invite = await redeem_invite(db, code)
+    if invite is None:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Ten kod zaproszenia wygasł lub został w pełni wykorzystany.")
+
+    # walidacja kampanii (jeśli kod dotyczy kampanii); błąd cofa też zużycie zaproszenia
     if invite.target_campaign_id is not None:
-        campaign = db.get(RegistrationCampaign, invite.target_campaign_id)
+        campaign = await db.get(RegistrationCampaign, invite.target_campaign_id)
         if not campaign:
+            await db.rollback()
             raise HTTPException(status_code=404, detail="Kampania z zaproszenia już nie istnieje.")
         if not campaign.is_active:
+            await db.rollback()
             raise HTTPException(status_code=400, detail="Kampania jeszcze się nie zaczęła albo już się skończyła.")
 
     # sprawdź czy user już istnieje
-    user = db.exec(select(User).where(User.email == email)).first()
+    user = (await db.exec(select(User).where(User.email == email))).first()
+    claims_version = None
 
     if user:
     # --- SCENARIUSZ A: UPDATE ISTNIEJĄCEGO USERA ---
         
         # Logika: Jeśli to link do kampanii (student), a user tej kampanii nie ma -> dodaj.
-        if invite.target_campaign_id is not None:
-            # sprawdź duplikaty w liście
-            if invite.target_campaign_id not in user.allowed_campaign_ids:
-                current_campaigns = list(user.allowed_campaign_ids)
-                current_campaigns.append(invite.target_campaign_id)
-                user.allowed_campaign_ids = current_campaigns
-                
-                db.add(user)
+        if invite.target_campaign_id is not None and user.id is not None:
+            # duplikaty odsiewa ON CONFLICT na kluczu (user_id, campaign_id)
+            claims_version = await add_membership(db, user.id, invite.target_campaign_id)
+            if claims_version is not None:
                 message_detail = "Zaktualizowano Twoje konto o dostęp do nowego rocznika."
             else:
                 message_detail = "Masz już dostęp do tej kampanii. Logowanie..."
@@ -84,19 +95,19 @@ async def register_with_invite(
 
     else:
     # --- SCENARIUSZ B: TWORZENIE NOWEGO USERA ---
-        
-        # przygotuj listę kampanii
-        initial_campaigns = []
-        if invite.target_campaign_id is not None:
-            initial_campaigns.append(invite.target_campaign_id)
-
         new_user = User(
             email=email,
             index=payload.index,
-            role=invite.target_role,                 
-            allowed_campaign_ids=initial_campaigns 
+            role=invite.target_role
         )
         db.add(new_user)
+
+        if invite.target_campaign_id is not None:
+            # flush, żeby dostać id usera przed wpisem do campaign_memberships
+            await db.flush()
+            if new_user.id is not None:
+                await add_membership(db, new_user.id, invite.target_campaign_id)
+
         message_detail = "Konto utworzone pomyślnie!"
 
     # generuj i wyslij magic link
@@ -111,18 +122,20 @@ async def register_with_invite(
 
     db.add(auth_token)
 
-    # podbij licznik uzycia zaproszenia
-    invite.current_uses += 1
-    db.add(invite)
-
-    db.commit()
-    
     # Jeżeli starosta się loguje albo rejestruje, nie przekazujemy kodu zaproszenia
     # Zamiast tego przekierujemy go do panelu starosty
-    if code == settings.DEFAULT_ADMIN_INVITE_TOKEN:
-        code = None
+    link_invite = None if code == settings.DEFAULT_ADMIN_INVITE_TOKEN else code
 
-    await send_magic_link_email(email, token, invite=code)
+    # mail z linkiem trafia do outboxa w tej samej transakcji co token - wysyła go dispatcher w tle
+    subject, body = render_magic_link_email(email, token, invite=link_invite)
+    enqueue_email(db, email, subject, body)
+
+    await db.commit()
+    email_dispatcher.notify()
+
+    # nowa kampania na liście usera - cache get_current_user musi to zobaczyć
+    if user:
+        invalidate_user(user.id)
 
     return MagicLinkResponse(
         message="Sukces!",
@@ -131,7 +144,7 @@ async def register_with_invite(
     
   
 @router.get("/verify", response_model=TokenResponse)
-async def verify_token(token: str, db: SessionDep, invite: str | None = None):
+async def verify_token(token: str, db: AsyncSessionDep, invite: str | None = None):
     """
     Weryfikuje link logowania.
     Generuje link zgodny z wymaganiami frontendu:
@@ -142,13 +155,13 @@ async def verify_token(token: str, db: SessionDep, invite: str | None = None):
     """
     
     # 1. Walidacja tokenu AuthToken
-    auth_token = db.exec(select(AuthToken).where(AuthToken.token == token)).first()
+    auth_token = (await db.exec(select(AuthToken).where(AuthToken.token == token))).first()
     
     if not auth_token or not auth_token.is_valid:
         raise HTTPException(status_code=401, detail="Link jest nieważny lub wygasł.")
 
     # 2. Walidacja użytkownika
-    user = db.exec(select(User).where(User.email == auth_token.email)).first()
+    user = (await db.exec(select(User).where(User.email == auth_token.email))).first()
     if not user:
         raise HTTPException(status_code=404, detail="Użytkownik nie istnieje.")
     
@@ -161,9 +174,7 @@ async def verify_token(token: str, db: SessionDep, invite: str | None = None):
         # Używamy try-except, żeby błąd w pobieraniu detali kampanii nie zablokował logowania
         try:
             # Pobierz samo zaproszenie (nie sprawdzamy czy user jest przypisany!)
-            campaign_invite = db.exec(
-                select(Invitation).where(Invitation.token == invite)
-            ).first()
+            campaign_invite = await get_invite(db, invite)
 
             # Flaga sukcesu budowania pełnego linku
             full_link_created = False
@@ -172,13 +183,13 @@ async def verify_token(token: str, db: SessionDep, invite: str | None = None):
                 campaign_id = campaign_invite.target_campaign_id
                 
                 # Pobierz kampanię
-                campaign = db.get(RegistrationCampaign, campaign_id)
+                campaign = await db.get(RegistrationCampaign, campaign_id)
                 
                 if campaign:
                     three_letters = campaign.title[:3].upper()
                     
                     # Policz grupy (używamy scalar dla bezpieczeństwa typu)
-                    group_amount = db.scalar(
+                    group_amount = await db.scalar(
                         select(func.count(RegistrationGroup.id))
                         .where(RegistrationGroup.campaign_id == campaign_id)
                     )
@@ -209,29 +220,21 @@ async def verify_token(token: str, db: SessionDep, invite: str | None = None):
         else:
             redirect = f"{settings.FRONTEND_URL}/pages/StudentPanel.html"
 
-    # 4. Generowanie JWT
+    # 4. Generowanie JWT (z claimami, jeśli włączone)
     access_token_expires = timedelta(hours=settings.SESSION_EXPIRE_HOURS)
-    access_token = create_access_token(
-        data={"sub": str(user.id)},
-        expires_delta=access_token_expires
-    )
+    session_user = await get_user_snapshot(db, user.id) if user.id is not None else None
+    if session_user is None:
+        raise HTTPException(status_code=404, detail="Użytkownik nie istnieje.")
+    access_token = create_session_token(session_user, access_token_expires)
 
     # 5. Zużycie tokenu jednorazowego
     auth_token.is_used = True
     db.add(auth_token)
-    db.commit()
+    await db.commit()
 
     # 6. Odpowiedź z ciasteczkiem
     response = RedirectResponse(url=redirect)
-    response.set_cookie(
-        key="access_token",
-        value=access_token,
-        max_age=access_token_expires.total_seconds(),
-        httponly=True,
-        secure=True, 
-        samesite="lax",
-        path="/"
-    )
+    set_session_cookie(response, access_token, access_token_expires)
     
     return response
 
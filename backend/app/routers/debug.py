@@ -5,6 +5,8 @@ from sqlmodel import select, col, MetaData
 from app.config import get_settings
 from app.database import SessionDep
 from app.models.models import User, UserRole
+from app.core.memberships import add_membership_sync, user_campaign_ids_sync
+from app.core.user_cache import invalidate_user
 from app.core.security import create_access_token
 
 settings = get_settings()
@@ -81,30 +83,20 @@ async def create_test_user(
     
     if not user:
         # tworzymy nowego usera
-        initial_campaigns = []
-        if payload.campaign_id is not None:
-            initial_campaigns.append(payload.campaign_id)
-
         user = User(
             email=payload.email,
-            role=payload.role,
-            allowed_campaign_ids=initial_campaigns
+            role=payload.role
         )
         db.add(user)
-        db.commit()
-        db.refresh(user)
-    else:
-        # jesli user juz istnieje to tylko aktualizujemy mu rolę
-        # Jeśli podano campaign_id, dodajemy go do listy (jeśli go tam nie ma)
-        if payload.campaign_id is not None:
-            if payload.campaign_id not in user.allowed_campaign_ids:
-                current_ids = list(user.allowed_campaign_ids)
-                current_ids.append(payload.campaign_id)
-                user.allowed_campaign_ids = current_ids
+        db.flush()
 
-        db.add(user)
-        db.commit()
-        db.refresh(user)
+    # Jeśli podano campaign_id, dodajemy dostęp (jeśli go jeszcze nie ma)
+    if payload.campaign_id is not None and user.id is not None:
+        add_membership_sync(db, user.id, payload.campaign_id)
+
+    db.commit()
+    db.refresh(user)
+    invalidate_user(user.id)
 
     if user.id is None:
          return {"error": "User ID is missing"}
@@ -125,5 +117,5 @@ async def create_test_user(
         "message": f"Stworzono/Zaktualizowano usera: {user.email} [{user.role}]",
         "access_token": access_token,
         "token_type": "bearer",
-        "campaigns": user.allowed_campaign_ids
+        "campaigns": user_campaign_ids_sync(db, user.id)
     }
\ No newline at end of file
@@ -0,0 +1,102 @@
+from fastapi import APIRouter, HTTPException
+from sqlalchemy import func
+from sqlmodel import select, col
+
+from app.core.boot import boot_timer
+from app.core.claims import claims_revocations
+from app.core.dependencies import OperatorAccess
+from app.core.export_cache import export_cache
+from app.core.export_pool import export_pool
+from app.core.simulation_pool import simulation_pool
+from app.core.invites import invite_cache
+from app.core.mail_backends import mail_backend
+from app.core.outbox import email_dispatcher, mask_email
+from app.core.preferences import submission_buffer
+from app.core.security import mail_breaker
+from app.core.user_cache import user_cache
+from app.database import AsyncSessionDep, async_pool_monitor, sync_pool_monitor
+from app.models.models import EmailOutbox, EmailStatus
+from app.serializers.schemas import EmailOutboxItem, EmailOutboxResponse
+
+router = APIRouter(prefix="/internal", tags=["Internal"])
+
+@router.get("/stats")
+async def internal_stats(_: OperatorAccess):
+    """
+    Statystyki wewnętrzne serwera (tylko operator, nagłówek X-Internal-Token).
+    Autoryzacja bez zapytania do bazy - endpoint ma odpowiadać także przy wyczerpanej puli połączeń.
+    Pula połączeń: czas oczekiwania na połączenie, zajęte połączenia, overflow i timeouty.
+    Bufor wniosków: głębokość kolejki, paczki i czas ich zapisu.
+    Cache userów: trafienia/pudła get_current_user; unieważnione wersje claimów JWT i stan ich nasłuchu.
+    Cache zaproszeń: trafienia/pudła odczytów po tokenie.
+    Dispatcher maili: wysłane, ponawiane i nieudane wiadomości z outboxa.
+    Backend pocztowy: połączenia SMTP w puli i czekanie na limit albo zapytania do Resend; stan bezpiecznika.
+    Cache eksportu: zajęte bajty, trafienia/pudła i wyrzucone pliki.
+    Start workera: czas importu app.main i startupu względem budżetu.
+    Pula eksportu: otwarte i czekające strumienie, trwające kodowanie, czas czekania w kolejce i generowania pliku, odrzucone (503).
+    Pula symulacji: trwające, zakończone i odrzucone (503) symulacje losowania, czas symulacji.
+    """
+    return {
+        "boot": boot_timer.snapshot(),
+        "db_pool": {
+            "async": async_pool_monitor.snapshot(),
+            "sync": sync_pool_monitor.snapshot(),
+        },
+        "submission_buffer": submission_buffer.snapshot(),
+        "user_cache": user_cache.snapshot(),
+        "claims_revocations": claims_revocations.snapshot(),
+        "invite_cache": invite_cache.snapshot(),
+        "email_dispatcher": email_dispatcher.snapshot(),
+        "mail_backend": mail_backend.snapshot(),
+        "mail_breaker": mail_breaker.snapshot(),
+        "export_cache": export_cache.snapshot(),
+        "export_pool": export_pool.snapshot(),
+        "simulation_pool": simulation_pool.snapshot(),
+    }
+
+
+@router.get("/email-outbox", response_model=EmailOutboxResponse)
+async def get_email_outbox(
+    _: OperatorAccess,
+    db: AsyncSessionDep,
+    status: EmailStatus | None = None,
+    limit: int = 50
+):
+    """
+    Stan wysyłki maili (magic linki) całego serwera, tylko dla operatora (X-Internal-Token):
+    ile wiadomości czeka, jest wysyłanych, wysłanych i nieudanych, plus ostatnie `limit` wiadomości
+    (opcjonalnie tylko w danym statusie) z liczbą prób i ostatnim błędem. Adresy są zamaskowane.
+    """
+    if not 1 <= limit <= 500:
+        raise HTTPException(status_code=400, detail="Limit musi być z zakresu 1-500.")
+
+    counts = {
+        row.status: row.count
+        for row in (await db.exec(
+            select(EmailOutbox.status, func.count().label("count"))
+            .group_by(EmailOutbox.status)
+        )).all()
+    }
+
+    statement = select(EmailOutbox).order_by(col(EmailOutbox.id).desc()).limit(limit)
+    if status is not None:
+        statement = statement.where(EmailOutbox.status == status)
+    messages = (await db.exec(statement)).all()
+
+    return EmailOutboxResponse(
+        counts={s: counts.get(s, 0) for s in EmailStatus},
+        items=[
+            EmailOutboxItem(
+                id=m.id,
+                recipient=mask_email(m.recipient),
+                subject=m.subject,
+                status=m.status,
+                attempts=m.attempts,
+                last_error=m.last_error,
+                created_at=m.created_at,
+                next_attempt_at=m.next_attempt_at,
+                sent_at=m.sent_at
+            )
+            for m in messages
+        ]
+    )
@@ -6,9 +6,10 @@ from sqlalchemy import func
 from sqlalchemy.orm import selectinload
 
 from app.config import get_settings
-from app.database import SessionDep
+from app.database import AsyncSessionDep
 from app.core.dependencies import CurrentUser
 from app.models.models import (
+    CampaignMembership,
     RegistrationCampaign, 
     Registration, 
     RegistrationStatus,
@@ -24,7 +25,7 @@ router = APIRouter(prefix="/users", tags=["Users"])
 
 
 @router.get("/me")
-async def get_user_session(current_user: CurrentUser, db: SessionDep):
+async def get_user_session(current_user: CurrentUser, db: AsyncSessionDep):
     """
     Zwraca informacje o aktualnie zalogowanym użytkowniku
     Wymaga tokenu autorazycjnego jwt
@@ -37,7 +38,11 @@ async def get_user_session(current_user: CurrentUser, db: SessionDep):
     }
 
     if current_user.role == "starosta":
-        campaigns_count = len(current_user.created_campaigns)
+        # COUNT w bazie zamiast leniwego ładowania relacji (nie działa w sesji async)
+        campaigns_count = await db.scalar(
+            select(func.count(col(RegistrationCampaign.id)))
+            .where(col(RegistrationCampaign.creator_id) == current_user.id)
+        ) or 0
         return {
             **base_data,
             "active_campaigns": campaigns_count,
@@ -45,11 +50,14 @@ async def get_user_session(current_user: CurrentUser, db: SessionDep):
         }
 
     elif current_user.role == "student":
-        registrations = current_user.registrations
+        registrations_count = await db.scalar(
+            select(func.count(col(Registration.id)))
+            .where(col(Registration.user_id) == current_user.id)
+        ) or 0
         return {
             **base_data,
-            "my_registrations_count": len(registrations),
-            "status": "Zapisany" if registrations else "Niezapisany",
+            "my_registrations_count": registrations_count,
+            "status": "Zapisany" if registrations_count else "Niezapisany",
             "actions": ["join_group"]
         }
 
@@ -57,28 +65,25 @@ async def get_user_session(current_user: CurrentUser, db: SessionDep):
 @router.get("/available-campaigns", response_model=AvailableCampaignsResponse)
 async def get_available_campaigns(
     current_user: CurrentUser,
-    db: SessionDep
+    db: AsyncSessionDep
 ):
     """
-    Zwraca kampanie (wraz z grupami) i statusem na podstawie allowed_campaign_ids przypisanych do studenta.
+    Zwraca kampanie (wraz z grupami) i statusem na podstawie campaign_memberships przypisanych do studenta.
     Pokazuje też kampanie które sie zakonczyly i nie rozpoczeły oraz status tekstowy.
     """
     
-    if not current_user.allowed_campaign_ids:
-        return AvailableCampaignsResponse(
-            created_campaigns=[],
-            campaigns=[]
-        )
-
-    # 1. Pobieranie kampanii
+    # 1. Pobieranie kampanii (join po indeksowanym kluczu campaign_memberships)
+    # celowo nie z current_user.campaign_ids - cache usera jest per proces, a po użyciu zaproszenia
+    # inne workery widziałyby starą listę aż do USER_CACHE_TTL
     statement = (
         select(RegistrationCampaign)
-        .where(col(RegistrationCampaign.id).in_(current_user.allowed_campaign_ids)) 
+        .join(CampaignMembership, col(CampaignMembership.campaign_id) == col(RegistrationCampaign.id))
+        .where(col(CampaignMembership.user_id) == current_user.id) 
         #.where(RegistrationCampaign.is_active == True)
         .options(selectinload(getattr(RegistrationCampaign, "groups"))) 
     )
     
-    campaigns = db.exec(statement).all()
+    campaigns = (await db.exec(statement)).all()
 
     if not campaigns:
         return AvailableCampaignsResponse(
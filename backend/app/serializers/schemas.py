@@ -2,7 +2,7 @@ from typing import List
 from pydantic import BaseModel, EmailStr, Field, field_validator
 from datetime import datetime
 
-from app.models.models import AssignmentMethod, UserRole
+from app.models.models import AssignmentMethod, EmailStatus, JobStatus, UserRole
 
 #region --- MODELE AUTORYZACJI ---
 
@@ -83,6 +83,7 @@ class GroupStatsResponse(BaseModel):
     name: str
     limit: int
     first_priority_count: int # popularnosc - ile osób chce tu trafić (priority 1)
+    applicants_count: int # ile osób w ogóle oceniło grupę
     # dostepne dopiero po uruchomieniu algorytmu przydzielajacego studentow do grup
     current_count: int
     is_full: bool
@@ -111,6 +112,66 @@ class CampaignSetupResponse(BaseModel):
     groups: BulkGroupResponse
     invitation: InvitationLinkResponse
 
+class ResolveJobResponse(BaseModel):
+    """Stan zadania resolve uruchomionego w tle (do odpytywania przez frontend)"""
+    job_id: str
+    campaign_id: int
+    status: JobStatus
+    phase: str
+    progress: float # 0.0 - 1.0
+    stats: dict | None = None # wyniki algorytmu, dostępne gdy status == done
+    error: str | None = None
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+class EmailOutboxItem(BaseModel):
+    """Jeden mail z outboxa (bez treści - jest w niej magic link - i z zamaskowanym adresem)"""
+    id: int
+    recipient: str # np. st***@student.uken.krakow.pl
+    subject: str
+    status: EmailStatus
+    attempts: int
+    last_error: str | None = None
+    created_at: datetime
+    next_attempt_at: datetime
+    sent_at: datetime | None = None
+
+class EmailOutboxResponse(BaseModel):
+    """Stan wysyłki maili: liczba wiadomości w każdym statusie + ostatnie wiadomości"""
+    counts: dict[EmailStatus, int]
+    items: List[EmailOutboxItem]
+
+class SimulatedStudentOdds(BaseModel):
+    """Szanse jednego studenta w symulacji losowania"""
+    user_id: int
+    rank_probabilities: List[float] # [P(priorytet 1), P(priorytet 2), ...]
+    unassigned_probability: float   # P(brak grupy)
+
+class SimulatedGroupOdds(BaseModel):
+    """Obłożenie jednej grupy w symulacji losowania"""
+    group_id: int
+    capacity: int
+    expected_assigned: float # średnia liczba przydzielonych studentów
+    full_probability: float  # P(grupa się zapełni)
+    first_choice_demand: int # ilu studentów dało ją na 1. miejsce
+    first_choice_probability: float | None # P(trafienia) dla tych studentów, None gdy nikt
+
+class LotterySimulationResponse(BaseModel):
+    """Wynik symulacji Monte-Carlo metody LOTTERY (nic nie jest zapisywane w bazie)"""
+    campaign_id: int
+    runs: int
+    seed: int
+    workers: int
+    elapsed_ms: float
+    group_ids: List[int]
+    ranks: List[int]
+    rank_share: List[float] # średni udział studentów z priorytetem 1, 2, ...; ostatni element = bez grupy
+    groups: List[SimulatedGroupOdds]
+    students_total: int
+    students_offset: int
+    students: List[SimulatedStudentOdds] # tylko strona [students_offset, students_offset + students_limit)
+
 class AvailableCampaignsResponse(BaseModel):
     """Response containing the ids of the campaigns the user created or is a part of """
     created_campaigns: list[int]
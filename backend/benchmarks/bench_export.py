@@ -0,0 +1,152 @@
+"""
+Benchmark eksportu wyników: stara wersja (lista słowników -> pandas DataFrame -> openpyxl ->
+cały plik w BytesIO) vs strumieniowe writery xlsx / csv / ndjson / parquet (wiersze prosto do pliku,
+kawałki od razu do klienta). Mierzy czas do pierwszego bajtu, czas całości, szczyt pamięci
+(tracemalloc) i najdłuższe zatrzymanie pętli zdarzeń w czasie eksportu na syntetycznych wierszach.
+--inline dokłada wariant z kodowaniem na pętli zdarzeń (bez wątków puli eksportu) dla porównania.
+Stara wersja wymaga pandas + openpyxl (nie ma ich już w requirements) - bez nich jest pomijana.
+
+Uruchomienie (z katalogu backend):
+    python -m benchmarks.bench_export
+    python -m benchmarks.bench_export --rows 10000 100000 500000 --formats xlsx csv
+    python -m benchmarks.bench_export --rows 100000 --inline
+"""
+import argparse
+import asyncio
+import importlib.util
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from io import BytesIO
+
+from app.core.export_pool import export_pool
+from app.core.export import EXPORT_FETCH_ROWS, RESULT_COLUMNS, RESULT_FIELDS, csv_stream, ndjson_stream, parquet_stream, xlsx_stream
+
+WRITERS = {
+    "xlsx": lambda rows: xlsx_stream(rows, RESULT_COLUMNS),
+    "csv": lambda rows: csv_stream(rows, RESULT_FIELDS),
+    "ndjson": lambda rows: ndjson_stream(rows, RESULT_FIELDS),
+    "parquet": parquet_stream,
+}
+
+
+def synthetic_rows(n: int):
+    started = datetime(2026, 1, 1)
+    for i in range(n):
+        status = "assigned" if i % 5 == 0 else "rejected"
+        yield (f"{100000 + i // 5}", f"Grupa {i % 40 + 1}", i % 5 + 1, status, started + timedelta(seconds=i))
+
+
+async def async_batches(n: int):
+    # paczki jak z kursora (yield_per), z oddaniem sterowania jak przy czekaniu na bazę
+    batch = []
+    for row in synthetic_rows(n):
+        batch.append(row)
+        if len(batch) == EXPORT_FETCH_ROWS:
+            yield batch
+            batch = []
+            await asyncio.sleep(0)
+    if batch:
+        yield batch
+
+
+async def run_inline(fn, *args):
+    return fn(*args)
+
+
+async def watch_loop_lag(lags: list):
+    # co 1 ms budzimy się na pętli; spóźnienie = jak długo pętla była zajęta czymś innym
+    while True:
+        expected = time.perf_counter() + 0.001
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - expected)
+
+
+def legacy_export(n: int):
+    import pandas as pd
+
+    started = time.perf_counter()
+    data = [dict(zip(RESULT_COLUMNS, row)) for row in synthetic_rows(n)]
+    df = pd.DataFrame(data)
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine="openpyxl") as writer:
+        df.to_excel(writer, index=False, sheet_name="Wyniki")
+    output.seek(0)
+    # StreamingResponse startuje dopiero tutaj, więc pierwszy bajt = cały plik gotowy
+    first_byte = time.perf_counter() - started
+    size = len(output.getvalue())
+    total = time.perf_counter() - started
+    # całość liczona w endpoincie async, więc pętla stoi przez cały czas
+    return first_byte, total, size, total
+
+
+async def streaming_export(n: int, export_format: str, inline: bool = False):
+    lags: list = [0.0]
+    watcher = asyncio.create_task(watch_loop_lag(lags))
+    offload = export_pool.offload
+    if inline:
+        export_pool.offload = run_inline # type: ignore
+    try:
+        started = time.perf_counter()
+        first_byte = None
+        size = 0
+        async for chunk in WRITERS[export_format](async_batches(n)):
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+            size += len(chunk)
+        total = time.perf_counter() - started
+    finally:
+        export_pool.offload = offload # type: ignore
+        watcher.cancel()
+    return first_byte, total, size, max(lags)
+
+
+def measure(fn):
+    # czasy bez tracemalloc (mocno spowalnia), pamięć w osobnym przebiegu
+    first_byte, total, size, lag = fn()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return first_byte, total, size, lag, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 50000, 100000])
+    parser.add_argument("--formats", nargs="+", choices=list(WRITERS), default=list(WRITERS))
+    parser.add_argument("--inline", action="store_true", help="także kodowanie na pętli zdarzeń (bez puli)")
+    args = parser.parse_args()
+
+    # find_spec zamiast importu: sama sterta pandas wydłuża pauzy GC w pozostałych wariantach
+    has_legacy = all(importlib.util.find_spec(name) for name in ("pandas", "openpyxl"))
+    if not has_legacy:
+        print("brak pandas/openpyxl - mierzę tylko eksport strumieniowy\n")
+    if "parquet" in args.formats:
+        if importlib.util.find_spec("pyarrow") is None:
+            args.formats.remove("parquet")
+            print("brak pyarrow - pomijam parquet\n")
+
+    print(
+        f"{'wiersze':>8} {'wariant':>14} {'1. bajt [ms]':>13} {'całość [ms]':>12} "
+        f"{'plik [KB]':>10} {'max lag [ms]':>13} {'pamięć [MB]':>12}"
+    )
+    for n in args.rows:
+        variants = []
+        for fmt in args.formats:
+            variants.append((fmt, lambda n=n, fmt=fmt: asyncio.run(streaming_export(n, fmt))))
+            if args.inline:
+                variants.append((f"{fmt} inline", lambda n=n, fmt=fmt: asyncio.run(streaming_export(n, fmt, inline=True))))
+        if has_legacy and n == args.rows[-1]:
+            # pandas na końcu i tylko raz - po nim pauzy GC zawyżają lag pozostałych
+            variants.append(("pandas", lambda n=n: legacy_export(n)))
+        for label, run in variants:
+            first_byte, total, size, lag, peak_mb = measure(run)
+            print(
+                f"{n:>8} {label:>14} {first_byte * 1000:>13.1f} {total * 1000:>12.1f} "
+                f"{size / 1024:>10.0f} {lag * 1000:>13.1f} {peak_mb:>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
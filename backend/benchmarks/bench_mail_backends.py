@@ -0,0 +1,136 @@
+"""
+Benchmark backendu Resend na lokalnej atrapie API: osobne połączenie na każdy mail (nowy klient
+HTTP, tak jak jednorazowe wywołania) vs współdzielony klient keep-alive vs /emails/batch.
+Sprawdza też, że przy awarii API (503) bezpiecznik przestaje wysyłać zapytania, że jeden zły adres
+odrzuca tylko swoją wiadomość, a nie całą paczkę, i że powtórzona paczka (ten sam Idempotency-Key)
+nie wysyła maili drugi raz.
+
+Uruchomienie (z katalogu backend):
+    python -m benchmarks.bench_mail_backends
+    python -m benchmarks.bench_mail_backends --emails 1000 --latency-ms 30 --connect-latency-ms 80
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.core.mail_backends import OutgoingEmail, ResendBackend
+from benchmarks.fake_resend import FakeResendServer
+
+
+def build_emails(n: int):
+    return [
+        OutgoingEmail(
+            f"student{i}@example.com", "Magic Link", f"<a href='http://localhost/auth/verify?token={i:032d}'>Zaloguj</a>",
+            idempotency_key=f"outbox-{i}"
+        )
+        for i in range(n)
+    ]
+
+
+def new_backend(server: FakeResendServer, batch_size: int = 100) -> ResendBackend:
+    return ResendBackend(
+        api_key="re_bench", from_address="bench@example.com",
+        base_url=server.url, timeout=10, batch_size=batch_size
+    )
+
+
+async def run_new_client_per_email(server: FakeResendServer, emails, concurrency: int) -> float:
+    """Nowy klient (nowe TCP + TLS) dla każdego maila."""
+    limit = asyncio.Semaphore(concurrency)
+
+    async def send(email: OutgoingEmail):
+        async with limit:
+            async with httpx.AsyncClient(base_url=server.url, headers={"Authorization": "Bearer re_bench"}) as client:
+                response = await client.post("/emails", json={
+                    "from": "bench@example.com", "to": [email.recipient], "subject": email.subject, "html": email.html
+                })
+                response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send(email) for email in emails))
+    return time.perf_counter() - started
+
+
+async def run_keep_alive(server: FakeResendServer, emails) -> float:
+    backend = new_backend(server)
+    started = time.perf_counter()
+    await asyncio.gather(*(backend.send(email) for email in emails))
+    elapsed = time.perf_counter() - started
+    await backend.close()
+    return elapsed
+
+
+async def run_batch(server: FakeResendServer, emails, batch_size: int) -> float:
+    backend = new_backend(server, batch_size)
+    started = time.perf_counter()
+    errors = await backend.send_batch(emails)
+    elapsed = time.perf_counter() - started
+    assert not any(errors)
+    await backend.close()
+    return elapsed
+
+
+async def bench(args):
+    emails = build_emails(args.emails)
+    print(f"atrapa Resend: {args.latency_ms} ms na odpowiedź, {args.connect_latency_ms} ms na połączenie, {args.emails} maili")
+    print(f"{'wariant':<28} {'czas [s]':>9} {'maili/s':>9} {'zapytania':>10} {'połączenia':>11}")
+
+    variants = [
+        ("nowy klient na mail", lambda s: run_new_client_per_email(s, emails, 4)),
+        ("keep-alive, /emails", lambda s: run_keep_alive(s, emails)),
+        ("keep-alive, /emails/batch", lambda s: run_batch(s, emails, args.batch_size)),
+    ]
+    for label, run in variants:
+        async with FakeResendServer(latency_ms=args.latency_ms, connect_latency_ms=args.connect_latency_ms) as server:
+            elapsed = await run(server)
+            assert server.emails == args.emails
+            print(f"{label:<28} {elapsed:>9.2f} {args.emails / elapsed:>9.1f} {server.requests:>10} {server.connections:>11}")
+
+    # awaria API: po progu bezpiecznik odcina wysyłkę bez zapytań
+    async with FakeResendServer(latency_ms=args.latency_ms) as server:
+        server.fail_status = 503
+        backend = new_backend(server)
+        breaker = CircuitBreaker("resend", failure_threshold=3, reset_timeout=30, ignored=backend.rejected_errors)
+        outcomes = []
+        for email in emails[:10]:
+            try:
+                await breaker.call(backend.send, email)
+            except CircuitOpenError:
+                outcomes.append("open")
+            except httpx.HTTPStatusError:
+                outcomes.append("503")
+        await backend.close()
+        print(f"\nawaria API (503): {' '.join(outcomes)} -> zapytań {server.requests}, stan {breaker.state}")
+
+    # jeden zły adres w paczce: reszta idzie pojedynczo, odrzucona jest tylko zła wiadomość
+    async with FakeResendServer(latency_ms=args.latency_ms) as server:
+        backend = new_backend(server, args.batch_size)
+        emails_with_bad = list(emails[:args.batch_size])
+        emails_with_bad[3] = OutgoingEmail("bez-malpy", "Magic Link", "<p>x</p>", idempotency_key="outbox-bad")
+        errors = await backend.send_batch(emails_with_bad)
+        rejected = sum(error is not None for error in errors)
+        print(f"zły adres w paczce {len(emails_with_bad)}: odrzucone {rejected}, wysłane {server.emails}, zapytań {server.requests}")
+
+        # powtórka tych samych paczek (np. po timeoucie) - serwer odpowiada z pamięci
+        before = server.emails
+        await backend.send_batch(emails)
+        await backend.send_batch(emails)
+        await backend.close()
+        print(f"ta sama paczka 2x: wysłane {server.emails - before}, powtórzone z klucza {server.replays}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--connect-latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark strategii RANDOM: stara wersja (skanowanie wszystkich grup dla każdego studenta
++ liniowe szukanie zapisu) vs indeks wolnych miejsc (FreeSlotIndex + słownik grupa -> zapis).
+
+Uruchomienie (z katalogu backend):
+    python -m benchmarks.bench_random_strategy
+    python -m benchmarks.bench_random_strategy --students 1000 5000 10000 --groups 200
+"""
+import argparse
+import random
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from app.core.assignment import _apply_random_strategy
+
+# lekki odpowiednik wiersza z load_campaign_data
+Row = namedtuple("Row", ["id", "user_id", "group_id", "priority", "created_at"])
+
+
+def build_campaign(n_students: int, n_groups: int, seed: int = 0):
+    """Każdy student ocenia wszystkie grupy (tak jak wymaga /student/register), miejsc jest tyle co studentów."""
+    rng = random.Random(seed)
+    group_ids = list(range(1, n_groups + 1))
+    capacities = {gid: n_students // n_groups + 1 for gid in group_ids}
+    created_at = datetime(2026, 1, 1)
+
+    students_data = {}
+    reg_id = 0
+    for uid in range(1, n_students + 1):
+        ranking = group_ids[:]
+        rng.shuffle(ranking)
+        regs = []
+        for priority, gid in enumerate(ranking, start=1):
+            reg_id += 1
+            regs.append(Row(reg_id, uid, gid, priority, created_at))
+        students_data[uid] = {
+            "registrations": regs,
+            "registrations_by_group": {r.group_id: r for r in regs},
+            "earliest_created_at": created_at,
+        }
+
+    return students_data, group_ids, capacities
+
+
+def legacy_random_strategy(students_data, capacities, occupancy, group_ids):
+    """Poprzednia implementacja: O(grupy) na studenta na listę wolnych grup + O(zapisy) na szukanie."""
+    student_ids = list(students_data.keys())
+    random.shuffle(student_ids)
+    assigned_ids = []
+
+    for uid in student_ids:
+        user_regs = students_data[uid]["registrations"]
+        available_groups = [gid for gid in group_ids if occupancy[gid] < capacities[gid]]
+
+        if available_groups:
+            target_group_id = random.choice(available_groups)
+            target_reg = next((r for r in user_regs if r.group_id == target_group_id), None)
+
+            if target_reg:
+                assigned_ids.append(target_reg.id)
+                occupancy[target_group_id] += 1
+
+    return assigned_ids
+
+
+def measure(strategy, students_data, capacities, group_ids, repeats: int) -> float:
+    best = float("inf")
+    for i in range(repeats):
+        occupancy = {gid: 0 for gid in group_ids}
+        random.seed(i)
+        started = time.perf_counter()
+        assigned = strategy(students_data, capacities, occupancy, group_ids)
+        best = min(best, time.perf_counter() - started)
+        assert len(assigned) == sum(occupancy.values()) == len(students_data)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, nargs="+", default=[1000, 2500, 5000, 10000])
+    parser.add_argument("--groups", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'studenci':>9} {'grupy':>6} {'stara [ms]':>11} {'indeks [ms]':>12} {'przyspieszenie':>15}")
+    for n_students in args.students:
+        students_data, group_ids, capacities = build_campaign(n_students, args.groups)
+        legacy_ms = measure(legacy_random_strategy, students_data, capacities, group_ids, args.repeats)
+        indexed_ms = measure(_apply_random_strategy, students_data, capacities, group_ids, args.repeats)
+        print(
+            f"{n_students:>9} {args.groups:>6} {legacy_ms:>11.1f} {indexed_ms:>12.1f} "
+            f"{legacy_ms / indexed_ms:>14.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark wysyłki maili: stara wersja (aiosmtplib.send, czyli nowe połączenie + AUTH na każdą
+wiadomość) vs SmtpSender (pula zalogowanych połączeń), na lokalnym fake SMTP z opóźnieniami.
+Na końcu sprawdza, czy limit wysyłki (token bucket) trzyma zadane tempo.
+
+Uruchomienie (z katalogu backend):
+    python -m benchmarks.bench_smtp_sender
+    python -m benchmarks.bench_smtp_sender --messages 500 --pool-sizes 1 2 4 --connect-latency-ms 80
+"""
+import argparse
+import asyncio
+import time
+from email.message import EmailMessage
+
+import aiosmtplib
+
+from app.core.mailer import SmtpSender
+from benchmarks.fake_smtp import FakeSmtpServer
+
+
+def build_message(i: int) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = "bench@example.com"
+    message["To"] = f"student{i}@example.com"
+    message["Subject"] = "Magic Link"
+    message.set_content(f"<a href='http://localhost/auth/verify?token={i:032d}'>Zaloguj się</a>", subtype="html")
+    return message
+
+
+async def run_one_shot(server: FakeSmtpServer, n: int, concurrency: int) -> float:
+    """Poprzednia implementacja: osobne połączenie, EHLO i AUTH dla każdego maila."""
+    limit = asyncio.Semaphore(concurrency)
+
+    async def send(i: int):
+        async with limit:
+            await aiosmtplib.send(
+                build_message(i), hostname=server.host, port=server.port,
+                username="bench", password="bench", start_tls=False, timeout=10
+            )
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send(i) for i in range(n)))
+    return time.perf_counter() - started
+
+
+async def run_pooled(server: FakeSmtpServer, n: int, pool_size: int, rate_per_minute: float = 0, burst: int = 1):
+    sender = SmtpSender(
+        hostname=server.host, port=server.port, username="bench", password="bench",
+        start_tls=False, pool_size=pool_size, timeout=10,
+        rate_per_minute=rate_per_minute, burst=burst
+    )
+    started = time.perf_counter()
+    await asyncio.gather(*(sender.send(build_message(i)) for i in range(n)))
+    elapsed = time.perf_counter() - started
+    await sender.close()
+    return elapsed, sender
+
+
+async def bench(args):
+    print(f"fake SMTP: {args.latency_ms} ms na odpowiedź, {args.connect_latency_ms} ms na połączenie, {args.messages} maili")
+    print(f"{'połączenia':>10} {'stara [s]':>10} {'maili/s':>8} {'pula [s]':>9} {'maili/s':>8} {'nowe poł.':>10} {'przyspieszenie':>15}")
+
+    for pool_size in args.pool_sizes:
+        async with FakeSmtpServer(latency_ms=args.latency_ms, connect_latency_ms=args.connect_latency_ms) as server:
+            one_shot = await run_one_shot(server, args.messages, pool_size)
+            assert server.messages == args.messages
+
+        async with FakeSmtpServer(latency_ms=args.latency_ms, connect_latency_ms=args.connect_latency_ms) as server:
+            pooled, sender = await run_pooled(server, args.messages, pool_size)
+            assert server.messages == args.messages and sender.sent == args.messages
+
+        print(
+            f"{pool_size:>10} {one_shot:>10.2f} {args.messages / one_shot:>8.1f} {pooled:>9.2f} "
+            f"{args.messages / pooled:>8.1f} {sender.connects:>10} {one_shot / pooled:>14.1f}x"
+        )
+
+    # limit: burst idzie od razu, reszta w tempie rate/min - nadmiar czeka w kolejce, nic nie przepada
+    n, rate, burst = args.throttle_messages, args.throttle_rate, args.throttle_burst
+    async with FakeSmtpServer(latency_ms=args.latency_ms) as server:
+        elapsed, sender = await run_pooled(server, n, max(args.pool_sizes), rate_per_minute=rate, burst=burst)
+        assert server.messages == n
+
+    expected = max(0, n - burst) / (rate / 60)
+    print(
+        f"\nlimit {rate:.0f}/min (burst {burst}): {n} maili w {elapsed:.2f} s "
+        f"(oczekiwane ~{expected:.2f} s), wysłane {sender.sent}, "
+        f"czekało {sender.bucket.waits}, max czekanie {sender.bucket.wait_max * 1000:.0f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    parser.add_argument("--connect-latency-ms", type=float, default=50.0)
+    parser.add_argument("--throttle-messages", type=int, default=20)
+    parser.add_argument("--throttle-rate", type=float, default=600)
+    parser.add_argument("--throttle-burst", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Lokalna atrapa HTTP API Resend (POST /emails i /emails/batch) do benchmarków i sprawdzania
+ResendBackend bez sieci. Minimalny HTTP/1.1 z keep-alive, więc widać, ile połączeń
+naprawdę otwiera klient. `connect_latency_ms` udaje TCP + TLS, `latency_ms` czas odpowiedzi API,
+`fail_status` każe odpowiadać błędem (np. 503) - do sprawdzania bezpiecznika.
+Jak prawdziwe API: adres bez "@" to 422 (w /emails/batch dla całej paczki), a powtórzony
+Idempotency-Key dostaje zapamiętaną odpowiedź bez ponownej wysyłki.
+
+Uruchomienie jako osobny serwer (z katalogu backend), potem MAIL_BACKEND=resend i
+RESEND_API_URL=http://127.0.0.1:8025 w .env:
+    python -m benchmarks.fake_resend --port 8025 --latency-ms 20
+W kodzie:
+    async with FakeResendServer(latency_ms=20) as server:
+        ... ResendBackend(base_url=server.url, ...) ...
+"""
+import argparse
+import asyncio
+import json
+import uuid
+
+BATCH_LIMIT = 100
+
+
+class FakeResendServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0, connect_latency_ms: float = 0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency_ms / 1000
+        self.connect_latency = connect_latency_ms / 1000
+        self.fail_status: int | None = None
+        self._server: asyncio.AbstractServer | None = None
+        self._writers: set[asyncio.StreamWriter] = set()
+        self._handlers: set[asyncio.Task] = set()
+        self._idempotent: dict[str, tuple[int, object]] = {}
+
+        self.connections = 0
+        self.requests = 0
+        self.emails = 0
+        self.replays = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._writers):
+                writer.close()
+            # po zamknięciu połączeń handlery kończą się same (EOF), czekamy na nie
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "FakeResendServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    # FUNKCJE POMOCNICZE
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        self._writers.add(writer)
+        task = asyncio.current_task()
+        if task is not None:
+            self._handlers.add(task)
+        try:
+            if self.connect_latency:
+                await asyncio.sleep(self.connect_latency)
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode().split(" ", 2)
+
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                self.requests += 1
+                status, payload = self._route(method, path, headers, body)
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+
+                data = json.dumps(payload).encode()
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(
+                    f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            self._handlers.discard(task)
+            writer.close()
+
+    def _route(self, method: str, path: str, headers: dict, body: bytes):
+        if self.fail_status is not None:
+            return self.fail_status, {"name": "application_error", "message": "fake outage"}
+        if not headers.get("authorization", "").startswith("Bearer "):
+            return 401, {"name": "missing_api_key", "message": "Missing API key"}
+        if method != "POST" or path not in ("/emails", "/emails/batch"):
+            return 404, {"name": "not_found", "message": path}
+
+        key = headers.get("idempotency-key")
+        if key and key in self._idempotent:
+            self.replays += 1
+            return self._idempotent[key]
+
+        status, response = self._send(path, json.loads(body or b"null"))
+        if key and status == 200:
+            self._idempotent[key] = (status, response)
+        return status, response
+
+    def _send(self, path: str, payload):
+        if path == "/emails":
+            if not payload or not _valid(payload.get("to")):
+                return 422, {"name": "validation_error", "message": "Invalid `to` field."}
+            self.emails += 1
+            return 200, {"id": str(uuid.uuid4())}
+
+        if not isinstance(payload, list) or not 1 <= len(payload) <= BATCH_LIMIT:
+            return 422, {"name": "validation_error", "message": f"Batch must have 1-{BATCH_LIMIT} emails."}
+        if not all(_valid(email.get("to")) for email in payload):
+            return 422, {"name": "validation_error", "message": "Invalid `to` field."}
+        self.emails += len(payload)
+        return 200, {"data": [{"id": str(uuid.uuid4())} for _ in payload]}
+
+
+def _valid(recipients) -> bool:
+    return bool(recipients) and all("@" in address for address in recipients)
+
+
+async def serve(host: str, port: int, latency_ms: float, connect_latency_ms: float):
+    server = FakeResendServer(host, port, latency_ms, connect_latency_ms)
+    await server.start()
+    print(f"Fake Resend API na {server.url} (Ctrl+C kończy)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        print(f"połączenia: {server.connections}, zapytania: {server.requests}, maile: {server.emails}")
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--connect-latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.latency_ms, args.connect_latency_ms))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
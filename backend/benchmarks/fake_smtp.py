@@ -0,0 +1,151 @@
+"""
+Lokalny, udawany serwer SMTP do benchmarków wysyłki maili (bez sieci i bez prawdziwej skrzynki).
+
+Rozumie tyle SMTP, ile potrzebuje aiosmtplib: EHLO/HELO, AUTH PLAIN/LOGIN, MAIL, RCPT, DATA,
+RSET, NOOP, QUIT. Nie ma STARTTLS, więc nadawcę odpalamy z start_tls=False.
+Opóźnienia udają prawdziwy serwer: `connect_latency_ms` przed powitaniem (TCP + TLS + kolejka
+po stronie serwera), `latency_ms` przed każdą odpowiedzią (RTT).
+
+Uruchomienie jako osobny serwer (z katalogu backend):
+    python -m benchmarks.fake_smtp --port 2525 --latency-ms 5 --connect-latency-ms 50
+W kodzie:
+    async with FakeSmtpServer(latency_ms=5) as server:
+        ... wysyłka na 127.0.0.1:server.port ...
+"""
+import argparse
+import asyncio
+
+
+class FakeSmtpServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0, connect_latency_ms: float = 0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency_ms / 1000
+        self.connect_latency = connect_latency_ms / 1000
+        self._server: asyncio.AbstractServer | None = None
+        self._writers: set[asyncio.StreamWriter] = set()
+        self._handlers: set[asyncio.Task] = set()
+
+        self.connections = 0
+        self.auths = 0
+        self.messages = 0
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        # port=0 -> system wybiera wolny port
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            self.drop_connections()
+            # po zamknięciu połączeń handlery kończą się same (EOF), czekamy na nie
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    def drop_connections(self):
+        """Zrywa otwarte połączenia, tak jak serwer zamykający bezczynne sesje."""
+        for writer in list(self._writers):
+            writer.close()
+
+    async def __aenter__(self) -> "FakeSmtpServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    # FUNKCJE POMOCNICZE
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        self._writers.add(writer)
+        task = asyncio.current_task()
+        if task is not None:
+            self._handlers.add(task)
+        try:
+            if self.connect_latency:
+                await asyncio.sleep(self.connect_latency)
+            await self._reply(writer, "220 fake-smtp ESMTP ready")
+
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command, _, argument = line.decode("utf-8", "replace").strip().partition(" ")
+                command = command.upper()
+
+                if command == "EHLO":
+                    await self._reply(writer, "250-fake-smtp\r\n250-AUTH PLAIN LOGIN\r\n250-8BITMIME\r\n250 SIZE 10485760")
+                elif command == "HELO":
+                    await self._reply(writer, "250 fake-smtp")
+                elif command == "AUTH":
+                    await self._auth(reader, writer, argument)
+                elif command in ("MAIL", "RCPT", "RSET", "NOOP"):
+                    await self._reply(writer, "250 OK")
+                elif command == "DATA":
+                    await self._reply(writer, "354 End data with <CR><LF>.<CR><LF>")
+                    while (await reader.readline()) not in (b".\r\n", b".\n", b""):
+                        pass
+                    self.messages += 1
+                    await self._reply(writer, "250 OK queued")
+                elif command == "QUIT":
+                    await self._reply(writer, "221 Bye")
+                    break
+                else:
+                    await self._reply(writer, "502 Command not implemented")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            self._handlers.discard(task)
+            writer.close()
+
+    async def _auth(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, argument: str):
+        mechanism, _, initial = argument.partition(" ")
+        if mechanism.upper() == "PLAIN" and not initial:
+            await self._reply(writer, "334 ")
+            await reader.readline()
+        elif mechanism.upper() == "LOGIN":
+            if not initial:
+                await self._reply(writer, "334 VXNlcm5hbWU6")
+                await reader.readline()
+            await self._reply(writer, "334 UGFzc3dvcmQ6")
+            await reader.readline()
+        self.auths += 1
+        await self._reply(writer, "235 2.7.0 Authentication successful")
+
+    async def _reply(self, writer: asyncio.StreamWriter, text: str):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        writer.write(text.encode() + b"\r\n")
+        await writer.drain()
+
+
+async def serve(host: str, port: int, latency_ms: float, connect_latency_ms: float):
+    server = FakeSmtpServer(host, port, latency_ms, connect_latency_ms)
+    await server.start()
+    print(f"Fake SMTP na {host}:{server.port} (Ctrl+C kończy)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        print(f"połączenia: {server.connections}, logowania: {server.auths}, maile: {server.messages}")
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--connect-latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.latency_ms, args.connect_latency_ms))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Profil zimnego startu: importuje app.main w świeżym procesie z `python -X importtime`
+(kilka razy, bo pierwszy przebieg płaci za zimny cache dysku) i pokazuje, co zajmuje czas -
+pakiety (suma czasu własnego modułów) i najdroższe moduły (czas łączny z zależnościami).
+Mediana czasu importu jest porównywana z budżetem (COLD_START_BUDGET_MS albo --budget-ms);
+powyżej budżetu kod wyjścia 1, więc skrypt nadaje się do CI.
+
+Uruchomienie (z katalogu backend, z ustawionym .env):
+    python -m benchmarks.startup_profile
+    python -m benchmarks.startup_profile --runs 7 --top 30 --budget-ms 800 --raw importtime.txt
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# proces potomny drukuje czas importu w ostatniej linii; reszta wyjścia (banery apki) jest pomijana
+CHILD_CODE = (
+    "import time; started = time.perf_counter(); import {module}; "
+    "print('IMPORT_MS=%.1f' % ((time.perf_counter() - started) * 1000))"
+)
+
+ImportRow = Tuple[str, float, float] # (moduł, własny ms, łączny ms)
+
+
+def run_once(module: str) -> Tuple[float, str]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD_CODE.format(module=module)],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.exit(f"import {module} się nie udał:\n{result.stderr[-2000:]}")
+    marker = [line for line in result.stdout.splitlines() if line.startswith("IMPORT_MS=")]
+    return float(marker[-1].split("=", 1)[1]), result.stderr
+
+
+def parse_importtime(stderr: str) -> List[ImportRow]:
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    return rows
+
+
+def by_package(rows: List[ImportRow]) -> Dict[str, float]:
+    packages: Dict[str, float] = defaultdict(float)
+    for name, self_ms, _ in rows:
+        packages[name.split(".")[0]] += self_ms
+    return packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float, default=None, help="domyślnie COLD_START_BUDGET_MS z ustawień")
+    parser.add_argument("--raw", help="zapisz surowe wyjście -X importtime (ostatni przebieg) do pliku")
+    args = parser.parse_args()
+
+    budget = args.budget_ms
+    if budget is None:
+        from app.config import get_settings
+        budget = get_settings().COLD_START_BUDGET_MS
+
+    timings = []
+    stderr = ""
+    for _ in range(max(1, args.runs)):
+        import_ms, stderr = run_once(args.module)
+        timings.append(import_ms)
+
+    if args.raw:
+        with open(args.raw, "w") as f:
+            f.write(stderr)
+
+    rows = parse_importtime(stderr)
+    packages = by_package(rows)
+    total_self = sum(packages.values())
+
+    print(f"import {args.module}: {len(rows)} modułów, przebiegi [ms]: {' '.join(f'{t:.0f}' for t in timings)}\n")
+
+    print(f"{'pakiet':<28} {'własny [ms]':>12} {'udział':>8}")
+    for name, self_ms in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:<28} {self_ms:>12.1f} {self_ms / total_self:>8.1%}")
+
+    print(f"\n{'moduł (z zależnościami)':<48} {'łączny [ms]':>12}")
+    # tylko moduły aplikacji - dla zależności wystarczy tabela pakietów
+    first_party = [row for row in rows if row[0].startswith("app.") or row[0] == "app"]
+    for name, _, cumulative_ms in sorted(first_party, key=lambda row: -row[2])[:args.top]:
+        print(f"{name:<48} {cumulative_ms:>12.1f}")
+
+    median = statistics.median(timings)
+    verdict = "OK" if median <= budget else "PRZEKROCZONY"
+    print(f"\nmediana importu: {median:.0f} ms, budżet: {budget:.0f} ms -> {verdict}")
+    sys.exit(0 if median <= budget else 1)
+
+
+if __name__ == "__main__":
+    main()
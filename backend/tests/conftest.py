@@ -0,0 +1,31 @@
+import os
+
+# ustawienia wymagane przez app.config - testy nie łączą się z bazą ani z SMTP,
+# więc wystarczą dowolne wartości (zmienne ustawione w środowisku mają pierwszeństwo)
+TEST_ENV = {
+    "POSTGRES_DB": "test",
+    "POSTGRES_USER": "test",
+    "POSTGRES_PASSWORD": "test",
+    "POSTGRES_HOST": "localhost",
+    "SECRET_KEY": "test-secret",
+    "ALGORITHM": "HS256",
+    "TOKEN_EXPIRE_MINUTES": "15",
+    "SESSION_EXPIRE_HOURS": "24",
+    "ALLOWED_DOMAINS": "@test.pl",
+    "SMTP_HOST": "localhost",
+    "SMTP_PORT": "2525",
+    "SMTP_USER": "test",
+    "SMTP_PASSWORD": "test",
+    "SMTP_FROM": "test@test.pl",
+    "RESEND_API_KEY": "test",
+    "RESEND_EMAIL_FROM": "test@test.pl",
+    "APP_NAME": "test",
+    "BACKEND_URL": "http://localhost:8000",
+    "BACKEND_PORT": "8000",
+    "FRONTEND_URL": "http://localhost:3000",
+    "DEBUG": "False",
+    "DEFAULT_ADMIN_INVITE_TOKEN": "test-invite",
+}
+
+for name, value in TEST_ENV.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,57 @@
+import random
+
+import numpy as np
+import pytest
+
+from app.core.assignment_engine import UNASSIGNED, _choices_from_ranks, serial_dictatorship
+
+
+def legacy_assign(choices: np.ndarray, capacities: np.ndarray, order: np.ndarray) -> np.ndarray:
+    # stara pętla z _assign_by_priorities: student po studencie, pierwsza grupa z wolnym miejscem
+    occupancy = [0] * capacities.size
+    assignment = np.full(choices.shape[0], UNASSIGNED, dtype=np.int32)
+    for student in order.tolist():
+        for group in choices[student].tolist():
+            if group >= 0 and occupancy[group] < capacities[group]:
+                occupancy[group] += 1
+                assignment[student] = group
+                break
+    return assignment
+
+
+def random_campaign(rng: random.Random, n_students: int, n_groups: int, max_choices: int):
+    ranks = np.full((n_students, n_groups), UNASSIGNED, dtype=np.int32)
+    for row in range(n_students):
+        picked = rng.sample(range(n_groups), rng.randint(0, min(max_choices, n_groups)))
+        for rank, group in enumerate(picked):
+            ranks[row, group] = rank
+    capacities = np.asarray([rng.randint(0, 6) for _ in range(n_groups)], dtype=np.int64)
+    order = np.asarray(rng.sample(range(n_students), n_students), dtype=np.int64)
+    return _choices_from_ranks(ranks), capacities, order
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_serial_dictatorship_matches_legacy_loop(seed):
+    rng = random.Random(seed)
+    choices, capacities, order = random_campaign(rng, rng.randint(1, 60), rng.randint(1, 8), 4)
+
+    assert serial_dictatorship(choices, capacities, order).tolist() == legacy_assign(choices, capacities, order).tolist()
+
+
+def test_serial_dictatorship_respects_order_and_capacity():
+    # wszyscy chcą grupy 0 (1 miejsce), potem grupy 1 (1 miejsce)
+    choices = np.asarray([[0, 1], [0, 1], [0, 1]], dtype=np.int32)
+    capacities = np.asarray([1, 1], dtype=np.int64)
+
+    assignment = serial_dictatorship(choices, capacities, np.asarray([2, 0, 1], dtype=np.int64))
+
+    assert assignment.tolist() == [1, UNASSIGNED, 0]
+
+
+def test_serial_dictatorship_without_choices():
+    choices = np.full((3, 0), UNASSIGNED, dtype=np.int32)
+    capacities = np.asarray([2], dtype=np.int64)
+
+    assignment = serial_dictatorship(choices, capacities, np.arange(3, dtype=np.int64))
+
+    assert assignment.tolist() == [UNASSIGNED] * 3
@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+
+from app.core.counters import counter_deltas, merge_counter_deltas
+from app.models.models import RegistrationStatus
+
+
+def reg(group_id: int, priority: int, status: RegistrationStatus = RegistrationStatus.SUBMITTED):
+    # wystarczą pola, które czyta counter_deltas (jak Row z RETURNING)
+    return SimpleNamespace(group_id=group_id, priority=priority, status=status)
+
+
+def test_first_submission_counts_every_group():
+    deltas = counter_deltas([], [reg(7, 1), reg(3, 2), reg(5, 3)])
+
+    assert deltas == [
+        {"gid": 3, "d_applicants": 1, "d_first": 0, "d_assigned": 0},
+        {"gid": 5, "d_applicants": 1, "d_first": 0, "d_assigned": 0},
+        {"gid": 7, "d_applicants": 1, "d_first": 1, "d_assigned": 0},
+    ]
+
+
+def test_reordering_moves_only_first_priority():
+    deltas = counter_deltas([reg(1, 1), reg(2, 2)], [reg(2, 1), reg(1, 2)])
+
+    assert deltas == [
+        {"gid": 1, "d_applicants": 0, "d_first": -1, "d_assigned": 0},
+        {"gid": 2, "d_applicants": 0, "d_first": 1, "d_assigned": 0},
+    ]
+
+
+def test_unchanged_groups_are_skipped():
+    same = [reg(4, 1), reg(9, 2)]
+
+    assert counter_deltas(same, same) == []
+
+
+def test_removed_assignment_decrements_assigned():
+    deltas = counter_deltas([reg(2, 1, RegistrationStatus.ASSIGNED)], [reg(8, 1)])
+
+    assert deltas == [
+        {"gid": 2, "d_applicants": -1, "d_first": -1, "d_assigned": -1},
+        {"gid": 8, "d_applicants": 1, "d_first": 1, "d_assigned": 0},
+    ]
+
+
+def test_deltas_are_sorted_by_group_id():
+    # kolejność blokowania wierszy grup: zawsze rosnąco po id, niezależnie od priorytetów
+    added = [reg(gid, priority) for priority, gid in enumerate([42, 5, 17, 1, 30], start=1)]
+
+    gids = [delta["gid"] for delta in counter_deltas([reg(50, 1), reg(2, 2)], added)]
+
+    assert gids == sorted(gids) == [1, 2, 5, 17, 30, 42, 50]
+
+
+def test_merge_sums_batch_into_one_update_per_group():
+    # dwa wnioski z jednej paczki SubmissionBuffer, grupa 3 w obu
+    first = counter_deltas([], [reg(9, 1), reg(3, 2)])
+    second = counter_deltas([reg(3, 1)], [reg(6, 1)])
+
+    assert merge_counter_deltas([first, second]) == [
+        {"gid": 3, "d_applicants": 0, "d_first": -1, "d_assigned": 0},
+        {"gid": 6, "d_applicants": 1, "d_first": 1, "d_assigned": 0},
+        {"gid": 9, "d_applicants": 1, "d_first": 1, "d_assigned": 0},
+    ]
+
+
+def test_merge_drops_groups_that_cancel_out():
+    moved_in = counter_deltas([], [reg(4, 1)])
+    moved_out = counter_deltas([reg(4, 1)], [])
+
+    assert merge_counter_deltas([moved_in, moved_out]) == []
+    assert merge_counter_deltas([]) == []
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.export_cache import RESULTS_SETTLE_SECONDS, etag_matches, export_etag, results_settled
+from app.models.models import ExportFormat
+
+ETAG = export_etag(3, 7, ExportFormat.XLSX)
+
+
+def test_etag_changes_with_version_and_format():
+    assert ETAG == 'W/"3-7-xlsx"'
+    assert export_etag(3, 8, ExportFormat.XLSX) != ETAG
+    assert export_etag(3, 7, ExportFormat.CSV) != ETAG
+
+
+@pytest.mark.parametrize("header", [
+    'W/"3-7-xlsx"',
+    '"3-7-xlsx"',                         # porównanie słabe - prefiks W/ nie ma znaczenia
+    '"1-1-csv", W/"3-7-xlsx"',
+    '  W/"3-7-xlsx"  ,"9-9-csv"',
+    "*",
+    " * ",
+])
+def test_etag_matches(header):
+    assert etag_matches(header, ETAG)
+
+
+@pytest.mark.parametrize("header", [
+    None,
+    "",
+    'W/"3-6-xlsx"',                       # starsza wersja wyników
+    'W/"3-7-csv"',
+    '"3-7-xlsx',
+    'W/"13-7-xlsx"',
+])
+def test_etag_does_not_match(header):
+    assert not etag_matches(header, ETAG)
+
+
+def test_results_not_settled_while_registration_is_open():
+    ends_at = datetime(2026, 3, 1, 12, 0)
+    campaign = SimpleNamespace(ends_at=ends_at)
+
+    assert not results_settled(campaign, now=ends_at - timedelta(hours=1)) # type: ignore
+    assert not results_settled(campaign, now=ends_at) # type: ignore
+
+
+def test_results_settle_after_grace_period():
+    ends_at = datetime(2026, 3, 1, 12, 0)
+    campaign = SimpleNamespace(ends_at=ends_at)
+    grace_end = ends_at + timedelta(seconds=RESULTS_SETTLE_SECONDS)
+
+    # wniosek zwalidowany tuż przed ends_at może się jeszcze commitować
+    assert not results_settled(campaign, now=grace_end) # type: ignore
+    assert results_settled(campaign, now=grace_end + timedelta(seconds=1)) # type: ignore
@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.core import dependencies
+from app.core.dependencies import require_operator
+
+
+@pytest.fixture
+def operator_token(monkeypatch):
+    monkeypatch.setattr(dependencies.settings, "INTERNAL_API_TOKEN", "op-secret")
+    return "op-secret"
+
+
+def test_valid_token_passes(operator_token):
+    assert asyncio.run(require_operator(operator_token)) is None
+
+
+@pytest.mark.parametrize("token", [None, "", "op-secre", "op-secret2", "OP-SECRET"])
+def test_wrong_or_missing_token_is_forbidden(operator_token, token):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(require_operator(token))
+
+    assert error.value.status_code == 403
+
+
+@pytest.mark.parametrize("token", [None, "op-secret"])
+def test_endpoints_hidden_without_configured_token(monkeypatch, token):
+    # bez INTERNAL_API_TOKEN /internal/* udaje, że nie istnieje
+    monkeypatch.setattr(dependencies.settings, "INTERNAL_API_TOKEN", "")
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(require_operator(token))
+
+    assert error.value.status_code == 404
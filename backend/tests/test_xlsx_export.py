@@ -0,0 +1,66 @@
+import io
+from datetime import datetime
+
+from openpyxl import load_workbook
+
+from app.core.export import RESULT_COLUMNS, _XlsxEncoder
+
+
+def encode_xlsx(columns, batches, sheet_name="Wyniki") -> bytes:
+    # tak jak _encode_stream: start, paczki wierszy, finish - kawałki sklejone w plik
+    encoder = _XlsxEncoder(columns, sheet_name)
+    chunks = [encoder.start()]
+    chunks.extend(encoder.encode(batch) for batch in batches)
+    chunks.append(encoder.finish())
+    return b"".join(chunks)
+
+
+def read_sheet(data: bytes):
+    workbook = load_workbook(io.BytesIO(data), read_only=True)
+    sheet = workbook.worksheets[0]
+    return sheet.title, [list(row) for row in sheet.iter_rows(values_only=True)]
+
+
+def test_results_round_trip_through_openpyxl():
+    rows = [
+        ("123456", "Grupa 1 <A&B>", 1, "assigned", datetime(2026, 2, 3, 9, 5, 59)),
+        ("654321", "Łódź \"zaoczne\"", 2, "rejected", datetime(2026, 2, 4, 18, 30)),
+        ("111111", "bez\x01sterujących", 3, "submitted", None),
+    ]
+
+    title, values = read_sheet(encode_xlsx(RESULT_COLUMNS, [rows[:2], rows[2:]]))
+
+    assert title == "Wyniki"
+    assert values == [
+        RESULT_COLUMNS,
+        ["123456", "Grupa 1 <A&B>", 1, "assigned", "2026-02-03 09:05"],
+        ["654321", "Łódź \"zaoczne\"", 2, "rejected", "2026-02-04 18:30"],
+        ["111111", "bezsterujących", 3, "submitted"], # pusta komórka na końcu wiersza nie jest zapisywana
+    ]
+
+
+def test_large_export_is_emitted_in_chunks_and_stays_readable():
+    encoder = _XlsxEncoder(RESULT_COLUMNS, "Wyniki")
+    chunks = [encoder.start()]
+    for start in range(0, 20000, 1000):
+        chunks.append(encoder.encode([
+            (f"{i:06d}", f"Grupa {i % 37}", i % 5 + 1, "submitted", datetime(2026, 1, 1, 8, i % 60))
+            for i in range(start, start + 1000)
+        ]))
+    chunks.append(encoder.finish())
+
+    # plik idzie do klienta kawałkami jeszcze przed końcem kursora
+    assert sum(1 for chunk in chunks[1:-1] if chunk) > 1
+
+    _, values = read_sheet(b"".join(chunks))
+    assert len(values) == 20001
+    assert values[1] == ["000000", "Grupa 0", 1, "submitted", "2026-01-01 08:00"]
+    assert values[-1] == ["019999", "Grupa 19", 5, "submitted", "2026-01-01 08:19"]
+
+
+def test_wide_rows_get_multi_letter_columns():
+    columns = [f"k{i}" for i in range(30)]
+
+    _, values = read_sheet(encode_xlsx(columns, [[tuple(range(30))]], sheet_name="Szeroki"))
+
+    assert values == [columns, list(range(30))]
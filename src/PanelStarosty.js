@@ -187,7 +187,13 @@ async function loadCampaigns() {
                     if (campaign.is_active) {
                         console.log('resloving campaign');
                         const resData = await response.json();
-                        console.log('Kampania zamknięta:', resData);
+                        if (resData.job_id) {
+                            const job = await waitForResolveJob(resData.job_id, btn);
+                            if (job.status === 'failed') throw new Error(job.error || 'Błąd algorytmu');
+                            console.log('Kampania zamknięta:', job.stats);
+                        } else {
+                            console.log('Kampania zamknięta:', resData);
+                        }
                         campaign.is_active = false;
                         card.classList.remove('active');
                         card.classList.add('inactive');
@@ -243,6 +249,22 @@ async function loadCampaigns() {
 
 
 
+// resolve liczy się w tle, wiec odpytujemy stan zadania az do done/failed
+async function waitForResolveJob(jobId, btn) {
+    while (true) {
+        const response = await fetch(`/api/admin/resolve-jobs/${jobId}`, {
+            credentials: 'include'
+        });
+        if (!response.ok) throw new Error(`API Error: ${response.status}`);
+
+        const job = await response.json();
+        if (job.status === 'done' || job.status === 'failed') return job;
+
+        btn.textContent = `Zamykanie... ${Math.round(job.progress * 100)}%`;
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
+
 async function generateLink(name, startsAt, endsAt, method, groupAmmount, groupLimit) {
     try {
 